@@ -43,3 +43,20 @@ class Config:
             "result_expires": int(_get_env("CELERY_RESULT_EXPIRES")),
             "broker_connection_retry_on_startup": _get_bool_env("CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP"),
         }
+
+        # 文档索引构建流水线配置，分别为解析、分割、向量存储阶段的并发数以及阶段间队列大小
+        self.INDEXING_PARSE_WORKERS = int(_get_env("INDEXING_PARSE_WORKERS"))
+        self.INDEXING_SPLIT_WORKERS = int(_get_env("INDEXING_SPLIT_WORKERS"))
+        self.INDEXING_EMBED_WORKERS = int(_get_env("INDEXING_EMBED_WORKERS"))
+        self.INDEXING_QUEUE_SIZE = int(_get_env("INDEXING_QUEUE_SIZE"))
+        # 有多个celery worker可用时，是否将多文档构建任务拆分为单文档子任务
+        self.INDEXING_FAN_OUT = _get_bool_env("INDEXING_FAN_OUT")
+
+        # 混合检索配置，分别为每路检索的候选数量以及RRF融合的平滑常数
+        self.RETRIEVAL_CANDIDATE_DEPTH = int(_get_env("RETRIEVAL_CANDIDATE_DEPTH"))
+        self.RETRIEVAL_RRF_K = int(_get_env("RETRIEVAL_RRF_K"))
+
+        # 智能体事件队列配置，后端可选memory(进程内队列)或redis_stream(跨进程可续读)，以及事件流保留的最大条数与过期时间(秒)
+        self.AGENT_QUEUE_BACKEND = _get_env("AGENT_QUEUE_BACKEND")
+        self.AGENT_QUEUE_STREAM_MAX_LEN = int(_get_env("AGENT_QUEUE_STREAM_MAX_LEN"))
+        self.AGENT_QUEUE_STREAM_EXPIRE = int(_get_env("AGENT_QUEUE_STREAM_EXPIRE"))
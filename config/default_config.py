@@ -24,4 +24,20 @@ DEFAULT_CONFIG = {
     "CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP": "True",
     "CELERY_TASK_IGNORE_RESULT": "False",
     "CELERY_RESULT_EXPIRES": 60 * 60 * 1,
+
+    # 文档索引构建流水线配置
+    "INDEXING_PARSE_WORKERS": 2,
+    "INDEXING_SPLIT_WORKERS": 2,
+    "INDEXING_EMBED_WORKERS": 2,
+    "INDEXING_QUEUE_SIZE": 4,
+    "INDEXING_FAN_OUT": "False",
+
+    # 混合检索配置
+    "RETRIEVAL_CANDIDATE_DEPTH": 20,
+    "RETRIEVAL_RRF_K": 60,
+
+    # 智能体事件队列配置
+    "AGENT_QUEUE_BACKEND": "memory",
+    "AGENT_QUEUE_STREAM_MAX_LEN": 10000,
+    "AGENT_QUEUE_STREAM_EXPIRE": 1800,
 }
@@ -1,9 +1,13 @@
 from .function_call_agent import FunctionCallAgent
 from .base_agent import BaseAgent
 from .agent_queue_manager import AgentQueueManager
+from .agent_runtime import AgentRuntime
+from .agent_cache import AgentCache
 
 __all__ = [
     "BaseAgent",
     "FunctionCallAgent",
-    "AgentQueueManager"
+    "AgentQueueManager",
+    "AgentRuntime",
+    "AgentCache",
 ]
\ No newline at end of file
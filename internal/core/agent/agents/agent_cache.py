@@ -0,0 +1,40 @@
+import hashlib
+import json
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable
+
+from .base_agent import BaseAgent
+
+# 进程内最多缓存的智能体数量，超过时淘汰最久未使用的智能体
+AGENT_CACHE_MAX_SIZE = 256
+
+
+class AgentCache:
+    """智能体缓存，按应用配置与调用方缓存已编译图结构的智能体，单次请求的数据只通过图程序的输入传递"""
+    _agents: OrderedDict[str, BaseAgent] = OrderedDict()
+    _lock: Lock = Lock()
+
+    @classmethod
+    def get_or_create(cls, cache_key: str, factory: Callable[[], BaseAgent]) -> BaseAgent:
+        """根据缓存键获取智能体，不存在时调用工厂函数构建并缓存"""
+        with cls._lock:
+            agent = cls._agents.get(cache_key)
+            if agent is not None:
+                cls._agents.move_to_end(cache_key)
+                return agent
+
+        # 构建智能体涉及工具加载与图编译，不在锁内执行，并发构建时以先写入的为准
+        agent = factory()
+        with cls._lock:
+            agent = cls._agents.setdefault(cache_key, agent)
+            cls._agents.move_to_end(cache_key)
+            while len(cls._agents) > AGENT_CACHE_MAX_SIZE:
+                cls._agents.popitem(last=False)
+        return agent
+
+    @classmethod
+    def generate_cache_key(cls, agent_cls: type[BaseAgent], app_config: dict[str, Any], *args: Any) -> str:
+        """根据智能体类型、应用配置(涵盖模型、工具、知识库、审核等)以及调用方标识生成缓存键"""
+        payload = json.dumps([agent_cls.__name__, app_config, *args], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
@@ -1,15 +1,106 @@
+import asyncio
+import logging
 import queue
 import time
 import uuid
+from collections import deque
 from queue import Queue
-from typing import Generator
+from threading import Lock, Thread
+from typing import AsyncGenerator, Callable, Generator, Optional, Union
 from uuid import UUID
 
+from flask import current_app, has_app_context
 from redis import Redis
+from redis.client import PubSubWorkerThread
 
 from internal.core.agent.entities.queue_entity import AgentThought, QueueEvent
 from internal.entity.conversation_entity import InvokeFrom
 
+# redis stream单次读取的最大事件数
+AGENT_STREAM_READ_COUNT = 100
+
+# redis stream单次批量写入的最大事件数
+AGENT_STREAM_WRITE_BATCH = 200
+
+
+class AgentStreamReader:
+    """基于redis stream的任务事件读取器，提供与queue.Queue一致的get接口，记录读取偏移量，支持从指定事件id继续读取"""
+
+    def __init__(self, redis_client: Redis, stream_key: str, last_event_id: str = "0-0") -> None:
+        self.redis_client = redis_client
+        self.stream_key = stream_key
+        self.last_event_id = last_event_id
+        self._buffer: deque[Optional[AgentThought]] = deque()
+
+    def get(self, timeout: float) -> Optional[AgentThought]:
+        """阻塞读取下一个事件，超时没有事件时抛出queue.Empty，读取到结束标识时返回None"""
+        if not self._buffer:
+            # xread的block为0表示永久阻塞，最少阻塞1毫秒
+            result = self.redis_client.xread(
+                {self.stream_key: self.last_event_id},
+                count=AGENT_STREAM_READ_COUNT,
+                block=max(int(timeout * 1000), 1),
+            )
+            if not result:
+                raise queue.Empty
+
+            for entry_id, fields in result[0][1]:
+                entry_id = entry_id.decode("utf-8") if isinstance(entry_id, bytes) else entry_id
+                self.last_event_id = entry_id
+                data = fields.get(b"data", fields.get("data"))
+                if not data:
+                    self._buffer.append(None)
+                else:
+                    agent_thought = AgentThought.model_validate_json(data)
+                    agent_thought.offset = entry_id
+                    self._buffer.append(agent_thought)
+
+        return self._buffer.popleft()
+
+
+class AgentStreamWriter:
+    """基于redis stream的任务事件写入线程，发布事件时只放入进程内队列，由后台线程批量执行XADD，
+    避免在智能体运行的事件循环线程中同步等待redis往返，单线程按先进先出写入保证同一任务的事件顺序"""
+
+    def __init__(self, redis_client: Redis) -> None:
+        self.redis_client = redis_client
+        self._queue: Queue[tuple[str, str, int, int]] = Queue()
+        self._thread = Thread(target=self._run, name="agent-stream-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, stream_key: str, data: str, max_len: int, expire: int) -> None:
+        """将事件放入待写入队列，立即返回"""
+        self._queue.put((stream_key, data, max_len, expire))
+
+    def is_alive(self) -> bool:
+        """写入线程是否存活"""
+        return self._thread.is_alive()
+
+    def _run(self) -> None:
+        """循环读取待写入的事件，每次最多合并AGENT_STREAM_WRITE_BATCH个事件到一个管道中执行"""
+        while True:
+            # 1.阻塞等待第一个事件，随后取出队列中已经积累的事件，上一批写入期间产生的事件会合并到同一批
+            entries = [self._queue.get()]
+            while len(entries) < AGENT_STREAM_WRITE_BATCH:
+                try:
+                    entries.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            # 2.按顺序写入事件，每个任务流只刷新一次过期时间
+            pipeline = self.redis_client.pipeline(transaction=False)
+            expires: dict[str, int] = {}
+            for stream_key, data, max_len, expire in entries:
+                pipeline.xadd(stream_key, {"data": data}, maxlen=max_len, approximate=True)
+                expires[stream_key] = expire
+            for stream_key, expire in expires.items():
+                pipeline.expire(stream_key, expire)
+
+            try:
+                pipeline.execute()
+            except Exception as e:
+                logging.exception(f"写入智能体任务事件流失败, 事件数: {len(entries)}, 错误信息: {str(e)}")
+
 
 class AgentQueueManager:
     """智能体队列管理器"""
@@ -17,81 +108,184 @@ class AgentQueueManager:
     invoke_from: InvokeFrom
     redis_client: Redis
     _queues: dict[str, Queue]
+    _async_queues: dict[str, tuple[asyncio.AbstractEventLoop, asyncio.Queue]]
+
+    # 进程内共享的redis stream写入线程
+    _stream_writer: Optional[AgentStreamWriter] = None
+    _stream_writer_lock: Lock = Lock()
+
+    # 进程内共享的停止信号订阅线程，以及任务id到停止回调的映射
+    _stop_subscriber: Optional[PubSubWorkerThread] = None
+    _stop_subscriber_lock: Lock = Lock()
+    _stop_callbacks: dict[str, Callable[[], None]] = {}
 
     def __init__(
             self,
             user_id: UUID,
             invoke_from: InvokeFrom,
+            backend: Optional[str] = None,
     ) -> None:
-        """构造函数，初始化智能体队列管理器"""
-        # 1.初始化数据
+        """构造函数，初始化智能体队列管理器，backend为memory时使用进程内队列，为redis_stream时使用跨进程的redis stream，
+        未传递backend时从应用配置AGENT_QUEUE_BACKEND中读取"""
+        # 1.读取队列后端配置
+        config = current_app.config if has_app_context() else {}
+        self.backend = backend or config.get("AGENT_QUEUE_BACKEND", "memory")
+        self.stream_max_len = int(config.get("AGENT_QUEUE_STREAM_MAX_LEN", 10000))
+        self.stream_expire = int(config.get("AGENT_QUEUE_STREAM_EXPIRE", 1800))
+
+        # 2.初始化数据
         self.user_id = user_id
         self.invoke_from = invoke_from
         self._queues = {}
+        self._async_queues = {}
 
         # 内部初始化redis客户端
         from app.http.module import injector
         self.redis_client = injector.get(Redis)
 
-    def listen(self, task_id: UUID) -> Generator:
-        """监听队列返回的生成式数据"""
-        # 1.定义基础数据记录超时时间、开始时间、最后一次ping通时间
+    def listen(
+            self,
+            task_id: UUID,
+            idle_interval: Union[float, Callable[[], Optional[float]], None] = None,
+            last_event_id: str = "0-0",
+    ) -> Generator:
+        """监听队列返回的生成式数据，队列有数据时立即唤醒，ping与超时由定时截止时间驱动，停止信号通过redis发布订阅送达，
+        ping与超时事件只产出给当前监听者，不写入队列，避免污染多个读取者共享的redis stream，
+        传递idle_interval时队列空闲超过该时长会产出None，便于调用方刷新合并缓冲区，
+        idle_interval为可调用对象时每次等待前重新计算，返回None表示本次等待不需要空闲唤醒，
+        使用redis stream时可以传递last_event_id从指定事件之后继续读取，用于断线重连"""
+        # 1.定义基础数据记录超时时间、开始时间、下一次ping的时间
         listen_timeout = 600
-        start_time = time.time()
-        last_ping_time = 0
+        ping_interval = 10
+        start_time = time.monotonic()
+        timeout_at = start_time + listen_timeout
+        next_ping_at = start_time + ping_interval
+        task_queue = self.stream_reader(task_id, last_event_id) if self.is_stream_backend else self.queue(task_id)
 
-        # 2.创建循环队列执行死循环读取数据，直到超时或者数据读取完毕
-        while True:
-            try:
-                # 3.从队列中提取数据并检测数据是否存在，如果存在则使用yield关键字返回
-                item = self.queue(task_id).get(timeout=1)
-                if item is None:
+        # 2.订阅停止信号，并补偿订阅前已经设置的停止标识
+        self._subscribe_stop(task_id, lambda: self.publish(task_id, AgentThought(
+            id=uuid.uuid4(),
+            task_id=task_id,
+            event=QueueEvent.STOP,
+        )))
+        try:
+            if self._is_stopped(task_id):
+                self.publish(task_id, AgentThought(
+                    id=uuid.uuid4(),
+                    task_id=task_id,
+                    event=QueueEvent.STOP,
+                ))
+
+            # 3.阻塞等待队列数据，最长等待到下一个定时截止时间
+            while True:
+                wait = max(min(next_ping_at, timeout_at) - time.monotonic(), 0)
+                interval = idle_interval() if callable(idle_interval) else idle_interval
+                if interval is not None:
+                    wait = min(wait, interval)
+                try:
+                    item = task_queue.get(timeout=wait)
+                    if item is None:
+                        break
+                    yield item
+                except queue.Empty:
+                    if interval is not None:
+                        yield None
+
+                # 4.每10秒产出一个ping事件，LLM长时间无输出时同样会触发
+                now = time.monotonic()
+                if now >= next_ping_at:
+                    yield self._listener_event(task_id, QueueEvent.PING)
+                    next_ping_at = now + ping_interval
+
+                # 5.判断总耗时是否超时，如果超时则产出超时事件并结束监听
+                if now >= timeout_at:
+                    yield self._listener_event(task_id, QueueEvent.TIMEOUT)
                     break
-                yield item
-            except queue.Empty:
-                continue
-            else:
-                # 4.计算获取数据的总耗时
-                elapsed_time = time.time() - start_time
-
-                # 5.每10秒发起一个ping请求，但仅在未结束时发送
-                if elapsed_time // 10 > last_ping_time:
-                    self.publish(task_id, AgentThought(
-                        id=uuid.uuid4(),
-                        task_id=task_id,
-                        event=QueueEvent.PING,
-                    ))
-                    last_ping_time = elapsed_time // 10
-
-                # 6.判断总耗时是否超时，如果超时则往队列中添加超时事件
-                if elapsed_time >= listen_timeout:
-                    self.publish(task_id, AgentThought(
-                        id=uuid.uuid4(),
-                        task_id=task_id,
-                        event=QueueEvent.TIMEOUT,
-                    ))
-
-                # 7.检测是否停止，如果已经停止则添加停止事件
-                if self._is_stopped(task_id):
-                    self.publish(task_id, AgentThought(
-                        id=uuid.uuid4(),
-                        task_id=task_id,
-                        event=QueueEvent.STOP,
-                    ))
+        finally:
+            self._unsubscribe_stop(task_id)
+            self._queues.pop(str(task_id), None)
+
+    async def alisten(
+            self,
+            task_id: UUID,
+            idle_interval: Union[float, Callable[[], Optional[float]], None] = None,
+            last_event_id: str = "0-0",
+    ) -> AsyncGenerator:
+        """异步监听队列返回的数据，与listen的ping、超时、停止以及空闲信号规则一致，
+        进程内队列等待期间不占用线程，redis stream的阻塞读取在线程池中执行"""
+        # 1.定义基础数据记录超时时间、开始时间、下一次ping的时间
+        listen_timeout = 600
+        ping_interval = 10
+        start_time = time.monotonic()
+        timeout_at = start_time + listen_timeout
+        next_ping_at = start_time + ping_interval
+        stream_reader = self.stream_reader(task_id, last_event_id) if self.is_stream_backend else None
+        task_queue = None if stream_reader else self.async_queue(task_id)
+
+        # 2.订阅停止信号，并补偿订阅前已经设置的停止标识
+        self._subscribe_stop(task_id, lambda: self.publish(task_id, AgentThought(
+            id=uuid.uuid4(),
+            task_id=task_id,
+            event=QueueEvent.STOP,
+        )))
+        try:
+            if self._is_stopped(task_id):
+                self.publish(task_id, AgentThought(
+                    id=uuid.uuid4(),
+                    task_id=task_id,
+                    event=QueueEvent.STOP,
+                ))
+
+            # 3.等待队列数据，最长等待到下一个定时截止时间
+            while True:
+                wait = max(min(next_ping_at, timeout_at) - time.monotonic(), 0)
+                interval = idle_interval() if callable(idle_interval) else idle_interval
+                if interval is not None:
+                    wait = min(wait, interval)
+                try:
+                    if stream_reader is not None:
+                        item = await asyncio.to_thread(stream_reader.get, wait)
+                    else:
+                        item = await asyncio.wait_for(task_queue.get(), timeout=wait)
+                    if item is None:
+                        break
+                    yield item
+                except (asyncio.TimeoutError, queue.Empty):
+                    if interval is not None:
+                        yield None
+
+                # 4.每10秒产出一个ping事件
+                now = time.monotonic()
+                if now >= next_ping_at:
+                    yield self._listener_event(task_id, QueueEvent.PING)
+                    next_ping_at = now + ping_interval
+
+                # 5.判断总耗时是否超时，如果超时则产出超时事件并结束监听
+                if now >= timeout_at:
+                    yield self._listener_event(task_id, QueueEvent.TIMEOUT)
+                    break
+        finally:
+            self._unsubscribe_stop(task_id)
+            self._async_queues.pop(str(task_id), None)
 
     def stop_listen(self, task_id: UUID) -> None:
         """停止监听队列信息"""
-        self.queue(task_id).put(None)
+        self._put(task_id, None)
 
     def publish(self, task_id: UUID, agent_thought: AgentThought) -> None:
         """发布事件信息到队列"""
         # 1.将事件添加到队列中
-        self.queue(task_id).put(agent_thought)
+        self._put(task_id, agent_thought)
 
         # 2.检测事件类型是否为需要停止的类型，涵盖STOP、ERROR、TIMEOUT、AGENT_END
         if agent_thought.event in [QueueEvent.STOP, QueueEvent.ERROR, QueueEvent.TIMEOUT, QueueEvent.AGENT_END]:
             self.stop_listen(task_id)
 
+    @classmethod
+    def _listener_event(cls, task_id: UUID, event: QueueEvent) -> AgentThought:
+        """构建只属于当前监听者的事件，例如ping与超时"""
+        return AgentThought(id=uuid.uuid4(), task_id=task_id, event=event)
+
     def publish_error(self,task_id: UUID, error) -> None:
         """发布错误信息到队列"""
         self.publish(task_id, AgentThought(
@@ -116,14 +310,7 @@ class AgentQueueManager:
 
         # 检测队列是否存在，不存在则创建
         if not q:
-            user_prefix = "account" if self.invoke_from in [InvokeFrom.WEB_APP, InvokeFrom.DEBUGGER] else "end-user"
-
-            # 设置任务对应的缓存键，代表这次任务已经开始了
-            self.redis_client.setex(
-                self.generate_task_belong_cache_key(task_id),
-                1800,
-                f"{user_prefix}-{str(self.user_id)}",
-            )
+            self._mark_task_started(task_id)
 
             # 将任务队列添加到队列字典中
             q = Queue()
@@ -131,6 +318,69 @@ class AgentQueueManager:
 
         return q
 
+    def async_queue(self, task_id: UUID) -> asyncio.Queue:
+        """根据传递的task_id获取绑定当前事件循环的异步任务队列，需要在事件循环中调用"""
+        async_queue = self._async_queues.get(str(task_id))
+
+        # 检测队列是否存在，不存在则创建
+        if not async_queue:
+            self._mark_task_started(task_id)
+            async_queue = (asyncio.get_running_loop(), asyncio.Queue())
+            self._async_queues[str(task_id)] = async_queue
+
+        return async_queue[1]
+
+    @property
+    def is_stream_backend(self) -> bool:
+        """是否使用redis stream作为队列后端"""
+        return self.backend == "redis_stream"
+
+    def stream_reader(self, task_id: UUID, last_event_id: str = "0-0") -> AgentStreamReader:
+        """根据传递的task_id创建redis stream读取器"""
+        self._mark_task_started(task_id)
+        return AgentStreamReader(self.redis_client, self.generate_task_stream_key(task_id), last_event_id)
+
+    def _put(self, task_id: UUID, item: Optional[AgentThought]) -> None:
+        """将数据放入任务队列，使用redis stream时交给后台写入线程批量写入任务流并刷新过期时间，
+        进程内异步队列通过事件循环线程安全地投递，允许在任意线程中发布事件，
+        监听结束后进程内队列会被移除，此时到达的事件直接丢弃，避免长期复用的管理器积累无人监听的队列"""
+        if self.is_stream_backend:
+            self._get_stream_writer().put(
+                self.generate_task_stream_key(task_id),
+                item.model_dump_json() if item is not None else "",
+                self.stream_max_len,
+                self.stream_expire,
+            )
+            return
+
+        async_queue = self._async_queues.get(str(task_id))
+        if async_queue is not None:
+            loop, q = async_queue
+            loop.call_soon_threadsafe(q.put_nowait, item)
+            return
+
+        q = self._queues.get(str(task_id))
+        if q is not None:
+            q.put(item)
+
+    @classmethod
+    def _get_stream_writer(cls) -> AgentStreamWriter:
+        """获取进程内共享的redis stream写入线程，不存在或已退出时重新创建"""
+        with cls._stream_writer_lock:
+            if cls._stream_writer is None or not cls._stream_writer.is_alive():
+                from app.http.module import injector
+                cls._stream_writer = AgentStreamWriter(injector.get(Redis))
+            return cls._stream_writer
+
+    def _mark_task_started(self, task_id: UUID) -> None:
+        """设置任务对应的缓存键，代表这次任务已经开始了"""
+        user_prefix = "account" if self.invoke_from in [InvokeFrom.WEB_APP, InvokeFrom.DEBUGGER] else "end-user"
+        self.redis_client.setex(
+            self.generate_task_belong_cache_key(task_id),
+            1800,
+            f"{user_prefix}-{str(self.user_id)}",
+        )
+
     @classmethod
     def set_stop_flag(cls, task_id: UUID, invoke_from: InvokeFrom, user_id: UUID) -> None:
         """根据传递的任务id+调用来源停止某次会话"""
@@ -148,9 +398,37 @@ class AgentQueueManager:
         if result.decode("utf-8") != f"{user_prefix}-{str(user_id)}":
             return
 
-        # 4.生成停止键标识
+        # 4.生成停止键标识，并通过发布订阅通知正在监听的进程
         stopped_cache_key = cls.generate_task_stopped_cache_key(task_id)
         redis_client.setex(stopped_cache_key, 600, 1)
+        redis_client.publish(cls.generate_task_stopped_channel(task_id), 1)
+
+    @classmethod
+    def _subscribe_stop(cls, task_id: UUID, callback: Callable[[], None]) -> None:
+        """注册任务的停止回调，进程内共享一个模式订阅线程"""
+        with cls._stop_subscriber_lock:
+            cls._stop_callbacks[str(task_id)] = callback
+            if cls._stop_subscriber is None or not cls._stop_subscriber.is_alive():
+                from app.http.module import injector
+                pubsub = injector.get(Redis).pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(**{cls.generate_task_stopped_channel("*"): cls._on_stop_message})
+                cls._stop_subscriber = pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    @classmethod
+    def _unsubscribe_stop(cls, task_id: UUID) -> None:
+        """移除任务的停止回调"""
+        with cls._stop_subscriber_lock:
+            cls._stop_callbacks.pop(str(task_id), None)
+
+    @classmethod
+    def _on_stop_message(cls, message: dict) -> None:
+        """收到停止信号后回调对应任务"""
+        channel = message["channel"]
+        if isinstance(channel, bytes):
+            channel = channel.decode("utf-8")
+        callback = cls._stop_callbacks.get(channel.split(":", 1)[-1])
+        if callback is not None:
+            callback()
 
     @classmethod
     def generate_task_belong_cache_key(cls, task_id: UUID) -> str:
@@ -161,3 +439,13 @@ class AgentQueueManager:
     def generate_task_stopped_cache_key(cls, task_id: UUID) -> str:
         """生成任务已停止的缓存键"""
         return f"generate_task_stopped:{str(task_id)}"
+
+    @classmethod
+    def generate_task_stream_key(cls, task_id: UUID) -> str:
+        """生成任务事件流的缓存键"""
+        return f"generate_task_stream:{str(task_id)}"
+
+    @classmethod
+    def generate_task_stopped_channel(cls, task_id: UUID | str) -> str:
+        """生成任务停止信号的发布订阅频道"""
+        return f"generate_task_stopped_channel:{str(task_id)}"
@@ -0,0 +1,39 @@
+import asyncio
+import logging
+from concurrent.futures import Future
+from threading import Lock, Thread
+from typing import Any, Coroutine, Optional
+
+
+class AgentRuntime:
+    """智能体异步运行时，进程内共享一个事件循环线程，所有智能体图程序以协程的方式在该循环中执行，避免每个会话单独创建线程"""
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    _thread: Optional[Thread] = None
+    _lock: Lock = Lock()
+
+    @classmethod
+    def submit(cls, coro: Coroutine) -> Future:
+        """将协程提交到共享事件循环中执行，返回线程安全的Future"""
+        return asyncio.run_coroutine_threadsafe(coro, cls.get_loop())
+
+    @classmethod
+    def get_loop(cls) -> asyncio.AbstractEventLoop:
+        """获取共享事件循环，不存在或者已经停止时创建新的事件循环线程"""
+        with cls._lock:
+            if cls._loop is None or cls._thread is None or not cls._thread.is_alive():
+                cls._loop = asyncio.new_event_loop()
+                cls._thread = Thread(target=cls._run_loop, args=(cls._loop,), name="agent-runtime", daemon=True)
+                cls._thread.start()
+            return cls._loop
+
+    @classmethod
+    def _run_loop(cls, loop: asyncio.AbstractEventLoop) -> None:
+        """在后台线程中持续运行事件循环"""
+        asyncio.set_event_loop(loop)
+        loop.set_exception_handler(cls._handle_exception)
+        loop.run_forever()
+
+    @classmethod
+    def _handle_exception(cls, loop: asyncio.AbstractEventLoop, context: dict[str, Any]) -> None:
+        """记录事件循环中未被处理的异常"""
+        logging.error(f"智能体运行时发生未处理的异常: {context.get('message')}", exc_info=context.get("exception"))
@@ -1,7 +1,9 @@
+import asyncio
+import logging
 import uuid
 from abc import abstractmethod
-from threading import Thread
-from typing import Optional, Any, Iterator
+from concurrent.futures import Future
+from typing import Optional, Any, AsyncIterator, Iterator, Union
 
 from langchain_core.language_models import BaseLanguageModel
 from langchain_core.load import Serializable
@@ -13,7 +15,8 @@ from pydantic import PrivateAttr
 from internal.core.agent.entities.agent_entity import AgentConfig
 from internal.exception import FailedException
 from .agent_queue_manager import AgentQueueManager
-from ..entities.queue_entity import AgentResult, AgentThought, QueueEvent
+from .agent_runtime import AgentRuntime
+from ..entities.queue_entity import AgentResult, AgentThought, AgentThoughtCollector, QueueEvent
 
 
 class BaseAgent(Serializable, Runnable):
@@ -59,45 +62,29 @@ class BaseAgent(Serializable, Runnable):
         **kwargs: Any,
     ) -> AgentResult:
         """块内容响应"""
-        # 调用stream方法获取流式数据输出
+        # 调用stream方法获取流式数据输出，agent_message增量帧由收集器缓冲累加
         agent_result = AgentResult(query=input["messages"][0].content)
-        agent_thoughts = {}
+        collector = AgentThoughtCollector()
 
         for agent_thought in self.stream(input, config):
-            # 提取事件id
-            event_id = str(agent_thought.id)
-            # 除了ping事件其他事件全部记录
-            if agent_thought.event != QueueEvent.PING:
-                # 单独处理agent message事件，因为需要叠加返回数据
-                if agent_thought.event == QueueEvent.AGENT_MESSAGE:
-                    if event_id not in agent_thoughts:
-                        agent_thoughts[event_id] = agent_thought
-                    else:
-                        agent_thoughts[event_id] = agent_thoughts[event_id].model_copy(update={
-                            "thought": agent_thoughts[event_id].thought + agent_thought.thought,
-                            "answer": agent_thoughts[event_id].answer + agent_thought.answer,
-                            "latency": agent_thought.latency
-                        })
-                    # 更新智能体消息答案
-                    agent_result.answer += agent_thought.answer
-                else:
-                    # 其他类型的事件直接覆盖
-                    agent_thoughts[event_id] = agent_thought
-
-                    # 处理特殊事件
-                    if agent_thought.event in [QueueEvent.STOP, QueueEvent.ERROR, QueueEvent.TIMEOUT]:
-                        agent_result.status = agent_thought.event
-                        agent_result.error = agent_thought.observation if agent_thought.event == QueueEvent.ERROR else ""
-
-        agent_result.agent_thoughts = [agent_thought for agent_thought in agent_thoughts.values()]
+            collector.add(agent_thought)
+
+            # 处理特殊事件
+            if agent_thought.event in [QueueEvent.STOP, QueueEvent.ERROR, QueueEvent.TIMEOUT]:
+                agent_result.status = agent_thought.event
+                agent_result.error = agent_thought.observation if agent_thought.event == QueueEvent.ERROR else ""
+
+        agent_thoughts = collector.agent_thoughts
+        agent_result.answer = collector.answer
+        agent_result.agent_thoughts = agent_thoughts
 
         agent_result.message = next(
-            (agent_thought.message for agent_thought in agent_thoughts.values()
+            (agent_thought.message for agent_thought in agent_thoughts
              if agent_thought.event == QueueEvent.AGENT_MESSAGE),
             []
         )
 
-        agent_result.latency = sum([agent_thought.latency for agent_thought in agent_thoughts.values()])
+        agent_result.latency = sum([agent_thought.latency for agent_thought in agent_thoughts])
 
         return agent_result
 
@@ -108,26 +95,68 @@ class BaseAgent(Serializable, Runnable):
         config: Optional[RunnableConfig] = None,
         **kwargs: Optional[Any],
     ) -> Iterator[AgentThought]:
-        """流式输出"""
-        # 检测子类是否已经构建agent
+        """流式输出，图程序在共享的异步运行时中执行，传递idle_interval时队列空闲期间会产出None作为空闲信号，
+        idle_interval可以是返回剩余等待时长的可调用对象，只在需要时请求空闲唤醒"""
+        # 1.检测子类是否已经构建agent并初始化输入
+        input = self._prepare_input(input)
+
+        # 2.空闲信号间隔只作用于队列监听，不传递给图程序
+        idle_interval = kwargs.pop("idle_interval", None)
+
+        # 3.先创建任务队列，再将图程序提交到共享事件循环中执行，不再为每个会话创建线程
+        self._agent_queue_manager.queue(input["task_id"])
+        future = AgentRuntime.submit(self._agent.ainvoke(input, **kwargs))
+        future.add_done_callback(lambda f: self._handle_agent_done(input["task_id"], f))
+
+        # 4.监听队列，调用方提前关闭生成器(如客户端断开)时取消图程序
+        try:
+            yield from self._agent_queue_manager.listen(input["task_id"], idle_interval)
+        finally:
+            if not future.done():
+                future.cancel()
+
+    async def astream(
+        self,
+        input: Input,
+        config: Optional[RunnableConfig] = None,
+        **kwargs: Optional[Any],
+    ) -> AsyncIterator[AgentThought]:
+        """异步流式输出，图程序与队列监听都在调用方的事件循环中执行，适用于ASGI等异步服务"""
+        # 1.检测子类是否已经构建agent并初始化输入
+        input = self._prepare_input(input)
+        idle_interval = kwargs.pop("idle_interval", None)
+
+        # 2.先创建异步队列，确保图程序发布的事件全部进入异步队列
+        self._agent_queue_manager.async_queue(input["task_id"])
+        task = asyncio.create_task(self._agent.ainvoke(input, **kwargs))
+        task.add_done_callback(lambda t: self._handle_agent_done(input["task_id"], t))
+
+        # 3.监听异步队列，调用方提前关闭时取消图程序
+        try:
+            async for agent_thought in self._agent_queue_manager.alisten(input["task_id"], idle_interval):
+                yield agent_thought
+        finally:
+            if not task.done():
+                task.cancel()
+
+    def _prepare_input(self, input: Input) -> Input:
+        """检测智能体是否构建，并构建对应的任务id以及初始化状态"""
         if not self._agent:
             raise FailedException("智能体未构建")
 
-        # 构建对应的任务id并初始化
         input["task_id"] = input.get("task_id", str(uuid.uuid4()))
         input["history"] = input.get("history", [])
         input["iteration_count"] = input.get("iteration_count", 0)
-
-        # 创建子线程并执行
-        thread = Thread(
-            target=self._agent.invoke,
-            args=(input,),
-            kwargs=kwargs,
-        )
-        thread.start()
-
-        # 监听队列
-        yield from self._agent_queue_manager.listen(input["task_id"])
+        return input
+
+    def _handle_agent_done(self, task_id: str, future: Union[Future, asyncio.Future]) -> None:
+        """图程序执行结束的回调，未被节点处理的异常转换为错误事件，避免监听方一直等待到超时"""
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            logging.error(f"智能体执行出错, 错误信息: {str(error)}", exc_info=error)
+            self._agent_queue_manager.publish_error(task_id, error)
 
     @property
     def agent_queue_manager(self) -> AgentQueueManager:
@@ -1,21 +1,27 @@
+import asyncio
 import json
 import logging
 import re
 import time
 import uuid
-from typing import Literal
+from dataclasses import dataclass, field
+from typing import Any, Literal, Optional
+from uuid import UUID
 
+from langchain_core.language_models import BaseLanguageModel
 from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage, RemoveMessage, AIMessage
-from langchain_core.messages import messages_to_dict
+from langchain_core.messages import BaseMessageChunk, messages_to_dict
 from langgraph.constants import END
 from langgraph.graph import StateGraph
 from langgraph.graph.state import CompiledStateGraph
+from pydantic import PrivateAttr
 
 from internal.core.agent.entities.agent_entity import (
     AgentState,
     AGENT_SYSTEM_PROMPT_TEMPLATE,
     DATASET_RETRIEVAL_TOOL_NAME,
     MAX_ITERATION_RESPONSE,
+    TOOL_CALL_TIMEOUT_RESPONSE,
 )
 from internal.core.agent.entities.queue_entity import AgentThought, QueueEvent
 from internal.exception import FailedException
@@ -26,6 +32,7 @@ class FunctionCallAgent(BaseAgent):
     """基于函数/工具调用的智能体"""
 
     name:str = "FunctionCallAgent"
+    _bound_llm: BaseLanguageModel = PrivateAttr(None)
 
     def _build_agent(self) -> CompiledStateGraph:
         """构建LangGraph图结构编译程序"""
@@ -35,8 +42,8 @@ class FunctionCallAgent(BaseAgent):
         # 2.添加节点
         graph.add_node("preset_operation", self._preset_operation_node)
         graph.add_node("long_term_memory_recall", self._long_term_memory_recall_node)
-        graph.add_node("llm", self._llm_node)
-        graph.add_node("tools", self._tools_node)
+        graph.add_node("llm", self._allm_node)
+        graph.add_node("tools", self._atools_node)
 
         # 3.添加边，并设置起点和终点
         graph.set_entry_point("preset_operation")
@@ -45,7 +52,10 @@ class FunctionCallAgent(BaseAgent):
         graph.add_conditional_edges("llm", self._tools_condition)
         graph.add_edge("tools", "llm")
 
-        # 4.编译应用并返回
+        # 4.绑定工具后的大语言模型在智能体内复用，避免每次迭代重复绑定
+        self._bound_llm = self._bind_llm()
+
+        # 5.编译应用并返回
         agent = graph.compile()
 
         return agent
@@ -123,146 +133,103 @@ class FunctionCallAgent(BaseAgent):
             "messages": [RemoveMessage(id=human_message.id), *preset_messages],
         }
 
-    def _llm_node(self, state: AgentState) -> AgentState:
-        """大语言模型节点"""
+    async def _allm_node(self, state: AgentState) -> AgentState:
+        """大语言模型节点，图程序统一通过ainvoke执行，使用LLM的异步流式接口"""
         # 1.检测当前Agent迭代次数是否符合需求
         if state["iteration_count"] > self.agent_config.max_iteration_count:
-            self.agent_queue_manager.publish(
-                state["task_id"],
-                AgentThought(
-                    id=uuid.uuid4(),
-                    task_id=state["task_id"],
-                    event=QueueEvent.AGENT_MESSAGE,
-                    thought=MAX_ITERATION_RESPONSE,
-                    message=messages_to_dict(state["messages"]),
-                    answer=MAX_ITERATION_RESPONSE,
-                    latency=0,
-                ))
-            self.agent_queue_manager.publish(
-                state["task_id"],
-                AgentThought(
-                    id=uuid.uuid4(),
-                    task_id=state["task_id"],
-                    event=QueueEvent.AGENT_END,
-                ))
-            return {"messages": [AIMessage(MAX_ITERATION_RESPONSE)]}
-
-        # 2.从智能体配置中提取大语言模型
-        id = uuid.uuid4()
-        start_at = time.perf_counter()
-        llm = self.llm
+            return self._max_iteration_response(state)
 
-        # 3.检测大语言模型实例是否有bind_tools方法，如果没有则不绑定，如果有还需要检测tools是否为空，不为空则绑定
-        if hasattr(llm, "bind_tools") and callable(getattr(llm, "bind_tools")) and len(self.agent_config.tools) > 0:
-            llm = llm.bind_tools(self.agent_config.tools)
-
-        # 4.流式调用LLM输出对应内容
-        gathered = None
-        is_first_chunk = True
-        generation_type = ""
+        # 2.异步流式调用LLM输出对应内容
+        handler = LLMStreamHandler(agent=self, state=state)
         try:
-            for chunk in llm.stream(state["messages"]):
-                if is_first_chunk:
-                    gathered = chunk
-                    is_first_chunk = False
-                else:
-                    gathered += chunk
-
-                # 5.检测生成类型是工具参数还是文本生成
-                if not generation_type:
-                    if chunk.tool_calls:
-                        generation_type = "thought"
-                    elif chunk.content:
-                        generation_type = "message"
-
-                # 6.如果生成的是消息则提交智能体消息事件
-                if generation_type == "message":
-                    # 7.提取片段内容并检测是否开启输出审核
-                    review_config = self.agent_config.review_config
-                    content = chunk.content
-                    if review_config["enable"] and review_config["outputs_config"]["enable"]:
-                        for keyword in review_config["keywords"]:
-                            content = re.sub(re.escape(keyword), "**", content, flags=re.IGNORECASE)
-
-                    self.agent_queue_manager.publish(state["task_id"], AgentThought(
-                        id=id,
-                        task_id=state["task_id"],
-                        event=QueueEvent.AGENT_MESSAGE,
-                        thought=content,
-                        message=messages_to_dict(state["messages"]),
-                        answer=content,
-                        latency=(time.perf_counter() - start_at),
-                    ))
+            async for chunk in self._bound_llm.astream(state["messages"]):
+                handler.on_chunk(chunk)
         except Exception as e:
-            logging.exception(f"LLM节点发生错误, 错误信息: {str(e)}")
-            self.agent_queue_manager.publish_error(state["task_id"], f"LLM节点发生错误, 错误信息: {str(e)}")
+            handler.on_error(e)
             raise e
 
-        # 6.如果类型为推理则添加智能体推理事件
-        if generation_type == "thought":
-            self.agent_queue_manager.publish(state["task_id"], AgentThought(
-                id=id,
+        # 3.提交结束事件并返回合并后的消息
+        return handler.finish()
+
+    def _max_iteration_response(self, state: AgentState) -> AgentState:
+        """超过最大迭代次数时直接返回提示内容并结束监听"""
+        self.agent_queue_manager.publish(
+            state["task_id"],
+            AgentThought(
+                id=uuid.uuid4(),
                 task_id=state["task_id"],
-                event=QueueEvent.AGENT_THOUGHT,
-                thought=json.dumps(gathered.tool_calls),
+                event=QueueEvent.AGENT_MESSAGE,
+                thought=MAX_ITERATION_RESPONSE,
                 message=messages_to_dict(state["messages"]),
-                latency=(time.perf_counter() - start_at),
+                answer=MAX_ITERATION_RESPONSE,
+                latency=0,
             ))
-        elif generation_type == "message":
-            # 7.如果LLM直接生成answer则表示已经拿到了最终答案，则停止监听
-            self.agent_queue_manager.publish(state["task_id"], AgentThought(
+        self.agent_queue_manager.publish(
+            state["task_id"],
+            AgentThought(
                 id=uuid.uuid4(),
                 task_id=state["task_id"],
                 event=QueueEvent.AGENT_END,
             ))
+        return {"messages": [AIMessage(MAX_ITERATION_RESPONSE)]}
 
-        return {"messages": [gathered], "iteration_count": state["iteration_count"] + 1}
-
-    def _tools_node(self, state: AgentState) -> AgentState:
-        """工具执行节点"""
-        # 1.将工具列表转换成字典，便于调用指定的工具
+    def _bind_llm(self) -> BaseLanguageModel:
+        """检测大语言模型实例是否有bind_tools方法，如果没有则不绑定，如果有还需要检测tools是否为空，不为空则绑定"""
+        llm = self.llm
+        if hasattr(llm, "bind_tools") and callable(getattr(llm, "bind_tools")) and len(self.agent_config.tools) > 0:
+            llm = llm.bind_tools(self.agent_config.tools)
+        return llm
+
+    def _publish_tool_result(self, task_id: UUID, tool_call: dict, tool_result: Any, latency: float) -> ToolMessage:
+        """根据工具结果提交不同事件，涵盖智能体动作以及知识库检索，并返回对应的工具消息"""
+        observation = json.dumps(tool_result)
+        event = (
+            QueueEvent.AGENT_ACTION
+            if tool_call["name"] != DATASET_RETRIEVAL_TOOL_NAME
+            else QueueEvent.DATASET_RETRIEVAL
+        )
+        self.agent_queue_manager.publish(task_id, AgentThought(
+            id=uuid.uuid4(),
+            task_id=task_id,
+            event=event,
+            observation=observation,
+            tool=tool_call["name"],
+            tool_input=tool_call["args"],
+            latency=latency,
+        ))
+
+        return ToolMessage(
+            tool_call_id=tool_call["id"],
+            content=observation,
+            name=tool_call["name"],
+        )
+
+    async def _atools_node(self, state: AgentState) -> AgentState:
+        """工具执行节点，使用工具的异步接口并发执行，信号量限制并发数，超时的调用会被取消"""
+        # 1.将工具列表转换成字典，并提取消息中的工具调用参数
         tools_by_name = {tool.name: tool for tool in self.agent_config.tools}
-
-        # 2.提取消息中的工具调用参数
         tool_calls = state["messages"][-1].tool_calls
-
-        # 3.循环执行工具组装工具消息
-        messages = []
-        for tool_call in tool_calls:
-            # 4.创建智能体动作事件id并记录开始时间
-            id = uuid.uuid4()
-            start_at = time.perf_counter()
-
-            try:
-                # 5.获取工具并调用工具
-                tool = tools_by_name[tool_call["name"]]
-                tool_result = tool.invoke(tool_call["args"])
-            except Exception as e:
-                # 6.添加错误工具信息
-                tool_result = f"工具执行出错: {str(e)}"
-
-            # 7.将工具消息添加到消息列表中
-            messages.append(ToolMessage(
-                tool_call_id=tool_call["id"],
-                content=json.dumps(tool_result),
-                name=tool_call["name"],
-            ))
-
-            # 7.判断执行工具的名字，提交不同事件，涵盖智能体动作以及知识库检索
-            event = (
-                QueueEvent.AGENT_ACTION
-                if tool_call["name"] != DATASET_RETRIEVAL_TOOL_NAME
-                else QueueEvent.DATASET_RETRIEVAL
-            )
-            self.agent_queue_manager.publish(state["task_id"], AgentThought(
-                id=id,
-                task_id=state["task_id"],
-                event=event,
-                observation=json.dumps(tool_result),
-                tool=tool_call["name"],
-                tool_input=tool_call["args"],
-                latency=(time.perf_counter() - start_at),
-            ))
+        timeout = self.agent_config.tool_call_timeout
+        semaphore = asyncio.Semaphore(max(1, self.agent_config.max_tool_concurrency))
+
+        async def ainvoke_tool(index: int, tool_call: dict) -> tuple[int, Any, float]:
+            """执行单个工具调用，返回调用索引、工具结果与耗时"""
+            async with semaphore:
+                start_at = time.perf_counter()
+                try:
+                    tool = tools_by_name[tool_call["name"]]
+                    tool_result = await asyncio.wait_for(tool.ainvoke(tool_call["args"]), timeout=timeout)
+                except asyncio.TimeoutError:
+                    tool_result = TOOL_CALL_TIMEOUT_RESPONSE
+                except Exception as e:
+                    tool_result = f"工具执行出错: {str(e)}"
+                return index, tool_result, time.perf_counter() - start_at
+
+        # 2.每个调用完成时立即提交事件，工具消息保持原始顺序
+        messages: list[Optional[ToolMessage]] = [None] * len(tool_calls)
+        for coro in asyncio.as_completed([ainvoke_tool(index, tool_call) for index, tool_call in enumerate(tool_calls)]):
+            index, tool_result, latency = await coro
+            messages[index] = self._publish_tool_result(state["task_id"], tool_calls[index], tool_result, latency)
 
         return {"messages": messages}
 
@@ -290,3 +257,91 @@ class FunctionCallAgent(BaseAgent):
             return END
 
         return "long_term_memory_recall"
+
+
+@dataclass
+class LLMStreamHandler:
+    """LLM流式输出处理器，消息快照只在事件的首个增量帧中携带，后续增量帧只包含新生成的内容"""
+    agent: FunctionCallAgent
+    state: AgentState
+    id: UUID = field(default_factory=uuid.uuid4)
+    start_at: float = field(default_factory=time.perf_counter)
+    chunks: list[BaseMessageChunk] = field(default_factory=list)
+    generation_type: str = ""
+    message_snapshot: Optional[list[dict]] = None
+    review_pattern: Optional[re.Pattern] = None
+
+    def __post_init__(self) -> None:
+        """输出审核的敏感词正则只编译一次，避免每个片段重复处理配置"""
+        review_config = self.agent.agent_config.review_config
+        if review_config["enable"] and review_config["outputs_config"]["enable"] and review_config["keywords"]:
+            self.review_pattern = re.compile(
+                "|".join(re.escape(keyword) for keyword in review_config["keywords"]),
+                flags=re.IGNORECASE,
+            )
+
+    def on_chunk(self, chunk: BaseMessageChunk) -> None:
+        """处理LLM输出的单个片段"""
+        self.chunks.append(chunk)
+
+        # 1.检测生成类型是工具参数还是文本生成
+        if not self.generation_type:
+            if chunk.tool_calls:
+                self.generation_type = "thought"
+            elif chunk.content:
+                self.generation_type = "message"
+
+        # 2.如果生成的是消息则提交智能体消息增量事件
+        if self.generation_type == "message":
+            # 3.提取片段内容并检测是否开启输出审核
+            content = chunk.content
+            if self.review_pattern is not None:
+                content = self.review_pattern.sub("**", content)
+
+            if self.message_snapshot is None:
+                self.message_snapshot = messages_to_dict(self.state["messages"])
+                message = self.message_snapshot
+            else:
+                message = []
+
+            self.agent.agent_queue_manager.publish(self.state["task_id"], AgentThought(
+                id=self.id,
+                task_id=self.state["task_id"],
+                event=QueueEvent.AGENT_MESSAGE,
+                thought=content,
+                message=message,
+                answer=content,
+                latency=(time.perf_counter() - self.start_at),
+            ))
+
+    def on_error(self, e: Exception) -> None:
+        """LLM调用出错时记录日志并提交错误事件"""
+        logging.exception(f"LLM节点发生错误, 错误信息: {str(e)}")
+        self.agent.agent_queue_manager.publish_error(self.state["task_id"], f"LLM节点发生错误, 错误信息: {str(e)}")
+
+    def finish(self) -> AgentState:
+        """流式输出结束后一次性合并所有片段，并根据生成类型提交推理事件或结束事件"""
+        # 1.合并所有片段，避免逐片段累加
+        gathered = None
+        for chunk in self.chunks:
+            gathered = chunk if gathered is None else gathered + chunk
+
+        # 2.如果类型为推理则添加智能体推理事件
+        if self.generation_type == "thought":
+            self.agent.agent_queue_manager.publish(self.state["task_id"], AgentThought(
+                id=self.id,
+                task_id=self.state["task_id"],
+                event=QueueEvent.AGENT_THOUGHT,
+                thought=json.dumps(gathered.tool_calls),
+                message=messages_to_dict(self.state["messages"]),
+                latency=(time.perf_counter() - self.start_at),
+            ))
+        elif self.generation_type == "message":
+            # 3.如果LLM直接生成answer则表示已经拿到了最终答案，则停止监听
+            self.agent.agent_queue_manager.publish(self.state["task_id"], AgentThought(
+                id=uuid.uuid4(),
+                task_id=self.state["task_id"],
+                event=QueueEvent.AGENT_END,
+            ))
+
+        return {"messages": [gathered], "iteration_count": self.state["iteration_count"] + 1}
@@ -52,6 +52,10 @@ class AgentConfig(BaseModel):
     # 最大迭代次数
     max_iteration_count: int = 5
 
+    # 同一轮工具调用的最大并发数，以及单个工具调用的超时时间(秒)
+    max_tool_concurrency: int = 4
+    tool_call_timeout: float = 60
+
 class AgentState(MessagesState):
     """智能体状态类"""
     task_id: UUID # 状态与任务关联
@@ -63,4 +67,7 @@ class AgentState(MessagesState):
 DATASET_RETRIEVAL_TOOL_NAME="dataset_retrieval"
 
 # agent超过最大迭代次数时提示内容
-MAX_ITERATION_RESPONSE = "当前Agent迭代次数已经超过限制，请重试"
\ No newline at end of file
+MAX_ITERATION_RESPONSE = "当前Agent迭代次数已经超过限制，请重试"
+
+# 工具调用超时时返回给LLM的内容
+TOOL_CALL_TIMEOUT_RESPONSE = "工具执行超时，请稍后重试"
\ No newline at end of file
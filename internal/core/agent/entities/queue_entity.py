@@ -35,7 +35,7 @@ class AgentThought(BaseModel):
     tool_input: dict = Field(default_factory=dict)  # 工具的输入
 
     # 消息相关的数据
-    message: list[dict] = Field(default_factory=dict)  # 推理使用的消息列表
+    message: list[dict] = Field(default_factory=list)  # 推理使用的消息列表，agent_message事件只在首个增量帧中携带
     message_token_count: int = 0  # 消息花费的token数
     message_unit_price: float = 0  # 单价
     message_price_unit: float = 0  # 价格单位
@@ -51,6 +51,9 @@ class AgentThought(BaseModel):
     total_price: float = 0  # 总价格
     latency: float = 0  # 步骤推理耗时
 
+    # 事件在任务事件流中的偏移量，使用redis stream队列时用于断线后继续读取
+    offset: str = ""
+
 
 class AgentResult(BaseModel):
     """智能体推理观察结果"""
@@ -73,3 +76,54 @@ class AgentResult(BaseModel):
     error:str = "" # 错误信息
 
     agent_thoughts: list[AgentThought] = Field(default_factory=list)
+
+
+class AgentThoughtCollector:
+    """智能体事件收集器，agent_message增量帧的内容使用列表缓冲，读取时一次性拼接，避免逐帧复制事件与字符串"""
+
+    def __init__(self) -> None:
+        self._agent_thoughts: dict[str, AgentThought] = {}
+        self._thoughts: dict[str, list[str]] = {}
+        self._answers: dict[str, list[str]] = {}
+        self._latencies: dict[str, float] = {}
+
+    def add(self, agent_thought: AgentThought) -> None:
+        """收集事件，ping事件直接忽略，agent_message为叠加，其他事件均为覆盖"""
+        if agent_thought.event == QueueEvent.PING:
+            return
+
+        event_id = str(agent_thought.id)
+        if agent_thought.event == QueueEvent.AGENT_MESSAGE:
+            # 1.首个增量帧携带消息快照，作为事件的基础数据
+            if event_id not in self._answers:
+                self._agent_thoughts[event_id] = agent_thought
+                self._thoughts[event_id] = []
+                self._answers[event_id] = []
+            self._thoughts[event_id].append(agent_thought.thought)
+            self._answers[event_id].append(agent_thought.answer)
+            self._latencies[event_id] = agent_thought.latency
+        else:
+            # 2.其他类型的事件直接覆盖
+            self._agent_thoughts[event_id] = agent_thought
+            self._thoughts.pop(event_id, None)
+            self._answers.pop(event_id, None)
+            self._latencies.pop(event_id, None)
+
+    @property
+    def answer(self) -> str:
+        """所有agent_message事件拼接后的答案"""
+        return "".join("".join(answers) for answers in self._answers.values())
+
+    @property
+    def agent_thoughts(self) -> list[AgentThought]:
+        """按事件首次出现的顺序返回拼接后的事件列表"""
+        agent_thoughts = []
+        for event_id, agent_thought in self._agent_thoughts.items():
+            if event_id in self._answers:
+                agent_thought = agent_thought.model_copy(update={
+                    "thought": "".join(self._thoughts[event_id]),
+                    "answer": "".join(self._answers[event_id]),
+                    "latency": self._latencies[event_id],
+                })
+            agent_thoughts.append(agent_thought)
+        return agent_thoughts
@@ -1,5 +1,6 @@
 import os.path
 import tempfile
+from concurrent.futures import Executor
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -30,8 +31,9 @@ class FileExtractor:
     def load(self,
              upload_file:UploadFile,
              return_text:bool=False,
-             is_unstructured:bool=False) -> list[Document] | str:
-        """加载文件"""
+             is_unstructured:bool=False,
+             executor:Executor | None=None) -> list[Document] | str:
+        """加载文件，传递executor(如进程池)时解析工作会提交到该执行器中完成"""
         # 1.创建一个临时文件夹
         with tempfile.TemporaryDirectory() as tmp_dir:
             # 构建一个临时文件路径
@@ -39,7 +41,9 @@ class FileExtractor:
             # 从cos中下载文件
             self.cos_service.download_file(upload_file.key, file_path)
 
-            # 加载文件
+            # 加载文件，解析属于CPU密集型任务，可以交给进程池执行
+            if executor is not None:
+                return executor.submit(self.load_from_file, file_path, return_text, is_unstructured).result()
             return self.load_from_file(file_path, return_text, is_unstructured)
 
     @classmethod
@@ -1,16 +1,28 @@
+import json
 from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Optional
+from uuid import UUID
 
 from langchain_core.messages import (
     AnyMessage,AIMessage,HumanMessage,
-    trim_messages, get_buffer_string
+    get_buffer_string
 )
-from sqlalchemy import desc
+from redis import Redis
+from sqlalchemy import asc, desc
 
+from internal.entity.cache_entity import CONVERSATION_HISTORY_CACHE_KEY, CONVERSATION_HISTORY_CACHE_EXPIRE
 from internal.entity.conversation_entity import MessageStatus
 from internal.model import Conversation, Message
 from pkg.sqlalchemy import SQLAlchemy
 from langchain_core.language_models import BaseLanguageModel
 
+# 会话历史缓存最多保留的问答条数，与应用配置中对话轮数的上限一致
+HISTORY_CACHE_MAX_SIZE = 100
+
+# 每条消息在token计数之外的固定开销(角色、分隔符等)
+MESSAGE_TOKEN_OVERHEAD = 4
+
 
 @dataclass
 class TokenBufferMemory:
@@ -24,36 +36,99 @@ class TokenBufferMemory:
             self, max_token_count: int = 2000,
             message_limit: int = 10
     ) -> list[AnyMessage]:
-        """根据传递的token限制和条数限制，获取指定会话的消息列表"""
+        """根据传递的token限制和条数限制，获取指定会话的消息列表，消息的token数在写入时已经计算，只需按轮累加截断"""
         if self.conversation is None:
             return []
 
-        # 查询会话消息列表，倒叙，而且答案不为空+未删除+状态正常
+        # 1.获取最近的历史问答，优先读取缓存
+        entries = self.get_history_entries(message_limit)
+
+        # 2.从最近的一轮开始累加token数，超过限制时停止，保证人类消息与AI消息成对出现
+        selected_entries = []
+        total_token_count = 0
+        for entry in reversed(entries):
+            total_token_count += (
+                    entry["query_token_count"] + entry["answer_token_count"] + 2 * MESSAGE_TOKEN_OVERHEAD
+            )
+            if total_token_count > max_token_count:
+                break
+            selected_entries.append(entry)
+
+        # 3.转化成LangChain消息列表
+        prompt_messages = []
+        for entry in reversed(selected_entries):
+            prompt_messages.extend([
+                HumanMessage(content=entry["query"]),
+                AIMessage(content=entry["answer"]),
+            ])
+
+        return prompt_messages
+
+    def get_history_entries(self, message_limit: int = 10) -> list[dict[str, Any]]:
+        """获取会话最近的问答记录(正序)，缓存不存在时从数据库加载最近的消息并写入缓存"""
+        if message_limit <= 0:
+            return []
+
+        # 1.条数在缓存窗口内时直接读取缓存
+        cache_key = CONVERSATION_HISTORY_CACHE_KEY.format(conversation_id=self.conversation.id)
+        if message_limit <= HISTORY_CACHE_MAX_SIZE:
+            cached_entries = self.redis_client.lrange(cache_key, -message_limit, -1)
+            if cached_entries:
+                return [json.loads(entry) for entry in cached_entries]
+
+        # 2.查询会话消息列表，倒序，而且答案不为空+未删除+状态正常
         messages = self.db.session.query(Message).filter(
             Message.conversation_id == self.conversation.id,
             Message.answer != "",
             Message.is_deleted == False,
             Message.status.in_([MessageStatus.NORMAL, MessageStatus.STOP, MessageStatus.TIMEOUT])
-        ).order_by(desc("created_at")).limit(message_limit).all()
+        ).order_by(desc("created_at")).limit(max(message_limit, HISTORY_CACHE_MAX_SIZE)).all()
+        entries = [self._to_history_entry(message) for message in reversed(messages)]
 
-        messages = list(reversed(messages))
+        # 3.将最近的消息写入缓存
+        if entries:
+            pipeline = self.redis_client.pipeline()
+            pipeline.delete(cache_key)
+            pipeline.rpush(cache_key, *[json.dumps(entry) for entry in entries[-HISTORY_CACHE_MAX_SIZE:]])
+            pipeline.expire(cache_key, CONVERSATION_HISTORY_CACHE_EXPIRE)
+            pipeline.execute()
 
-        # 转化成lcdocument列表
-        prompt_messages = []
-        for message in messages:
-            prompt_messages.extend([
-                HumanMessage(content=message.query),
-                AIMessage(content=message.answer),
-            ])
+        return entries[-message_limit:]
 
-        # 调用langchain的工具剪切消息
-        return trim_messages(
-            prompt_messages,
-            max_tokens=max_token_count,
-            token_counter=self.model_instance,
-            strategy="last"
-        )
+    @classmethod
+    def append_history_entry(cls, conversation_id: UUID, entry: dict[str, Any]) -> None:
+        """将新的问答追加到会话历史缓存，缓存不存在时不创建，等待下一次读取时从数据库加载"""
+        from app.http.module import injector
+        redis_client = injector.get(Redis)
+
+        cache_key = CONVERSATION_HISTORY_CACHE_KEY.format(conversation_id=conversation_id)
+        pipeline = redis_client.pipeline()
+        pipeline.rpushx(cache_key, json.dumps(entry))
+        pipeline.ltrim(cache_key, -HISTORY_CACHE_MAX_SIZE, -1)
+        pipeline.expire(cache_key, CONVERSATION_HISTORY_CACHE_EXPIRE)
+        pipeline.execute()
 
+    @property
+    def redis_client(self) -> Redis:
+        """内部获取redis客户端"""
+        from app.http.module import injector
+        return injector.get(Redis)
+
+    def _to_history_entry(self, message: Message) -> dict[str, Any]:
+        """将消息转换为历史问答记录，历史数据没有token数时使用模型实时计算"""
+        query_token_count = message.query_token_count
+        if not query_token_count and message.query:
+            query_token_count = self.model_instance.get_num_tokens(message.query)
+        answer_token_count = message.answer_token_count
+        if not answer_token_count and message.answer:
+            answer_token_count = self.model_instance.get_num_tokens(message.answer)
+
+        return {
+            "query": message.query,
+            "answer": message.answer,
+            "query_token_count": query_token_count,
+            "answer_token_count": answer_token_count,
+        }
 
     def get_history_prompt_text(
             self, human_prefix:str = "Human",
@@ -65,3 +140,40 @@ class TokenBufferMemory:
         message = self.get_history_prompt_messages(max_token_count, message_limit)
 
         return get_buffer_string(message, human_prefix, ai_prefix)
+
+
+    def get_unsummarized_prompt_messages(
+            self,
+            summarized_at: Optional[datetime] = None,
+            message_limit: int = 50,
+    ) -> tuple[list[AnyMessage], Optional[datetime]]:
+        """获取会话中创建时间晚于summarized_at的消息列表(正序)，以及其中最后一条消息的创建时间"""
+        if self.conversation is None:
+            return [], None
+
+        # 1.查询尚未被摘要的会话消息，答案不为空+未删除+状态正常
+        query = self.db.session.query(Message).filter(
+            Message.conversation_id == self.conversation.id,
+            Message.answer != "",
+            Message.is_deleted == False,
+            Message.status.in_([MessageStatus.NORMAL, MessageStatus.STOP, MessageStatus.TIMEOUT])
+        )
+        if summarized_at is not None:
+            query = query.filter(Message.created_at > summarized_at)
+        messages = query.order_by(asc("created_at")).limit(message_limit).all()
+
+        # 2.转化成LangChain消息列表
+        prompt_messages = []
+        for message in messages:
+            prompt_messages.extend([
+                HumanMessage(content=message.query),
+                AIMessage(content=message.answer),
+            ])
+
+        return prompt_messages, messages[-1].created_at if messages else None
+
+    def count_tokens(self, prompt_messages: list[AnyMessage]) -> int:
+        """使用记忆组件的模型计算消息列表的token数"""
+        if not prompt_messages:
+            return 0
+        return self.model_instance.get_num_tokens_from_messages(prompt_messages)
@@ -1,4 +1,5 @@
 from .semantic_retriever import SemanticRetriever
 from .full_text_retriever import FullTextRetriever
+from .hybrid_retriever import HybridRetriever
 
-__all__ = ["SemanticRetriever", "FullTextRetriever"]
\ No newline at end of file
+__all__ = ["SemanticRetriever", "FullTextRetriever", "HybridRetriever"]
\ No newline at end of file
@@ -1,18 +1,24 @@
-import collections
+import heapq
+import math
 from uuid import UUID
 
 from langchain_core.callbacks import CallbackManagerForRetrieverRun
 from langchain_core.documents import Document as LCDocument
 from langchain_core.retrievers import BaseRetriever
 from pydantic import Field
+from sqlalchemy import func
 
 from pkg.sqlalchemy import SQLAlchemy
 from internal.service import JiebaService
-from internal.model import KeywordTable, Segment
+from internal.model import KeywordIndex, KeywordIndexStat, Segment
+
+# BM25的词频饱和参数与片段长度归一化参数
+BM25_K1 = 1.2
+BM25_B = 0.75
 
 
 class FullTextRetriever(BaseRetriever):
-    """全文检索器"""
+    """全文检索器，基于keyword_index倒排索引计算BM25得分"""
     db: SQLAlchemy
     jieba_service: JiebaService
     dataset_ids: list[UUID]
@@ -23,54 +29,96 @@ class FullTextRetriever(BaseRetriever):
             run_manager: CallbackManagerForRetrieverRun
     ) -> list[LCDocument]:
         """根据传递的query执行关键词检索"""
-        keywords = self.jieba_service.extract_keywords(query, 10)
+        return self.hydrate(self.search_segment_ids(query, self.search_kwargs.get("k", 4)))
+
+    def search_segment_ids(self, query: str, k: int) -> list[tuple[str, float]]:
+        """执行BM25关键词检索，只返回排序后的(片段id, 得分)列表，不加载片段内容"""
+        keywords = list(set(self.jieba_service.extract_keywords(query, 10)))
+
+        if not keywords:
+            return []
+
+        # 1.读取知识库统计，得到片段总数N与平均片段长度
+        segment_total, token_total = self.db.session.query(
+            func.coalesce(func.sum(KeywordIndexStat.segment_count), 0),
+            func.coalesce(func.sum(KeywordIndexStat.token_count), 0),
+        ).filter(KeywordIndexStat.dataset_id.in_(self.dataset_ids)).one()
+        if segment_total == 0:
+            return []
+        avg_length = max(token_total / segment_total, 1)
+
+        # 2.直接查找查询关键词的倒排记录，文档频率由倒排记录数得到，查询耗时与词表大小无关
+        postings = self.db.session.query(
+            KeywordIndex.segment_id, KeywordIndex.keyword, KeywordIndex.frequency, KeywordIndex.token_count,
+        ).filter(
+            KeywordIndex.dataset_id.in_(self.dataset_ids),
+            KeywordIndex.keyword.in_(keywords),
+        ).all()
+
+        # 3.计算每个片段的BM25得分
+        scores = self.bm25_scores(
+            postings,
+            segment_total,
+            avg_length,
+            self.search_kwargs.get("k1", BM25_K1),
+            self.search_kwargs.get("b", BM25_B),
+        )
 
-        # 查询关键词列表
-        keyword_tables = [
-                keyword_table for keyword_table, in self.db.session.query(KeywordTable.keyword_table).filter(
-                KeywordTable.dataset_id.in_(self.dataset_ids),
-            ).all()
+        # 4.按得分排序取前k个，并过滤低于阈值的片段
+        score_threshold = self.search_kwargs.get("score_threshold", 0)
+        return [
+            (segment_id, score)
+            for segment_id, score in heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            if score >= score_threshold
         ]
 
-        # 遍历所有的知识库关键词表，找到匹配query关键词的id列表
-        all_ids = []
+    @classmethod
+    def bm25_scores(
+            cls,
+            postings: list[tuple],
+            segment_total: int,
+            avg_length: float,
+            k1: float = BM25_K1,
+            b: float = BM25_B,
+    ) -> dict[str, float]:
+        """根据倒排记录(片段id, 关键词, 词频, 片段长度)计算每个片段的BM25得分，文档频率由倒排记录数得到"""
+        document_frequency: dict[str, int] = {}
+        for _, keyword, _, _ in postings:
+            document_frequency[keyword] = document_frequency.get(keyword, 0) + 1
 
-        for keyword_table in keyword_tables:
-            for keyword, segment_ids in keyword_table.items():
-                if keyword in keywords:
-                    all_ids.extend(segment_ids)
+        scores: dict[str, float] = {}
+        for segment_id, keyword, frequency, token_count in postings:
+            df = document_frequency[keyword]
+            idf = math.log(1 + (segment_total - df + 0.5) / (df + 0.5))
+            length_norm = 1 - b + b * (token_count or avg_length) / avg_length
+            score = idf * frequency * (k1 + 1) / (frequency + k1 * length_norm)
+            scores[str(segment_id)] = scores.get(str(segment_id), 0) + score
+        return scores
 
-        # 统计document_id出现的次数
-        segment_id_counts=collections.Counter(all_ids)
-        # 获取频率最高的前k个数据
-        k = self.search_kwargs.pop("k", 4)
-        top_k_ids = segment_id_counts.most_common(k)
+    def hydrate(self, segment_scores: list[tuple[str, float]]) -> list[LCDocument]:
+        """使用一条查询加载片段，并按传入的顺序转换为lc文档列表"""
+        if not segment_scores:
+            return []
 
         # 根据得到的id列表检索数据库，得到片段列表数据
-        segments=self.db.session.query(Segment).filter(
-            Segment.id.in_([segment_id for segment_id, _ in top_k_ids]),
+        segments = self.db.session.query(Segment).filter(
+            Segment.id.in_([segment_id for segment_id, _ in segment_scores]),
         ).all()
-
         segments_dict = {
             str(segment.id): segment for segment in segments
         }
 
-        # 根据频率进行排序
-        sorted_segment=[segments_dict[str(id)] for id, freq in top_k_ids if id in segments_dict]
-
-        # 转化为lc文档列表
-        lc_documents = [LCDocument(
-            page_content=segment.content,
+        # 按传入的顺序转化为lc文档列表
+        return [LCDocument(
+            page_content=segments_dict[segment_id].content,
             metadata={
-                "account_id": str(segment.account_id),
-                "dataset_id": str(segment.dataset_id),
-                "document_id": str(segment.document_id),
-                "segment_id": str(segment.id),
-                "node_id": str(segment.node_id),
+                "account_id": str(segments_dict[segment_id].account_id),
+                "dataset_id": str(segments_dict[segment_id].dataset_id),
+                "document_id": str(segments_dict[segment_id].document_id),
+                "segment_id": segment_id,
+                "node_id": str(segments_dict[segment_id].node_id),
                 "document_enabled": True,
                 "segment_enabled": True,
-                "score": 0
+                "score": score,
             }
-        ) for segment in sorted_segment]
-
-        return lc_documents
+        ) for segment_id, score in segment_scores if segment_id in segments_dict]
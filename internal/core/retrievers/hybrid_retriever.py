@@ -0,0 +1,56 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document as LCDocument
+from langchain_core.retrievers import BaseRetriever
+from pydantic import Field
+
+from .full_text_retriever import FullTextRetriever
+from .semantic_retriever import SemanticRetriever
+
+
+class HybridRetriever(BaseRetriever):
+    """混合检索器，并发执行语义检索与全文检索，并使用加权RRF(倒数排名融合)合并结果"""
+    semantic_retriever: SemanticRetriever
+    full_text_retriever: FullTextRetriever
+    weights: list[float] = Field(default_factory=lambda: [0.5, 0.5])
+    rrf_k: int = 60
+    candidate_depth: int = 20
+    search_kwargs: dict = Field(default_factory=dict)
+
+    def _get_relevant_documents(
+            self, query: str, *,
+            run_manager: CallbackManagerForRetrieverRun
+    ) -> list[LCDocument]:
+        """根据传递的query执行混合检索"""
+        k = self.search_kwargs.get("k", 4)
+        depth = max(k, self.candidate_depth)
+
+        # 1.语义检索不依赖数据库会话，放到线程池中执行，全文检索在当前线程(应用上下文)中执行
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            semantic_future = executor.submit(self.semantic_retriever.search, query, depth)
+            full_text_results = self.full_text_retriever.search_segment_ids(query, depth)
+            semantic_documents = semantic_future.result()
+
+        # 2.按排名计算加权RRF得分
+        scores = self.rrf_scores(
+            [
+                [str(lc_document.metadata["segment_id"]) for lc_document in semantic_documents],
+                [segment_id for segment_id, _ in full_text_results],
+            ],
+            self.weights,
+            self.rrf_k,
+        )
+
+        # 3.取融合得分最高的k个片段，使用一条查询加载片段内容
+        top_k = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return self.full_text_retriever.hydrate(top_k)
+
+    @classmethod
+    def rrf_scores(cls, rankings: list[list[str]], weights: list[float], rrf_k: int) -> dict[str, float]:
+        """加权RRF融合，每个排序列表中排名为rank(从0开始)的片段得分为weight/(rrf_k+rank+1)，多个列表的得分累加"""
+        scores: dict[str, float] = {}
+        for ranking, weight in zip(rankings, weights):
+            for rank, segment_id in enumerate(ranking):
+                scores[segment_id] = scores.get(segment_id, 0) + weight / (rrf_k + rank + 1)
+        return scores
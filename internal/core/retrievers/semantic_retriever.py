@@ -2,16 +2,18 @@ from uuid import UUID
 
 from langchain_core.callbacks import CallbackManagerForRetrieverRun
 from langchain_core.documents import Document as LCDocument
+from langchain_core.embeddings import Embeddings
 from langchain_core.retrievers import BaseRetriever
-from langchain_weaviate import WeaviateVectorStore
-from weaviate.classes.query import Filter
 from pydantic import Field
 
+from internal.core.vector_backend import BaseVectorBackend
+
 
 class SemanticRetriever(BaseRetriever):
     """语义检索器"""
     dataset_ids: list[UUID]
-    vector_store: WeaviateVectorStore
+    vector_backend: BaseVectorBackend
+    embeddings: Embeddings
     search_kwargs: dict=Field(default_factory=dict)
 
     def _get_relevant_documents(
@@ -19,20 +21,15 @@ class SemanticRetriever(BaseRetriever):
             run_manager: CallbackManagerForRetrieverRun
     ) -> list[LCDocument]:
         """根据传递的query执行相似性检索"""
+        return self.search(query, self.search_kwargs.get("k", 4))
 
-        # 获取默认的最大搜索条数
-        k = self.search_kwargs.pop("k", 4)
-        search_result = self.vector_store.similarity_search_with_relevance_scores(
-            query=query,
+    def search(self, query: str, k: int) -> list[LCDocument]:
+        """执行相似性检索，返回最多k条携带得分的文档"""
+        search_result = self.vector_backend.similarity_search(
+            vector=self.embeddings.embed_query(query),
+            dataset_ids=self.dataset_ids,
             k=k,
-            **{
-                "filters": Filter.any_of([
-                    Filter.by_property("dataset_id").contains_any([str(dataset_id) for dataset_id in self.dataset_ids]),
-                    Filter.by_property("document_enabled").equal(True),
-                    Filter.by_property("segment_enabled").equal(True),
-                ]),
-                **self.search_kwargs,
-            }
+            score_threshold=self.search_kwargs.get("score_threshold", 0),
         )
         if search_result is  None or len(search_result) == 0:
             return []
@@ -0,0 +1,9 @@
+from .base_vector_backend import BaseVectorBackend
+from .weaviate_vector_backend import WeaviateVectorBackend
+from .numpy_vector_backend import NumpyVectorBackend
+
+__all__ = [
+    "BaseVectorBackend",
+    "WeaviateVectorBackend",
+    "NumpyVectorBackend",
+]
@@ -0,0 +1,66 @@
+from abc import ABC, abstractmethod
+from typing import Any, Optional
+from uuid import UUID
+
+from langchain_core.documents import Document
+
+
+class BaseVectorBackend(ABC):
+    """向量存储后端基类，封装索引构建、片段维护以及检索所需的增删改查操作"""
+
+    @abstractmethod
+    def add_documents(self, documents: list[Document], vectors: list[list[float]], ids: list[str]) -> list[str]:
+        """写入已向量化的文档，文档元数据中必须包含dataset_id，返回写入失败的id列表"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def update(
+            self,
+            id: str,
+            properties: dict[str, Any],
+            vector: Optional[list[float]] = None,
+            dataset_id: Optional[UUID] = None,
+    ) -> None:
+        """根据id更新记录的属性，传递vector时同时更新向量，传递dataset_id时后端可以直接定位记录所在的知识库"""
+        raise NotImplementedError
+
+    def update_many(
+            self,
+            ids: list[str],
+            properties: dict[str, Any],
+            dataset_id: Optional[UUID] = None,
+    ) -> dict[str, str]:
+        """将多条记录更新为相同的属性，返回更新失败的记录id及错误信息，默认逐条更新，支持批量写入的后端可以重写该方法"""
+        failed: dict[str, str] = {}
+        for id in ids:
+            try:
+                self.update(id, properties, dataset_id=dataset_id)
+            except Exception as e:
+                failed[str(id)] = str(e)
+        return failed
+
+    @abstractmethod
+    def delete_by_ids(self, ids: list[str], dataset_id: Optional[UUID] = None) -> None:
+        """根据id列表删除记录，传递dataset_id时后端可以直接定位记录所在的知识库"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_by_document_id(self, document_id: UUID, dataset_id: Optional[UUID] = None) -> None:
+        """删除文档关联的所有记录，传递dataset_id时后端可以直接定位记录所在的知识库"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_by_dataset_id(self, dataset_id: UUID) -> None:
+        """删除知识库关联的所有记录"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def similarity_search(
+            self,
+            vector: list[float],
+            dataset_ids: list[UUID],
+            k: int = 4,
+            score_threshold: float = 0,
+    ) -> list[tuple[Document, float]]:
+        """在指定知识库中检索文档与片段均启用的记录，返回按相似度降序排列的(文档, 得分)列表"""
+        raise NotImplementedError
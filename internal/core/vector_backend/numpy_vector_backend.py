@@ -0,0 +1,437 @@
+import json
+import os
+import shutil
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import RLock
+from typing import Any, Callable, Optional
+from uuid import UUID
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .base_vector_backend import BaseVectorBackend
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows下没有fcntl，只保留进程内的锁
+    fcntl = None
+
+# 分区向量矩阵的初始容量，容量不足时成倍扩容
+PARTITION_INITIAL_CAPACITY = 1024
+
+# 存活行数低于总行数的该比例时压缩分区
+PARTITION_COMPACT_RATIO = 0.5
+
+# 进程内最多保留的已加载分区数，超过时淘汰最久未使用的分区
+PARTITION_CACHE_MAX_SIZE = 64
+
+# 兼容旧版分区的默认向量文件名
+DEFAULT_VECTORS_FILE = "vectors.npy"
+
+
+class DatasetPartition:
+    """单个知识库的向量分区，向量为内存映射到磁盘的float32矩阵，记录属性保存在json文件中，
+    记录文件中保存当前生效的向量文件名，重建向量矩阵时写入新文件，记录文件替换后才生效，
+    原地覆盖已提交的向量行前会备份原始数据，写入失败时可以回滚"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.vectors: Optional[np.ndarray] = None
+        self.vectors_file = DEFAULT_VECTORS_FILE
+        self.ids: list[str] = []
+        self.properties: list[dict[str, Any]] = []
+        self.alive: list[bool] = []
+        self.id_to_row: dict[str, int] = {}
+        self.mask = np.zeros(0, dtype=np.bool_)
+        self.version: Optional[int] = None
+        self._committed_vectors_file = DEFAULT_VECTORS_FILE
+        self._committed_size = 0
+        self._backup: dict[int, np.ndarray] = {}
+        self.load()
+
+    @property
+    def vectors_path(self) -> str:
+        return os.path.join(self.path, self.vectors_file)
+
+    @property
+    def records_path(self) -> str:
+        return os.path.join(self.path, "records.json")
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    def is_stale(self) -> bool:
+        """检测磁盘上的分区是否已被其他进程修改"""
+        return self._records_mtime() != self.version
+
+    def load(self) -> None:
+        """从磁盘加载分区，分区不存在时初始化为空分区"""
+        self.vectors, self.ids, self.properties, self.alive = None, [], [], []
+        self.vectors_file = DEFAULT_VECTORS_FILE
+        if os.path.exists(self.records_path):
+            with open(self.records_path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+            self.ids = records["ids"]
+            self.properties = records["properties"]
+            self.alive = records["alive"]
+            self.vectors_file = records.get("vectors_file", DEFAULT_VECTORS_FILE)
+            if os.path.exists(self.vectors_path):
+                self.vectors = np.load(self.vectors_path, mmap_mode="r+")
+
+        self.id_to_row = {id: row for row, id in enumerate(self.ids) if self.alive[row]}
+        self._rebuild_mask()
+        self._mark_committed()
+
+    def save(self) -> None:
+        """将向量刷入磁盘，并原子替换记录文件"""
+        os.makedirs(self.path, exist_ok=True)
+        if self.vectors is not None:
+            self.vectors.flush()
+        tmp_path = f"{self.records_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "ids": self.ids,
+                "properties": self.properties,
+                "alive": self.alive,
+                "vectors_file": self.vectors_file,
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, self.records_path)
+        self._rebuild_mask()
+        self._mark_committed()
+        self._remove_stale_vectors_files()
+
+    def rollback(self) -> None:
+        """丢弃未提交的修改，还原被原地覆盖的向量行并以磁盘上的记录文件为准重新加载"""
+        backup = self._backup
+        self.load()
+        if backup and self.vectors is not None:
+            for row, vector in backup.items():
+                self.vectors[row] = vector
+            self.vectors.flush()
+        self._remove_stale_vectors_files()
+
+    def upsert(self, ids: list[str], vectors: np.ndarray, properties: list[dict[str, Any]]) -> None:
+        """新增或覆盖记录，向量需已归一化"""
+        self._ensure_capacity(self.size + len(ids), vectors.shape[1])
+        for id, vector, props in zip(ids, vectors, properties):
+            row = self.id_to_row.get(id)
+            if row is None:
+                row = self.size
+                self.ids.append(id)
+                self.properties.append({})
+                self.alive.append(True)
+                self.id_to_row[id] = row
+            self._write_vector(row, vector)
+            self.properties[row] = props
+
+    def update(self, id: str, properties: dict[str, Any], vector: Optional[np.ndarray] = None) -> None:
+        """更新记录属性，传递向量(需已归一化)时同时覆盖向量"""
+        row = self.id_to_row.get(id)
+        if row is None:
+            return
+        self.properties[row] = {**self.properties[row], **properties}
+        if vector is not None:
+            self._write_vector(row, vector)
+
+    def delete(self, rows: list[int]) -> None:
+        """标记删除记录，存活行过少时压缩分区"""
+        for row in rows:
+            self.alive[row] = False
+            self.id_to_row.pop(self.ids[row], None)
+
+        if self.size >= PARTITION_INITIAL_CAPACITY and len(self.id_to_row) < self.size * PARTITION_COMPACT_RATIO:
+            self._compact()
+
+    def search(self, query: np.ndarray, k: int) -> list[tuple[int, float]]:
+        """在启用的记录中检索余弦相似度最高的k行"""
+        if self.vectors is None or not self.mask.any():
+            return []
+
+        rows = np.flatnonzero(self.mask)
+        scores = self.vectors[rows] @ query
+        if len(rows) > k:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.argsort(-scores[top])]
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+    def _ensure_capacity(self, required: int, dim: int) -> None:
+        """向量矩阵容量不足时成倍扩容"""
+        if self.vectors is not None and self.vectors.shape[0] >= required:
+            return
+
+        capacity = max(PARTITION_INITIAL_CAPACITY, required, 0 if self.vectors is None else self.vectors.shape[0] * 2)
+        self._rewrite_vectors(capacity, dim, list(range(self.size)))
+
+    def _compact(self) -> None:
+        """压缩分区，移除已删除的行"""
+        rows = [row for row in range(self.size) if self.alive[row]]
+        self.ids = [self.ids[row] for row in rows]
+        self.properties = [self.properties[row] for row in rows]
+        self.alive = [True] * len(rows)
+        self.id_to_row = {id: row for row, id in enumerate(self.ids)}
+        if self.vectors is not None:
+            self._rewrite_vectors(max(PARTITION_INITIAL_CAPACITY, len(rows)), self.vectors.shape[1], rows)
+
+    def _write_vector(self, row: int, vector: np.ndarray) -> None:
+        """写入单行向量，覆盖已提交向量文件中的已有行前先备份原始数据"""
+        if (
+                self.vectors_file == self._committed_vectors_file
+                and row < self._committed_size
+                and row not in self._backup
+        ):
+            self._backup[row] = np.array(self.vectors[row])
+        self.vectors[row] = vector
+
+    def _rewrite_vectors(self, capacity: int, dim: int, rows: list[int]) -> None:
+        """以指定容量重建向量矩阵并按顺序拷贝给定行，新矩阵写入新的向量文件，保存记录文件后才生效"""
+        os.makedirs(self.path, exist_ok=True)
+        vectors_file = f"vectors-{uuid.uuid4().hex}.npy"
+        vectors = np.lib.format.open_memmap(
+            os.path.join(self.path, vectors_file), mode="w+", dtype=np.float32, shape=(capacity, dim),
+        )
+        if self.vectors is not None and rows:
+            vectors[:len(rows)] = self.vectors[rows]
+        vectors.flush()
+        self.vectors = vectors
+        self.vectors_file = vectors_file
+
+    def _mark_committed(self) -> None:
+        """记录当前已提交到磁盘的状态，并清空向量行备份"""
+        self._committed_vectors_file = self.vectors_file
+        self._committed_size = self.size
+        self._backup = {}
+        self.version = self._records_mtime()
+
+    def _remove_stale_vectors_files(self) -> None:
+        """删除未被记录文件引用的向量文件，其他进程已映射的文件在关闭前仍然可以读取"""
+        if not os.path.isdir(self.path):
+            return
+        for name in os.listdir(self.path):
+            if name.startswith("vectors") and name.endswith(".npy") and name != self.vectors_file:
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except FileNotFoundError:
+                    pass
+
+    def _rebuild_mask(self) -> None:
+        """根据存活状态以及document_enabled/segment_enabled重建可检索行的布尔掩码"""
+        self.mask = np.array([
+            alive and bool(props.get("document_enabled")) and bool(props.get("segment_enabled"))
+            for alive, props in zip(self.alive, self.properties)
+        ], dtype=np.bool_)
+
+    def _records_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.records_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+
+class NumpyVectorBackend(BaseVectorBackend):
+    """进程内NumPy向量索引，按知识库分区，适用于小规模租户以及不依赖weaviate的测试环境"""
+
+    def __init__(self, root_path: str, text_key: str = "text"):
+        self.root_path = root_path
+        self.text_key = text_key
+        self.partitions: OrderedDict[str, DatasetPartition] = OrderedDict()
+        self.id_index: dict[str, str] = {}
+        self.lock = RLock()
+        os.makedirs(self.root_path, exist_ok=True)
+
+    def add_documents(self, documents: list[Document], vectors: list[list[float]], ids: list[str]) -> list[str]:
+        """按知识库分组写入文档"""
+        groups: dict[str, list[int]] = {}
+        for index, document in enumerate(documents):
+            groups.setdefault(str(document.metadata["dataset_id"]), []).append(index)
+
+        matrix = self._normalize(np.asarray(vectors, dtype=np.float32))
+        for dataset_id, indexes in groups.items():
+            with self._write(dataset_id) as partition:
+                partition.upsert(
+                    [str(ids[i]) for i in indexes],
+                    matrix[indexes],
+                    [{self.text_key: documents[i].page_content, **documents[i].metadata} for i in indexes],
+                )
+            with self.lock:
+                self.id_index.update({str(ids[i]): dataset_id for i in indexes})
+
+        return []
+
+    def update(
+            self,
+            id: str,
+            properties: dict[str, Any],
+            vector: Optional[list[float]] = None,
+            dataset_id: Optional[UUID] = None,
+    ) -> None:
+        dataset_id = str(dataset_id) if dataset_id else self._locate(str(id))
+        if dataset_id is None:
+            return
+
+        normalized = None if vector is None else self._normalize(np.asarray([vector], dtype=np.float32))[0]
+        with self._write(dataset_id) as partition:
+            partition.update(str(id), properties, normalized)
+
+    def update_many(
+            self,
+            ids: list[str],
+            properties: dict[str, Any],
+            dataset_id: Optional[UUID] = None,
+    ) -> dict[str, str]:
+        """按分区分组批量更新属性，每个分区只加锁并持久化一次，分区写入失败时整个分区回滚，该分区的记录均视为失败"""
+        ids = [str(id) for id in ids]
+        groups = {str(dataset_id): ids} if dataset_id else self._locate_many(ids)
+        failed: dict[str, str] = {}
+        for partition_id, partition_ids in groups.items():
+            try:
+                with self._write(partition_id) as partition:
+                    for id in partition_ids:
+                        partition.update(id, properties)
+            except Exception as e:
+                failed.update(dict.fromkeys(partition_ids, str(e)))
+        return failed
+
+    def delete_by_ids(self, ids: list[str], dataset_id: Optional[UUID] = None) -> None:
+        ids = {str(id) for id in ids}
+        groups = {str(dataset_id): list(ids)} if dataset_id else self._locate_many(list(ids))
+        self._delete_where(lambda id, properties: id in ids, list(groups.keys()))
+
+    def delete_by_document_id(self, document_id: UUID, dataset_id: Optional[UUID] = None) -> None:
+        document_id = str(document_id)
+        self._delete_where(
+            lambda id, properties: properties.get("document_id") == document_id,
+            [str(dataset_id)] if dataset_id else None,
+        )
+
+    def delete_by_dataset_id(self, dataset_id: UUID) -> None:
+        dataset_id = str(dataset_id)
+        with self.lock:
+            self.partitions.pop(dataset_id, None)
+            self.id_index = {id: value for id, value in self.id_index.items() if value != dataset_id}
+            shutil.rmtree(os.path.join(self.root_path, dataset_id), ignore_errors=True)
+
+    def similarity_search(
+            self,
+            vector: list[float],
+            dataset_ids: list[UUID],
+            k: int = 4,
+            score_threshold: float = 0,
+    ) -> list[tuple[Document, float]]:
+        """对每个分区计算余弦相似度后合并取前k条"""
+        query = self._normalize(np.asarray([vector], dtype=np.float32))[0]
+
+        candidates = []
+        with self.lock:
+            for dataset_id in dataset_ids:
+                partition = self._get_partition(str(dataset_id))
+                for row, score in partition.search(query, k):
+                    if score >= score_threshold:
+                        candidates.append((score, partition.properties[row]))
+
+        candidates.sort(key=lambda item: item[0], reverse=True)
+        results = []
+        for score, properties in candidates[:k]:
+            metadata = dict(properties)
+            page_content = metadata.pop(self.text_key, "")
+            results.append((Document(page_content=page_content, metadata=metadata), score))
+
+        return results
+
+    def _locate(self, id: str) -> Optional[str]:
+        """查找记录所在的知识库分区"""
+        return next(iter(self._locate_many([id])), None)
+
+    def _locate_many(self, ids: list[str]) -> dict[str, list[str]]:
+        """查找记录所在的知识库分区并按分区分组，优先使用id索引，索引中不存在的记录才逐个分区查找"""
+        groups: dict[str, list[str]] = {}
+        with self.lock:
+            missing = []
+            for id in ids:
+                dataset_id = self.id_index.get(id)
+                if dataset_id is not None and id in self._get_partition(dataset_id).id_to_row:
+                    groups.setdefault(dataset_id, []).append(id)
+                else:
+                    missing.append(id)
+
+            # 其他进程写入的记录不在本进程的索引中，加载分区时会补全索引，全部找到后停止查找
+            for dataset_id in self._dataset_ids():
+                if not missing:
+                    break
+                id_to_row = self._get_partition(dataset_id).id_to_row
+                found = [id for id in missing if id in id_to_row]
+                if found:
+                    groups.setdefault(dataset_id, []).extend(found)
+                    missing = [id for id in missing if id not in id_to_row]
+
+        return groups
+
+    def _delete_where(
+            self,
+            predicate: Callable[[str, dict[str, Any]], bool],
+            dataset_ids: Optional[list[str]] = None,
+    ) -> None:
+        """删除满足条件的记录，未指定分区时遍历所有分区，只对包含命中记录的分区加写锁"""
+        with self.lock:
+            for dataset_id in (self._dataset_ids() if dataset_ids is None else dataset_ids):
+                partition = self._get_partition(dataset_id)
+                if not any(predicate(id, partition.properties[row]) for id, row in partition.id_to_row.items()):
+                    continue
+                with self._write(dataset_id) as partition:
+                    ids = [id for id, row in partition.id_to_row.items() if predicate(id, partition.properties[row])]
+                    partition.delete([partition.id_to_row[id] for id in ids])
+                for id in ids:
+                    self.id_index.pop(id, None)
+
+    def _dataset_ids(self) -> list[str]:
+        """获取磁盘上所有知识库分区"""
+        return [name for name in os.listdir(self.root_path) if os.path.isdir(os.path.join(self.root_path, name))]
+
+    def _get_partition(self, dataset_id: str) -> DatasetPartition:
+        """获取知识库分区，磁盘上的分区被其他进程修改后重新加载，已加载分区过多时淘汰最久未使用的分区"""
+        partition = self.partitions.get(dataset_id)
+        if partition is None:
+            partition = DatasetPartition(os.path.join(self.root_path, dataset_id))
+            self.partitions[dataset_id] = partition
+            self.id_index.update(dict.fromkeys(partition.id_to_row, dataset_id))
+        elif partition.is_stale():
+            partition.load()
+            self.id_index.update(dict.fromkeys(partition.id_to_row, dataset_id))
+
+        self.partitions.move_to_end(dataset_id)
+        while len(self.partitions) > PARTITION_CACHE_MAX_SIZE:
+            self.partitions.popitem(last=False)
+        return partition
+
+    @contextmanager
+    def _write(self, dataset_id: str):
+        """获取分区的写锁，进程内使用线程锁，跨进程使用文件锁，正常退出时持久化分区"""
+        with self.lock:
+            path = os.path.join(self.root_path, dataset_id)
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, ".lock"), "w") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    partition = self._get_partition(dataset_id)
+                    try:
+                        yield partition
+                        partition.save()
+                    except Exception:
+                        # 写入或持久化失败时丢弃内存中的修改并还原已覆盖的向量行，以磁盘上的分区为准
+                        partition.rollback()
+                        raise
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @classmethod
+    def _normalize(cls, matrix: np.ndarray) -> np.ndarray:
+        """将向量归一化，使内积等于余弦相似度"""
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return matrix / norms
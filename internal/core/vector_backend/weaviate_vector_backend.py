@@ -0,0 +1,125 @@
+from typing import Any, Optional
+from uuid import UUID
+
+from langchain_core.documents import Document
+from weaviate import WeaviateClient
+from weaviate.classes.query import Filter, MetadataQuery
+from weaviate.collections import Collection
+
+from .base_vector_backend import BaseVectorBackend
+
+# 批量更新时单次按id读取的最大记录数，需小于weaviate的QUERY_MAXIMUM_RESULTS
+WEAVIATE_UPDATE_BATCH_SIZE = 1000
+
+
+class WeaviateVectorBackend(BaseVectorBackend):
+    """weaviate向量存储后端，属性结构与LangChain的WeaviateVectorStore保持一致"""
+
+    def __init__(self, client: WeaviateClient, collection_name: str, text_key: str = "text"):
+        self.client = client
+        self.collection_name = collection_name
+        self.text_key = text_key
+
+    @property
+    def collection(self) -> Collection:
+        """获取weaviate的集合"""
+        return self.client.collections.get(self.collection_name)
+
+    def add_documents(self, documents: list[Document], vectors: list[list[float]], ids: list[str]) -> list[str]:
+        """使用weaviate动态批量接口写入已向量化的文档"""
+        collection = self.collection
+        with collection.batch.dynamic() as batch:
+            for document, vector, id in zip(documents, vectors, ids):
+                batch.add_object(
+                    properties={self.text_key: document.page_content, **document.metadata},
+                    uuid=str(id),
+                    vector=vector,
+                )
+
+        return [str(failed_object.object_.uuid) for failed_object in collection.batch.failed_objects]
+
+    def update(
+            self,
+            id: str,
+            properties: dict[str, Any],
+            vector: Optional[list[float]] = None,
+            dataset_id: Optional[UUID] = None,
+    ) -> None:
+        self.collection.data.update(uuid=str(id), properties=properties, vector=vector)
+
+    def update_many(
+            self,
+            ids: list[str],
+            properties: dict[str, Any],
+            dataset_id: Optional[UUID] = None,
+    ) -> dict[str, str]:
+        """weaviate的批量接口只支持整条写入，先按id批量读取记录的属性与向量，合并属性后通过动态批量接口覆盖写入，
+        读取不到的记录以及批量写入失败的记录作为失败结果返回"""
+        collection = self.collection
+        failed: dict[str, str] = {}
+        for start in range(0, len(ids), WEAVIATE_UPDATE_BATCH_SIZE):
+            batch_ids = [str(id) for id in ids[start:start + WEAVIATE_UPDATE_BATCH_SIZE]]
+
+            # 1.批量读取记录的属性与向量
+            response = collection.query.fetch_objects(
+                filters=Filter.by_id().contains_any(batch_ids),
+                include_vector=True,
+                limit=len(batch_ids),
+            )
+            objects = {str(obj.uuid): obj for obj in response.objects}
+            failed.update({id: "向量记录不存在" for id in batch_ids if id not in objects})
+
+            # 2.合并属性后整条覆盖写入
+            with collection.batch.dynamic() as batch:
+                for id, obj in objects.items():
+                    batch.add_object(
+                        properties={**obj.properties, **properties},
+                        uuid=id,
+                        vector=obj.vector.get("default") if isinstance(obj.vector, dict) else obj.vector,
+                    )
+            failed.update({
+                str(failed_object.object_.uuid): failed_object.message
+                for failed_object in collection.batch.failed_objects
+            })
+
+        return failed
+
+    def delete_by_ids(self, ids: list[str], dataset_id: Optional[UUID] = None) -> None:
+        if ids:
+            self.collection.data.delete_many(where=Filter.by_id().contains_any([str(id) for id in ids]))
+
+    def delete_by_document_id(self, document_id: UUID, dataset_id: Optional[UUID] = None) -> None:
+        self.collection.data.delete_many(where=Filter.by_property("document_id").equal(str(document_id)))
+
+    def delete_by_dataset_id(self, dataset_id: UUID) -> None:
+        self.collection.data.delete_many(where=Filter.by_property("dataset_id").equal(str(dataset_id)))
+
+    def similarity_search(
+            self,
+            vector: list[float],
+            dataset_ids: list[UUID],
+            k: int = 4,
+            score_threshold: float = 0,
+    ) -> list[tuple[Document, float]]:
+        """使用near_vector检索，得分为余弦相似度"""
+        response = self.collection.query.near_vector(
+            near_vector=vector,
+            limit=k,
+            filters=Filter.all_of([
+                Filter.by_property("dataset_id").contains_any([str(dataset_id) for dataset_id in dataset_ids]),
+                Filter.by_property("document_enabled").equal(True),
+                Filter.by_property("segment_enabled").equal(True),
+            ]),
+            return_metadata=MetadataQuery(distance=True),
+        )
+
+        results = []
+        for obj in response.objects:
+            properties = dict(obj.properties)
+            score = 1 - obj.metadata.distance
+            if score < score_threshold:
+                continue
+            page_content = properties.pop(self.text_key, "")
+            results.append((Document(page_content=page_content, metadata=properties), score))
+
+        return results
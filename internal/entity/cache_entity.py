@@ -8,4 +8,50 @@ LOCK_DOCUMENT_UPDATE_ENABLED = "lock:document:update:enabled_{document_id}"
 LOCK_KEYWORD_TABLE_UPDATE_KEYWORD_TABLE = "lock:keyword_table:update:keyword_table_{dataset_id}"
 
 # 更新片段状态缓存锁
-LOCK_SEGMENT_UPDATE_ENABLED = "lock:segment:update:enabled_{segment_id}"
\ No newline at end of file
+LOCK_SEGMENT_UPDATE_ENABLED = "lock:segment:update:enabled_{segment_id}"
+
+# 更新会话长期记忆摘要缓存锁
+LOCK_CONVERSATION_UPDATE_SUMMARY = "lock:conversation:update:summary_{conversation_id}"
+
+# 文本向量缓存，以模型名称+文本hash为键，值为float32紧凑字节
+EMBEDDING_CACHE_KEY = "embeddings:{model_name}:{text_hash}"
+
+# 文本向量缓存过期时间，单位为秒，默认为30天
+EMBEDDING_CACHE_EXPIRE = 30 * 24 * 60 * 60
+
+# 文本向量缓存命中/未命中计数器
+EMBEDDING_CACHE_HIT_COUNTER = "embeddings:stats:{model_name}:hit"
+EMBEDDING_CACHE_MISS_COUNTER = "embeddings:stats:{model_name}:miss"
+
+# 查询向量缓存，以模型名称+规范化后的查询hash为键
+EMBEDDING_QUERY_CACHE_KEY = "embeddings:query:{model_name}:{query_hash}"
+
+# 查询向量缓存过期时间，单位为秒，默认为1天
+EMBEDDING_QUERY_CACHE_EXPIRE = 24 * 60 * 60
+
+# 会话历史消息窗口缓存，列表中按时间正序存储最近的问答及其token数
+CONVERSATION_HISTORY_CACHE_KEY = "conversation:history:{conversation_id}"
+
+# 会话历史消息窗口缓存过期时间，单位为秒，默认为1天
+CONVERSATION_HISTORY_CACHE_EXPIRE = 24 * 60 * 60
+
+# 应用配置缓存，缓存校验后的完整应用配置，键中包含配置id、失效版本号以及请求协议与域名(内置工具图标地址依赖协议与域名)
+APP_CONFIG_CACHE_KEY = "app_config:{app_id}:{config_type}:{config_id}:{version}:{scheme}:{host}"
+
+# 应用配置缓存过期时间，单位为秒，默认为1小时
+APP_CONFIG_CACHE_EXPIRE = 60 * 60
+
+# 应用配置失效版本号，应用配置更新/发布时自增，使该应用的所有配置缓存失效
+APP_CONFIG_VERSION_KEY = "app_config:version:{app_id}"
+
+# 账号应用配置失效版本号，账号下的工具/知识库更新或删除时自增，使该账号所有应用的配置缓存失效
+APP_CONFIG_ACCOUNT_VERSION_KEY = "app_config:version:account:{account_id}"
+
+# 账号凭证缓存，JWT的sub(账号id)对应的账号快照
+CREDENTIAL_ACCOUNT_CACHE_KEY = "credential:account:{account_id}"
+
+# API秘钥凭证缓存，使用HMAC计算后的秘钥摘要作为键，值为秘钥归属账号id与激活状态
+CREDENTIAL_API_KEY_CACHE_KEY = "credential:api_key:{api_key_hash}"
+
+# 凭证缓存过期时间，单位为秒，默认为5分钟
+CREDENTIAL_CACHE_EXPIRE = 5 * 60
@@ -182,7 +182,7 @@ class AppHandler:
             return validate_error_json(req.errors)
 
         # 2.调用服务发起会话调试
-        response = self.app_service.debug_chat(app_id, req.query.data, current_user)
+        response = self.app_service.debug_chat(app_id, req.query.data, current_user, req.coalesce.data)
 
         return compact_generate_response(response)
 
@@ -28,7 +28,7 @@ class DatasetHandler:
     @login_required
     def embedding_query(self):
         query = request.args.get("query")
-        vectors = self.embeddings_service.embeddings.embed_query(query)
+        vectors = self.embeddings_service.query_embeddings.embed_query(query)
         keywords = self.jieba_service.extract_keywords(query)
         return success_json({"vectors":vectors, "keywords":keywords })
 
@@ -1,9 +1,15 @@
 from datetime import datetime
 import hashlib
 import importlib
+import re
 from typing import Any
 
 from langchain_core.documents import Document
+from sqlalchemy import func
+from sqlalchemy.sql.elements import ColumnElement
+
+# pg_trgm只能使用搜索词中连续3个及以上的单词字符生成三元组，C locale下中文等非ASCII字符不被视为单词字符
+TRGM_SEARCHABLE_PATTERN = re.compile(r"[0-9A-Za-z]{3}")
 
 
 def dynamic_import(module_name:str, symbol_name:str) -> Any:
@@ -44,3 +50,21 @@ def remove_fields(data_dict: dict, fields: list[str]) -> None:
         data_dict.pop(field, None)
 
 
+
+
+def escape_like(keyword: str, escape: str = "\\") -> str:
+    """转义LIKE/ILIKE模式中的通配符，使搜索词按字面量匹配"""
+    return (
+        keyword.replace(escape, escape + escape)
+        .replace("%", escape + "%")
+        .replace("_", escape + "_")
+    )
+
+
+def build_search_filter(column: ColumnElement, keyword: str) -> ColumnElement:
+    """构建包含搜索词的模糊匹配条件，搜索词可以生成三元组时使用ILIKE走pg_trgm索引，
+    过短或者中文搜索词无法生成三元组，GIN索引会退化为扫描整个索引，此时使用strpos匹配，
+    让查询走列表本身的范围索引(如片段的document_id)，只在当前范围内逐行比较"""
+    if TRGM_SEARCHABLE_PATTERN.search(keyword):
+        return column.ilike(f"%{escape_like(keyword)}%", escape="\\")
+    return func.strpos(func.lower(column), keyword.lower()) > 0
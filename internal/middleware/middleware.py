@@ -27,20 +27,20 @@ class Middleware:
             # 3.解析token信息得到用户信息并返回
             payload = self.jwt_service.parse_token(access_token)
             account_id = payload.get("sub")
-            return self.account_service.get_account(account_id)
+            return self.account_service.get_cached_account(account_id)
         elif request.blueprint == "openapi":
             # 4.校验获取api_key
             api_key = self._validate_credential(request)
 
-            # 5.解析得到APi秘钥记录
-            api_key_record = self.api_key_service.get_api_by_by_credential(api_key)
+            # 5.解析得到APi秘钥凭证信息，涵盖归属账号id与激活状态
+            credential = self.api_key_service.get_api_key_credential(api_key)
 
             # 6.判断Api秘钥记录是否存在，如果不存在则抛出错误
-            if not api_key_record or not api_key_record.is_active:
+            if not credential or not credential["is_active"]:
                 raise UnauthorizedException("该秘钥不存在或未激活")
 
             # 7.获取秘钥账号信息并返回
-            return api_key_record.account
+            return self.account_service.get_cached_account(credential["account_id"])
         else:
             return None
 
@@ -0,0 +1,67 @@
+"""backfill keyword_index frequency
+
+Revision ID: f5a9d2c7b3e1
+Revises: e3b8c6d1f9a2
+Create Date: 2026-10-18 10:26:41.205873
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5a9d2c7b3e1'
+down_revision = 'e3b8c6d1f9a2'
+branch_labels = None
+depends_on = None
+
+# 回填词频时每批处理的片段数
+KEYWORD_FREQUENCY_BACKFILL_BATCH_SIZE = 500
+
+
+def upgrade():
+    # 早期按子串计数回填的词频会把"数据库"中的"数据"也计入，先重置为1，
+    # 再使用与关键词提取相同的jieba分词结果重新统计，与KeywordTableService写入的词频保持一致
+    op.execute("UPDATE keyword_index SET frequency = 1 WHERE frequency <> 1")
+    _backfill_keyword_frequency(op.get_bind())
+
+
+def _backfill_keyword_frequency(connection) -> None:
+    """按片段id分批读取已建立倒排索引的片段，统计分词结果中每个关键词的出现次数并写回，词频为1的记录保持默认值"""
+    from internal.service.jieba_service import JiebaService
+
+    last_segment_id = "00000000-0000-0000-0000-000000000000"
+    while True:
+        segments = connection.execute(sa.text("""
+            SELECT s.id, s.content, array_agg(ki.keyword)
+            FROM segment s
+            JOIN keyword_index ki ON ki.segment_id = s.id
+            WHERE s.id > CAST(:last_segment_id AS uuid)
+            GROUP BY s.id, s.content
+            ORDER BY s.id
+            LIMIT :limit
+        """), {"last_segment_id": last_segment_id, "limit": KEYWORD_FREQUENCY_BACKFILL_BATCH_SIZE}).all()
+        if not segments:
+            break
+
+        rows = []
+        for segment_id, content, keywords in segments:
+            term_counts = JiebaService.count_terms(content or "")
+            rows.extend(
+                {"segment_id": segment_id, "keyword": keyword, "frequency": term_counts[keyword]}
+                for keyword in keywords
+                if term_counts[keyword] > 1
+            )
+        if rows:
+            connection.execute(sa.text("""
+                UPDATE keyword_index
+                SET frequency = :frequency
+                WHERE segment_id = :segment_id AND keyword = :keyword
+            """), rows)
+
+        last_segment_id = str(segments[-1][0])
+
+
+def downgrade():
+    # 词频回填为数据迁移，降级时无需处理
+    pass
@@ -1,6 +1,6 @@
 from .app import App, AppConfig, AppConfigVersion, AppDatasetJoin
 from .api_tool import ApiToolProvider, ApiTool
-from .dataset import Dataset, DatasetQuery, Document, KeywordTable, Segment, ProcessRule
+from .dataset import Dataset, DatasetQuery, Document, KeywordTable, KeywordIndex, KeywordIndexStat, Segment, ProcessRule
 from .upload_file import UploadFile
 from .conversation import Message, MessageAgentThought, Conversation
 from .account import Account, AccountOAuth
@@ -15,6 +15,8 @@ __all__ = ["App",
            "DatasetQuery",
            "Document",
            "KeywordTable",
+           "KeywordIndex",
+           "KeywordIndexStat",
            "Segment",
            "ProcessRule",
            "Conversation",
@@ -6,6 +6,7 @@ from sqlalchemy import (
     Boolean,
     text,
     PrimaryKeyConstraint,
+    Index,
 )
 
 from internal.extension.database_extension import db
@@ -17,6 +18,7 @@ class ApiKey(db.Model):
     __tablename__ = "api_key"
     __table_args__ = (
         PrimaryKeyConstraint("id", name="pk_api_key_id"),
+        Index("idx_api_key_api_key", "api_key"),
     )
 
     id = Column(UUID, nullable=False, server_default=text("uuid_generate_v4()"))  # 记录id
@@ -14,6 +14,7 @@ from sqlalchemy import (
 from sqlalchemy.dialects.postgresql import JSONB
 
 from internal.extension.database_extension import db
+from .preload import get_preloaded, set_preloaded
 
 
 class Conversation(db.Model):
@@ -27,6 +28,7 @@ class Conversation(db.Model):
     app_id = Column(UUID, nullable=False)  # 关联应用id
     name = Column(String(255), nullable=False, server_default=text("''::character varying"))  # 会话名称
     summary = Column(Text, nullable=False, server_default=text("''::text"))  # 会话摘要/长期记忆
+    summarized_at = Column(DateTime, nullable=True)  # 摘要已覆盖的最后一条消息的创建时间
     is_pinned = Column(Boolean, nullable=False, server_default=text("false"))  # 是否置顶
     is_deleted = Column(Boolean, nullable=False, server_default=text("false"))  # 是否删除
     invoke_from = Column(String(255), nullable=False, server_default=text("''::character varying"))  # 调用来源
@@ -73,6 +75,7 @@ class Message(db.Model):
 
     # 消息关联的原始问题
     query = Column(Text, nullable=False, server_default=text("''::text"))  # 用户提问的原始query
+    query_token_count = Column(Integer, nullable=False, server_default=text("0"))  # 用户提问的token数
     message = Column(JSONB, nullable=False, server_default=text("'[]'::jsonb"))  # 产生answer的消息列表
     message_token_count = Column(Integer, nullable=False, server_default=text("0"))  # 消息列表的token总数
     message_unit_price = Column(Numeric(10, 7), nullable=False, server_default=text("0.0"))  # 消息的单价
@@ -101,9 +104,33 @@ class Message(db.Model):
     )
     created_at = Column(DateTime, nullable=False, server_default=text('CURRENT_TIMESTAMP(0)'))
 
+    @classmethod
+    def load_agent_thoughts(cls, messages: list["Message"]) -> list["Message"]:
+        """使用一条查询批量加载消息列表的智能体推理过程，并按消息挂载到实例上"""
+        # 1.提取消息id列表
+        message_ids = [message.id for message in messages]
+        if not message_ids:
+            return messages
+
+        # 2.一次性查询所有推理过程并按消息分组，查询结果已按位置排序
+        agent_thoughts = {str(message_id): [] for message_id in message_ids}
+        for agent_thought in db.session.query(MessageAgentThought).filter(
+                MessageAgentThought.message_id.in_(message_ids),
+        ).order_by(asc("position")).all():
+            agent_thoughts[str(agent_thought.message_id)].append(agent_thought)
+
+        # 3.将推理过程挂载到实例上
+        for message in messages:
+            set_preloaded(message, agent_thoughts=agent_thoughts[str(message.id)])
+
+        return messages
+
     @property
     def agent_thoughts(self) -> list["MessageAgentThought"]:
         """只读属性，返回该消息对应的智能体推理过程列表"""
+        preloaded = get_preloaded(self, "agent_thoughts")
+        if preloaded is not None:
+            return preloaded
         return db.session.query(MessageAgentThought).filter(
             MessageAgentThought.message_id == self.id,
         ).order_by(asc("position")).all()
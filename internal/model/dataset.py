@@ -7,13 +7,17 @@ from sqlalchemy import (
     Boolean,
     DateTime,
     PrimaryKeyConstraint,
+    UniqueConstraint,
+    Index,
     text,
     func,
 )
 from sqlalchemy.dialects.postgresql import JSONB
 
+from internal.entity.dataset_entity import SegmentStatus
 from internal.extension.database_extension import db
 from .app import AppDatasetJoin
+from .preload import get_preloaded, set_preloaded
 
 
 class Dataset(db.Model):
@@ -21,6 +25,8 @@ class Dataset(db.Model):
     __tablename__ = "dataset"
     __table_args__ = (
         PrimaryKeyConstraint("id", name="pk_dataset_id"),
+        Index("idx_dataset_account_id_created_at", "account_id", "created_at"),
+        Index("idx_dataset_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
     )
 
     id = Column(UUID, nullable=False, server_default=text("uuid_generate_v4()"))
@@ -36,9 +42,62 @@ class Dataset(db.Model):
     )
     created_at = Column(DateTime, nullable=False, server_default=text('CURRENT_TIMESTAMP(0)'))
 
+    @classmethod
+    def load_stats(cls, datasets: list["Dataset"]) -> list["Dataset"]:
+        """批量加载知识库列表的统计数据，每张统计表只执行一条分组查询并挂载到实例上，避免列表逐条读取属性产生N+1查询"""
+        # 1.提取知识库id列表
+        dataset_ids = [dataset.id for dataset in datasets]
+        if not dataset_ids:
+            return datasets
+
+        # 2.按知识库分组统计文档数与字符数
+        document_stats = {
+            str(dataset_id): (document_count, character_count)
+            for dataset_id, document_count, character_count in db.session.query(
+                Document.dataset_id,
+                func.count(Document.id),
+                func.coalesce(func.sum(Document.character_count), 0),
+            ).filter(Document.dataset_id.in_(dataset_ids)).group_by(Document.dataset_id).all()
+        }
+
+        # 3.按知识库分组统计片段命中次数
+        hit_counts = {
+            str(dataset_id): hit_count
+            for dataset_id, hit_count in db.session.query(
+                Segment.dataset_id,
+                func.coalesce(func.sum(Segment.hit_count), 0),
+            ).filter(Segment.dataset_id.in_(dataset_ids)).group_by(Segment.dataset_id).all()
+        }
+
+        # 4.按知识库分组统计关联的应用数
+        related_app_counts = {
+            str(dataset_id): related_app_count
+            for dataset_id, related_app_count in db.session.query(
+                AppDatasetJoin.dataset_id,
+                func.count(AppDatasetJoin.id),
+            ).filter(AppDatasetJoin.dataset_id.in_(dataset_ids)).group_by(AppDatasetJoin.dataset_id).all()
+        }
+
+        # 5.将统计数据挂载到实例上，没有记录的知识库统计值为0
+        for dataset in datasets:
+            dataset_id = str(dataset.id)
+            document_count, character_count = document_stats.get(dataset_id, (0, 0))
+            set_preloaded(
+                dataset,
+                document_count=document_count,
+                character_count=int(character_count),
+                hit_count=int(hit_counts.get(dataset_id, 0)),
+                related_app_count=related_app_counts.get(dataset_id, 0),
+            )
+
+        return datasets
+
     @property
     def document_count(self) -> int:
         """只读属性，获取知识库下的文档数"""
+        preloaded = get_preloaded(self, "document_count")
+        if preloaded is not None:
+            return preloaded
         return (
             db.session.
             query(func.count(Document.id)).
@@ -49,6 +108,9 @@ class Dataset(db.Model):
     @property
     def hit_count(self) -> int:
         """只读属性，获取该知识库的命中次数"""
+        preloaded = get_preloaded(self, "hit_count")
+        if preloaded is not None:
+            return preloaded
         return (
             db.session.
             query(func.coalesce(func.sum(Segment.hit_count), 0)).
@@ -59,6 +121,9 @@ class Dataset(db.Model):
     @property
     def related_app_count(self) -> int:
         """只读属性，获取该知识库关联的应用数"""
+        preloaded = get_preloaded(self, "related_app_count")
+        if preloaded is not None:
+            return preloaded
         return (
             db.session.
             query(func.count(AppDatasetJoin.id)).
@@ -69,6 +134,9 @@ class Dataset(db.Model):
     @property
     def character_count(self) -> int:
         """只读属性，获取该知识库下的字符总数"""
+        preloaded = get_preloaded(self, "character_count")
+        if preloaded is not None:
+            return preloaded
         return (
             db.session.
             query(func.coalesce(func.sum(Document.character_count), 0)).
@@ -82,6 +150,8 @@ class Document(db.Model):
     __tablename__ = "document"
     __table_args__ = (
         PrimaryKeyConstraint("id", name="pk_document_id"),
+        Index("idx_document_dataset_id_created_at", "dataset_id", "created_at"),
+        Index("idx_document_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
     )
 
     id = Column(UUID, nullable=False, server_default=text("uuid_generate_v4()"))
@@ -112,10 +182,55 @@ class Document(db.Model):
     )
     created_at = Column(DateTime, nullable=False, server_default=text('CURRENT_TIMESTAMP(0)'))
 
+    @classmethod
+    def load_stats(cls, documents: list["Document"]) -> list["Document"]:
+        """批量加载文档列表的上传文件与片段统计数据，片段数、已完成片段数与命中次数合并为一条分组查询"""
+        from internal.model import UploadFile
+
+        # 1.提取文档id列表
+        document_ids = [document.id for document in documents]
+        if not document_ids:
+            return documents
+
+        # 2.按文档分组统计片段数、已完成片段数以及命中次数
+        segment_stats = {
+            str(document_id): (segment_count, completed_segment_count, hit_count)
+            for document_id, segment_count, completed_segment_count, hit_count in db.session.query(
+                Segment.document_id,
+                func.count(Segment.id),
+                func.count(Segment.id).filter(Segment.status == SegmentStatus.COMPLETED),
+                func.coalesce(func.sum(Segment.hit_count), 0),
+            ).filter(Segment.document_id.in_(document_ids)).group_by(Segment.document_id).all()
+        }
+
+        # 3.一次性查询文档关联的上传文件
+        upload_files = {
+            str(upload_file.id): upload_file
+            for upload_file in db.session.query(UploadFile).filter(
+                UploadFile.id.in_([document.upload_file_id for document in documents]),
+            ).all()
+        }
+
+        # 4.将数据挂载到实例上
+        for document in documents:
+            segment_count, completed_segment_count, hit_count = segment_stats.get(str(document.id), (0, 0, 0))
+            set_preloaded(
+                document,
+                segment_count=segment_count,
+                completed_segment_count=completed_segment_count,
+                hit_count=int(hit_count),
+                upload_file=upload_files.get(str(document.upload_file_id)),
+            )
+
+        return documents
+
     @property
     def upload_file(self):
         """只读属性，获取上传文件"""
         from internal.model import UploadFile
+        preloaded = get_preloaded(self, "upload_file")
+        if preloaded is not None:
+            return preloaded
         return db.session.query(UploadFile).filter(UploadFile.id == self.upload_file_id).one_or_none()
 
     @property
@@ -126,6 +241,9 @@ class Document(db.Model):
     @property
     def segment_count(self) -> int:
         """只读属性，获取文档下的片段数"""
+        preloaded = get_preloaded(self, "segment_count")
+        if preloaded is not None:
+            return preloaded
         return (
             db.session.
             query(func.count(Segment.id)).
@@ -133,9 +251,25 @@ class Document(db.Model):
             scalar()
         )
 
+    @property
+    def completed_segment_count(self) -> int:
+        """只读属性，获取文档下已经构建完成的片段数"""
+        preloaded = get_preloaded(self, "completed_segment_count")
+        if preloaded is not None:
+            return preloaded
+        return (
+            db.session.
+            query(func.count(Segment.id)).
+            filter(Segment.document_id == self.id, Segment.status == SegmentStatus.COMPLETED).
+            scalar()
+        )
+
     @property
     def hit_count(self) -> int:
         """只读属性，获取文档下的片段的命中次数"""
+        preloaded = get_preloaded(self, "hit_count")
+        if preloaded is not None:
+            return preloaded
         return (
             db.session.
             query(func.coalesce(func.sum(Segment.hit_count), 0)).
@@ -148,6 +282,8 @@ class Segment(db.Model):
     __tablename__ = "segment"
     __table_args__ = (
         PrimaryKeyConstraint("id", name="pk_segment_id"),
+        Index("idx_segment_document_id_position", "document_id", "position"),
+        Index("idx_segment_content_trgm", "content", postgresql_using="gin", postgresql_ops={"content": "gin_trgm_ops"}),
     )
 
     id = Column(UUID, nullable=False, server_default=text("uuid_generate_v4()"))
@@ -186,7 +322,7 @@ class Segment(db.Model):
 
 
 class KeywordTable(db.Model):
-    """关键词表模型"""
+    """关键词表模型，旧版按知识库存储的JSONB词表，已由KeywordIndex倒排索引表替代，仅保留用于历史数据回填"""
     __tablename__ = "keyword_table"
     __table_args__ = (
         PrimaryKeyConstraint("id", name="pk_keyword_table_id"),
@@ -204,6 +340,45 @@ class KeywordTable(db.Model):
     created_at = Column(DateTime, nullable=False, server_default=text('CURRENT_TIMESTAMP(0)'))
 
 
+class KeywordIndex(db.Model):
+    """关键词倒排索引表模型，每一行记录知识库下某个关键词命中的一个片段"""
+    __tablename__ = "keyword_index"
+    __table_args__ = (
+        PrimaryKeyConstraint("id", name="pk_keyword_index_id"),
+        UniqueConstraint("dataset_id", "keyword", "segment_id", name="uk_keyword_index_dataset_id_keyword_segment_id"),
+        Index("idx_keyword_index_segment_id", "segment_id"),
+    )
+
+    id = Column(UUID, nullable=False, server_default=text("uuid_generate_v4()"))
+    dataset_id = Column(UUID, nullable=False)  # 关联知识库id
+    keyword = Column(String(255), nullable=False, server_default=text("''::character varying"))  # 关键词
+    segment_id = Column(UUID, nullable=False)  # 命中的片段id
+    frequency = Column(Integer, nullable=False, server_default=text("1"))  # 关键词在片段中出现的次数
+    token_count = Column(Integer, nullable=False, server_default=text("0"))  # 片段的token数，即BM25中的片段长度
+    created_at = Column(DateTime, nullable=False, server_default=text('CURRENT_TIMESTAMP(0)'))
+
+
+class KeywordIndexStat(db.Model):
+    """关键词倒排索引统计表模型，记录每个知识库已索引的片段数与token总数，用于计算BM25的N与平均片段长度"""
+    __tablename__ = "keyword_index_stat"
+    __table_args__ = (
+        PrimaryKeyConstraint("id", name="pk_keyword_index_stat_id"),
+        UniqueConstraint("dataset_id", name="uk_keyword_index_stat_dataset_id"),
+    )
+
+    id = Column(UUID, nullable=False, server_default=text("uuid_generate_v4()"))
+    dataset_id = Column(UUID, nullable=False)  # 关联知识库id
+    segment_count = Column(Integer, nullable=False, server_default=text("0"))  # 已索引的片段数
+    token_count = Column(Integer, nullable=False, server_default=text("0"))  # 已索引片段的token总数
+    updated_at = Column(
+        DateTime,
+        nullable=False,
+        server_default=text('CURRENT_TIMESTAMP(0)'),
+        server_onupdate=text('CURRENT_TIMESTAMP(0)'),
+    )
+    created_at = Column(DateTime, nullable=False, server_default=text('CURRENT_TIMESTAMP(0)'))
+
+
 class DatasetQuery(db.Model):
     """知识库查询表模型"""
     __tablename__ = "dataset_query"
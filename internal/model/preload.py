@@ -0,0 +1,14 @@
+from typing import Any
+
+# 批量加载的数据挂载在模型实例上的属性名
+PRELOADED_ATTR = "_preloaded"
+
+
+def set_preloaded(instance: Any, **values: Any) -> None:
+    """将批量加载的统计数据挂载到模型实例上，模型的只读属性读取时优先使用，不再单独发起查询"""
+    instance.__dict__.setdefault(PRELOADED_ATTR, {}).update(values)
+
+
+def get_preloaded(instance: Any, name: str) -> Any:
+    """获取模型实例上挂载的批量加载数据，不存在时返回None"""
+    return instance.__dict__.get(PRELOADED_ATTR, {}).get(name)
@@ -8,6 +8,7 @@ from wtforms.validators import DataRequired, Length, URL, ValidationError, Optio
 from internal.entity.app_entity import AppStatus
 from internal.lib.helper import datetime_to_timestamp
 from internal.model import App, AppConfigVersion, Message
+from internal.schema.schema import DefaultBooleanField
 from pkg.paginator import PaginatorRequest
 
 
@@ -147,6 +148,7 @@ class DebugChatReq(FlaskForm):
     query = StringField("query", validators=[
         DataRequired("用户提问query不能为空"),
     ])
+    coalesce = DefaultBooleanField("coalesce", default=True)
 
 class GetDebugConversationMessagesWithPageReq(PaginatorRequest):
     """获取调试会话消息列表分页请求结构体"""
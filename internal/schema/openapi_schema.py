@@ -4,6 +4,8 @@ from flask_wtf import FlaskForm
 from wtforms import StringField, BooleanField
 from wtforms.validators import DataRequired, UUID, Optional, ValidationError
 
+from internal.schema.schema import DefaultBooleanField
+
 
 class OpenAPIChatReq(FlaskForm):
     """开放API聊天接口请求结构体"""
@@ -20,6 +22,7 @@ class OpenAPIChatReq(FlaskForm):
         DataRequired("用户提问query不能为空"),
     ])
     stream = BooleanField("stream", default=True)
+    coalesce = DefaultBooleanField("coalesce", default=True)
 
     def validate_conversation_id(self, field: StringField) -> None:
         """自定义校验conversation_id函数"""
@@ -1,4 +1,4 @@
-from wtforms import Field
+from wtforms import BooleanField, Field
 
 
 class ListField(Field):
@@ -23,3 +23,12 @@ class DictField(Field):
 
     def _value(self):
         return self.data
+
+
+class DefaultBooleanField(BooleanField):
+    """自定义bool字段，请求未携带该字段时保留默认值，原生BooleanField会将缺失的字段解析为False"""
+
+    def process_formdata(self, valuelist):
+        if not valuelist:
+            return
+        super().process_formdata(valuelist)
@@ -1,13 +1,18 @@
 import base64
+import json
 import secrets
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Any
+from typing import Any, Optional
 from uuid import UUID
 
 from flask import request
 from injector import inject
+from redis import Redis
+from sqlalchemy import DateTime, UUID as SQLAlchemyUUID
+from sqlalchemy.orm import make_transient_to_detached
 
+from internal.entity.cache_entity import CREDENTIAL_ACCOUNT_CACHE_KEY, CREDENTIAL_CACHE_EXPIRE
 from internal.exception import FailedException
 from internal.model import Account, AccountOAuth
 from pkg.password import hash_password, compare_password
@@ -15,18 +20,62 @@ from pkg.sqlalchemy import SQLAlchemy
 from .base_service import BaseService
 from .jwt_service import JwtService
 
+# 账号快照只缓存鉴权与接口展示需要的字段，密码与盐值不写入缓存，访问时按需从数据库加载
+ACCOUNT_CACHE_COLUMNS = (
+    "id", "name", "email", "avatar", "last_login_at", "last_login_ip", "updated_at", "created_at",
+)
+
 
 @inject
 @dataclass
 class AccountService(BaseService):
     """账号服务"""
     db: SQLAlchemy
+    redis_client: Redis
     jwt_service: JwtService
 
     def get_account(self, account_id: UUID) -> Account:
         """根据id获取指定的账号模型"""
         return self.get(Account, account_id)
 
+    def get_cached_account(self, account_id: UUID) -> Optional[Account]:
+        """根据id获取账号模型，优先使用redis中的账号快照还原，避免每次鉴权都查询数据库"""
+        # 1.查询缓存中的账号快照
+        cache_key = CREDENTIAL_ACCOUNT_CACHE_KEY.format(account_id=account_id)
+        cached_account = self.redis_client.get(cache_key)
+        if cached_account is not None:
+            # 2.使用快照构建账号模型并合并到会话中，load=False不会发起查询，未缓存的字段(如密码)在访问时才加载，
+            # 后续更新仍然按主键正常写入
+            snapshot = json.loads(cached_account)
+            values = {}
+            for column_key in ACCOUNT_CACHE_COLUMNS:
+                value = snapshot.get(column_key)
+                if value is None:
+                    continue
+                column_type = Account.__table__.columns[column_key].type
+                if isinstance(column_type, DateTime):
+                    value = datetime.fromisoformat(value)
+                elif isinstance(column_type, SQLAlchemyUUID):
+                    value = UUID(value)
+                values[column_key] = value
+            account = Account(**values)
+            make_transient_to_detached(account)
+            return self.db.session.merge(account, load=False)
+
+        # 3.缓存不存在则查询数据库并写入快照
+        account = self.get_account(account_id)
+        if account is not None:
+            snapshot = {
+                column_key: getattr(account, column_key)
+                for column_key in ACCOUNT_CACHE_COLUMNS
+            }
+            self.redis_client.setex(cache_key, CREDENTIAL_CACHE_EXPIRE, json.dumps(snapshot, default=str))
+        return account
+
+    def invalidate_account_cache(self, account_id: UUID) -> None:
+        """账号信息更新后删除缓存的账号快照"""
+        self.redis_client.delete(CREDENTIAL_ACCOUNT_CACHE_KEY.format(account_id=account_id))
+
     def get_account_oauth_by_provider_name_and_openid(
             self,
             provider_name: str,
@@ -66,6 +115,7 @@ class AccountService(BaseService):
     def update_account(self, account: Account, **kwargs) -> Account:
         """根据传递的信息更新账号"""
         self.update(account, **kwargs)
+        self.invalidate_account_cache(account.id)
         return account
 
     def password_login(self, email: str, password: str) -> dict[str, Any]:
@@ -93,7 +143,7 @@ class AccountService(BaseService):
         access_token = self.jwt_service.generate_token(payload)
 
         # 4.更新账号的登录信息
-        self.update(
+        self.update_account(
             account,
             last_login_at=datetime.now(),
             last_login_ip=request.remote_addr,
@@ -1,10 +1,16 @@
+import hashlib
+import hmac
+import json
+import os
 import secrets
 from dataclasses import dataclass
+from typing import Any, Optional
 from uuid import UUID
 
 from injector import inject
-from sqlalchemy import desc
+from redis import Redis
 
+from internal.entity.cache_entity import CREDENTIAL_API_KEY_CACHE_KEY, CREDENTIAL_CACHE_EXPIRE
 from internal.exception import ForbiddenException
 from internal.model import Account, ApiKey
 from internal.schema.api_key_schema import CreateApiKeyReq
@@ -18,6 +24,7 @@ from .base_service import BaseService
 class ApiKeyService(BaseService):
     """API秘钥服务"""
     db: SQLAlchemy
+    redis_client: Redis
 
     def create_api_key(self, req: CreateApiKeyReq, account: Account) -> ApiKey:
         """根据传递的信息创建API秘钥"""
@@ -42,16 +49,40 @@ class ApiKeyService(BaseService):
             ApiKey.api_key == api_key,
         ).one_or_none()
 
+    def get_api_key_credential(self, api_key: str) -> Optional[dict[str, Any]]:
+        """根据传递的凭证信息获取秘钥归属的账号id与激活状态，优先读取缓存，缓存键只保存秘钥的HMAC摘要"""
+        # 1.查询缓存中的凭证信息
+        cache_key = CREDENTIAL_API_KEY_CACHE_KEY.format(api_key_hash=self.hash_api_key(api_key))
+        cached_credential = self.redis_client.get(cache_key)
+        if cached_credential is not None:
+            return json.loads(cached_credential)
+
+        # 2.缓存不存在则查询数据库，秘钥不存在时不写入缓存，避免新建秘钥后仍然命中空缓存
+        api_key_record = self.get_api_by_by_credential(api_key)
+        if not api_key_record:
+            return None
+
+        # 3.写入缓存并返回
+        credential = {"account_id": str(api_key_record.account_id), "is_active": api_key_record.is_active}
+        self.redis_client.setex(cache_key, CREDENTIAL_CACHE_EXPIRE, json.dumps(credential))
+        return credential
+
+    def invalidate_api_key_cache(self, api_key: str) -> None:
+        """秘钥更新或删除后删除缓存的凭证信息"""
+        self.redis_client.delete(CREDENTIAL_API_KEY_CACHE_KEY.format(api_key_hash=self.hash_api_key(api_key)))
+
     def update_api_key(self, api_key_id: UUID, account: Account, **kwargs) -> ApiKey:
         """根据传递的信息更新API秘钥"""
         api_key = self.get_api_key(api_key_id, account)
         self.update(api_key, **kwargs)
+        self.invalidate_api_key_cache(api_key.api_key)
         return api_key
 
     def delete_api_key(self, api_key_id: UUID, account: Account) -> ApiKey:
         """根据传递的id删除API秘钥"""
         api_key = self.get_api_key(api_key_id, account)
         self.delete(api_key)
+        self.invalidate_api_key_cache(api_key.api_key)
         return api_key
 
     def get_api_keys_with_page(self, req: PaginatorRequest, account: Account) -> tuple[list[ApiKey], Paginator]:
@@ -63,11 +94,19 @@ class ApiKeyService(BaseService):
         api_keys = paginator.paginate(
             self.db.session.query(ApiKey).filter(
                 ApiKey.account_id == account.id,
-            ).order_by(desc("created_at"))
+            ),
+            sort_column=ApiKey.created_at,
+            id_column=ApiKey.id,
         )
 
         return api_keys, paginator
 
+    @classmethod
+    def hash_api_key(cls, api_key: str) -> str:
+        """使用HMAC-SHA256计算API秘钥摘要，避免明文秘钥出现在缓存中"""
+        secret_key = os.getenv("JWT_SECRET_KEY", "")
+        return hmac.new(secret_key.encode("utf-8"), api_key.encode("utf-8"), hashlib.sha256).hexdigest()
+
     @classmethod
     def generate_api_key(cls, api_key_prefix: str = "llmops-v1/") -> str:
         """生成一个长度为48的API秘钥，并携带前缀"""
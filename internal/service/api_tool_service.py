@@ -11,6 +11,7 @@ from internal.exception import ValidationException, NotFoundException
 from internal.model import ApiTool, ApiToolProvider, Account
 from internal.schema.api_tool_schema import CreateOpenAPIToolSchemaRequest, GetApiToolProvidersWithPageRequest, \
     UpdateApiToolProviderRequest
+from internal.service.app_config_service import AppConfigService
 from internal.service.base_service import BaseService
 from pkg.paginator import Paginator
 from pkg.sqlalchemy import SQLAlchemy
@@ -23,6 +24,7 @@ class ApiToolService(BaseService):
     """自定义API插件服务"""
     db: SQLAlchemy # 注入数据库
     api_provider_manager: ApiProviderManager
+    app_config_service: AppConfigService
 
     @classmethod
     def parse_openapi_schema(cls, openapi_schema_str:str, account:Account) -> OpenAPISchema:
@@ -103,6 +105,8 @@ class ApiToolService(BaseService):
                     parameters=method_item.get("parameters", [])
                 )
 
+        # 工具信息已变更，使引用该工具的应用配置缓存失效
+        self.app_config_service.invalidate_account_app_configs(account_id)
 
     def get_api_tool(self, provider_id: UUID, tool_name:str, account:Account):
         """根据提供的provider id 和 tool_name 获取工具的详情"""
@@ -142,6 +146,9 @@ class ApiToolService(BaseService):
             ).delete()
             self.db.session.delete(api_tool_provider)
 
+        # 工具已删除，使引用该工具的应用配置缓存失效
+        self.app_config_service.invalidate_account_app_configs(account_id)
+
     def create_api_tool_provider(self,req:CreateOpenAPIToolSchemaRequest, account:Account):
         """根据传递的请求信息创建自定义的api 工具"""
 
@@ -1,29 +1,114 @@
+import copy
+import json
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Any, Union
+from threading import Lock
+from typing import Any, Callable, ClassVar, Union
+from uuid import UUID
 
 from flask import request
 from injector import inject
 from langchain_core.tools import BaseTool
+from redis import Redis
 
 from internal.core.tools.api_tools.entities import ToolEntity
 from internal.core.tools.api_tools.providers import ApiProviderManager
 from internal.core.tools.builtin_tools.providers import BuiltinProviderManager
+from internal.entity.app_entity import AppConfigType
+from internal.entity.cache_entity import (
+    APP_CONFIG_CACHE_KEY,
+    APP_CONFIG_CACHE_EXPIRE,
+    APP_CONFIG_VERSION_KEY,
+    APP_CONFIG_ACCOUNT_VERSION_KEY,
+)
 from internal.lib.helper import datetime_to_timestamp
 from internal.model import App, ApiTool, Dataset, AppConfig, AppConfigVersion, AppDatasetJoin
 from pkg.sqlalchemy import SQLAlchemy
 from .base_service import BaseService
 
+# 进程内最多缓存的应用配置数量，超过时淘汰最久未使用的配置
+APP_CONFIG_CACHE_MAX_SIZE = 512
+
 
 @inject
 @dataclass
 class AppConfigService(BaseService):
     """应用配置服务"""
     db: SQLAlchemy
+    redis_client: Redis
     api_provider_manager: ApiProviderManager
     builtin_provider_manager: BuiltinProviderManager
+    _app_configs: ClassVar[OrderedDict[str, dict[str, Any]]] = OrderedDict()
+    _lock: ClassVar[Lock] = Lock()
 
     def get_draft_app_config(self, app: App) -> dict[str, Any]:
-        """根据传递的应用获取该应用的草稿配置"""
+        """根据传递的应用获取该应用的草稿配置，优先从进程内缓存与redis缓存中读取"""
+        return self._get_or_load_app_config(
+            app, AppConfigType.DRAFT, app.draft_app_config_id, lambda: self._load_draft_app_config(app),
+        )
+
+    def get_app_config(self, app: App) -> dict[str, Any]:
+        """根据传递的应用获取该应用的运行配置，优先从进程内缓存与redis缓存中读取"""
+        return self._get_or_load_app_config(
+            app, AppConfigType.PUBLISHED, app.app_config_id, lambda: self._load_app_config(app),
+        )
+
+    def invalidate_app_config(self, app_id: UUID) -> None:
+        """应用的草稿/运行配置发生变化时调用，使该应用的配置缓存失效"""
+        self.redis_client.incr(APP_CONFIG_VERSION_KEY.format(app_id=app_id))
+
+    def invalidate_account_app_configs(self, account_id: Union[UUID, str]) -> None:
+        """账号下被应用配置引用的工具、知识库更新或删除时调用，应用只能引用所属账号的数据，因此只使该账号应用的配置缓存失效"""
+        self.redis_client.incr(APP_CONFIG_ACCOUNT_VERSION_KEY.format(account_id=account_id))
+
+    def _get_or_load_app_config(
+            self,
+            app: App,
+            config_type: AppConfigType,
+            config_id: UUID,
+            loader: Callable[[], dict[str, Any]],
+    ) -> dict[str, Any]:
+        """根据应用、配置类型、配置id以及失效版本号获取缓存的应用配置，缓存未命中时执行完整的校验流程并写入缓存"""
+        # 1.一次性读取应用与所属账号的失效版本号，并生成缓存键
+        app_version, account_version = self.redis_client.mget(
+            APP_CONFIG_VERSION_KEY.format(app_id=app.id),
+            APP_CONFIG_ACCOUNT_VERSION_KEY.format(account_id=app.account_id),
+        )
+        cache_key = APP_CONFIG_CACHE_KEY.format(
+            app_id=app.id,
+            config_type=config_type.value,
+            config_id=config_id,
+            version=f"{int(account_version or 0)}.{int(app_version or 0)}",
+            scheme=request.scheme,
+            host=request.host,
+        )
+
+        # 2.优先从进程内缓存中读取，返回副本避免调用方修改缓存数据
+        with self._lock:
+            app_config = self._app_configs.get(cache_key)
+            if app_config is not None:
+                self._app_configs.move_to_end(cache_key)
+                return copy.deepcopy(app_config)
+
+        # 3.进程内缓存未命中时读取redis缓存，仍未命中则执行完整的校验流程并写入redis
+        cached_app_config = self.redis_client.get(cache_key)
+        if cached_app_config is not None:
+            app_config = json.loads(cached_app_config)
+        else:
+            app_config = loader()
+            self.redis_client.setex(cache_key, APP_CONFIG_CACHE_EXPIRE, json.dumps(app_config))
+
+        # 4.写入进程内缓存并淘汰最久未使用的配置
+        with self._lock:
+            self._app_configs[cache_key] = app_config
+            self._app_configs.move_to_end(cache_key)
+            while len(self._app_configs) > APP_CONFIG_CACHE_MAX_SIZE:
+                self._app_configs.popitem(last=False)
+
+        return copy.deepcopy(app_config)
+
+    def _load_draft_app_config(self, app: App) -> dict[str, Any]:
+        """查询并校验应用的草稿配置"""
         # 1.提取应用的草稿配置
         draft_app_config = app.draft_app_config
 
@@ -50,8 +135,8 @@ class AppConfigService(BaseService):
         # 20.将数据转换成字典后返回
         return self._process_and_transformer_app_config(tools, workflows, datasets, draft_app_config)
 
-    def get_app_config(self, app: App) -> dict[str, Any]:
-        """根据传递的应用获取该应用的运行配置"""
+    def _load_app_config(self, app: App) -> dict[str, Any]:
+        """查询并校验应用的运行配置"""
         # 1.提取应用的草稿配置
         app_config = app.app_config
 
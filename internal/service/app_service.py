@@ -1,4 +1,3 @@
-import json
 from dataclasses import dataclass
 from datetime import datetime
 from threading import Thread
@@ -12,7 +11,7 @@ from langchain_openai import ChatOpenAI
 from redis import Redis
 from sqlalchemy import func, desc
 
-from internal.core.agent.agents import FunctionCallAgent, AgentQueueManager
+from internal.core.agent.agents import AgentCache, AgentQueueManager, BaseAgent, FunctionCallAgent
 from internal.core.agent.entities.agent_entity import AgentConfig
 from internal.core.memory import TokenBufferMemory
 from internal.core.tools.api_tools.providers import ApiProviderManager
@@ -27,12 +26,14 @@ from internal.model import App, Account, AppConfigVersion, ApiTool, Dataset, App
 from internal.schema.app_schema import CreateAppReq, GetPublishHistoriesWithPageReq, \
     GetDebugConversationMessagesWithPageReq, GetAppsWithPageReq
 from pkg.paginator import Paginator
+from pkg.response import SSEWriter
 from pkg.sqlalchemy import SQLAlchemy
 from .app_config_service import AppConfigService
 from .base_service import BaseService
+from .embeddings_service import EmbeddingsService
 from .conversation_service import ConversationService
 from .retrieval_service import RetrievalService
-from ..core.agent.entities.queue_entity import QueueEvent
+from ..core.agent.entities.queue_entity import AgentThoughtCollector, QueueEvent
 
 
 @inject
@@ -197,6 +198,9 @@ class AppService(BaseService):
             **draft_app_config,
         )
 
+        # 4.草稿配置已变更，使应用配置缓存失效
+        self.app_config_service.invalidate_app_config(app_id)
+
         return draft_app_config_record
 
     def publish_draft_app_config(self, app_id: UUID, account: Account) -> App:
@@ -265,6 +269,9 @@ class AppService(BaseService):
             **draft_app_config_copy,
         )
 
+        # 9.运行配置已变更，使应用配置缓存失效
+        self.app_config_service.invalidate_app_config(app_id)
+
         return app
 
     def cancel_publish_app_config(self, app_id: UUID, account: Account) -> App:
@@ -285,6 +292,9 @@ class AppService(BaseService):
                 AppDatasetJoin.app_id == app_id,
             ).delete()
 
+        # 5.运行配置已取消，使应用配置缓存失效
+        self.app_config_service.invalidate_app_config(app_id)
+
         return app
 
     def get_publish_histories_with_page(
@@ -342,6 +352,10 @@ class AppService(BaseService):
             updated_at=datetime.now(),
             **draft_app_config_dict,
         )
+
+        # 6.草稿配置已变更，使应用配置缓存失效
+        self.app_config_service.invalidate_app_config(app_id)
+
         return draft_app_config_record
 
     def get_debug_conversation_summary(self, app_id: UUID, account: Account) -> str:
@@ -386,8 +400,8 @@ class AppService(BaseService):
 
         return app
 
-    def debug_chat(self, app_id: UUID, query: str, account: Account) -> Generator:
-        """根据传递的应用id+提问query向特定的应用发起会话调试"""
+    def debug_chat(self, app_id: UUID, query: str, account: Account, coalesce: bool = True) -> Generator:
+        """根据传递的应用id+提问query向特定的应用发起会话调试，coalesce为True时合并同一事件的连续增量帧"""
         # 1.获取应用信息并校验权限
         app = self.get_app(app_id, account)
 
@@ -405,79 +419,38 @@ class AppService(BaseService):
             invoke_from=InvokeFrom.DEBUGGER,
             created_by=account.id,
             query=query,
+            query_token_count=EmbeddingsService.calculate_token_count(query),
             status=MessageStatus.NORMAL,
         )
 
-        # todo:5.根据传递的model_config实例化不同的LLM模型，等待多LLM接入后该处会发生变化
-        llm = ChatOpenAI(
-            model=draft_app_config["model_config"]["model"],
-            **draft_app_config["model_config"]["parameters"],
-        )
+        # 5.从缓存中获取草稿配置对应的智能体，缓存未命中时才实例化LLM、加载工具并编译图结构
+        agent = self.get_agent(draft_app_config, account.id, InvokeFrom.DEBUGGER)
 
         # 6.实例化TokenBufferMemory用于提取短期记忆
         token_buffer_memory = TokenBufferMemory(
             db=self.db,
             conversation=debug_conversation,
-            model_instance=llm,
+            model_instance=agent.llm,
         )
         history = token_buffer_memory.get_history_prompt_messages(
             message_limit=draft_app_config["dialog_round"],
         )
 
-        # 7.将草稿配置中的tools转换成LangChain工具
-        tools = self.app_config_service.get_langchain_tools_by_tools_config(draft_app_config["tools"])
-
-        # 8.检测是否关联了知识库
-        if draft_app_config["datasets"]:
-            # 9.构建LangChain知识库检索工具
-            dataset_retrieval = self.retrieval_service.create_langchain_tool_from_search(
-                flask_app=current_app._get_current_object(),
-                query=query,
-                dataset_ids=[dataset["id"] for dataset in draft_app_config["datasets"]],
-                account_id=account.id,
-                retrieval_source=RetrievalSource.APP,
-                **draft_app_config["retrieval_config"],
-            )
-            tools.append(dataset_retrieval)
-
-        # todo:10.构建Agent智能体，目前暂时使用FunctionCallAgent
-        agent = FunctionCallAgent(
-            llm=llm,
-            agent_config=AgentConfig(
-                user_id=account.id,
-                invoke_from=InvokeFrom.DEBUGGER,
-                enable_long_term_memory=draft_app_config["long_term_memory"]["enable"],
-                tools=tools,
-                review_config=draft_app_config["review_config"],
-            ),
-        )
-
-        agent_thoughts = {}
+        collector = AgentThoughtCollector()
+        sse_writer = SSEWriter(coalesce=coalesce)
         for agent_thought in agent.stream({
             "messages": [HumanMessage(query)],
             "history": history,
             "long_term_memory": debug_conversation.summary,
-        }):
-            # 11.提取thought以及answer
+        }, idle_interval=sse_writer.idle_timeout):
+            # 7.合并缓冲区到期时刷新，缓冲区为空时不请求空闲唤醒
+            if agent_thought is None:
+                yield from sse_writer.tick()
+                continue
+
+            # 8.将数据收集到收集器，便于存储到数据库服务中
+            collector.add(agent_thought)
             event_id = str(agent_thought.id)
-
-            # 12.将数据填充到agent_thought，便于存储到数据库服务中
-            if agent_thought.event != QueueEvent.PING:
-                # 13.除了agent_message数据为叠加，其他均为覆盖
-                if agent_thought.event == QueueEvent.AGENT_MESSAGE:
-                    if event_id not in agent_thoughts:
-                        # 14.初始化智能体消息事件
-                        agent_thoughts[event_id] = agent_thought
-                    else:
-                        # 15.叠加智能体消息
-                        agent_thoughts[event_id] = agent_thoughts[event_id].model_copy(update={
-                            "thought": agent_thoughts[event_id].thought + agent_thought.thought,
-                            "answer": agent_thoughts[event_id].answer + agent_thought.answer,
-                            "latency": agent_thought.latency,
-                        })
-                else:
-                    # 16.处理其他类型事件的消息
-                    agent_thoughts[event_id] = agent_thought
             data = {
                 **agent_thought.model_dump(include={
                     "event", "thought", "observation", "tool", "tool_input", "answer", "latency",
@@ -487,7 +460,8 @@ class AppService(BaseService):
                 "message_id": str(message.id),
                 "task_id": str(agent_thought.task_id),
             }
-            yield f"event: {agent_thought.event.value}\ndata:{json.dumps(data)}\n\n"
+            yield from sse_writer.write(agent_thought.event.value, data)
+        yield from sse_writer.flush()
 
         # 22.将消息以及推理过程添加到数据库
         thread = Thread(
@@ -499,7 +473,7 @@ class AppService(BaseService):
                 "app_config": draft_app_config,
                 "conversation_id": debug_conversation.id,
                 "message_id": message.id,
-                "agent_thoughts": [agent_thought for agent_thought in agent_thoughts.values()],
+                "agent_thoughts": collector.agent_thoughts,
             }
         )
         thread.start()
@@ -541,11 +515,52 @@ class AppService(BaseService):
                 Message.status.in_([MessageStatus.STOP, MessageStatus.NORMAL]),
                 Message.answer != "",
                 *filters,
-            ).order_by(desc("created_at"))
+            ),
+            sort_column=Message.created_at,
+            id_column=Message.id,
         )
 
-        return messages, paginator
+        # 6.批量加载当前页消息的推理过程
+        return Message.load_agent_thoughts(messages), paginator
+
+
+    def get_agent(self, app_config: dict[str, Any], account_id: UUID, invoke_from: InvokeFrom) -> BaseAgent:
+        """根据应用配置+账号+调用来源获取智能体，相同配置的智能体复用已编译的图结构与绑定工具后的LLM"""
+        def create_agent() -> BaseAgent:
+            # todo:1.根据传递的model_config实例化不同的LLM模型，等待多LLM接入后该处会发生变化
+            llm = ChatOpenAI(
+                model=app_config["model_config"]["model"],
+                **app_config["model_config"]["parameters"],
+            )
+
+            # 2.将配置中的tools转换成LangChain工具
+            tools = self.app_config_service.get_langchain_tools_by_tools_config(app_config["tools"])
+
+            # 3.检测是否关联了知识库，关联则构建LangChain知识库检索工具
+            if app_config["datasets"]:
+                dataset_retrieval = self.retrieval_service.create_langchain_tool_from_search(
+                    flask_app=current_app._get_current_object(),
+                    dataset_ids=[dataset["id"] for dataset in app_config["datasets"]],
+                    account_id=account_id,
+                    retrieval_source=RetrievalSource.APP,
+                    **app_config["retrieval_config"],
+                )
+                tools.append(dataset_retrieval)
+
+            # todo:4.构建Agent智能体，目前暂时使用FunctionCallAgent
+            return FunctionCallAgent(
+                llm=llm,
+                agent_config=AgentConfig(
+                    user_id=account_id,
+                    invoke_from=invoke_from,
+                    enable_long_term_memory=app_config["long_term_memory"]["enable"],
+                    tools=tools,
+                    review_config=app_config["review_config"],
+                ),
+            )
 
+        cache_key = AgentCache.generate_cache_key(FunctionCallAgent, app_config, account_id, invoke_from)
+        return AgentCache.get_or_create(cache_key, create_agent)
 
     def _save_agent_thoughts(
             self,
@@ -1,4 +1,5 @@
 import logging
+from functools import lru_cache
 from typing import Any
 from uuid import UUID
 
@@ -6,56 +7,84 @@ from flask import Flask
 from injector import inject
 from dataclasses import dataclass
 
+from langchain_core.messages import get_buffer_string
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
 from langchain_openai import ChatOpenAI
+from redis import Redis
+from redis.exceptions import LockError
+from sqlalchemy import insert, update
 
 from internal.core.agent.entities.queue_entity import AgentThought, QueueEvent
+from internal.core.memory import TokenBufferMemory
+from internal.entity.cache_entity import LOCK_EXPIRE, LOCK_CONVERSATION_UPDATE_SUMMARY
 from internal.entity.conversation_entity import (
     SUMMARIZER_TEMPLATE,
     CONVERSATION_NAME_TEMPLATE, ConversationInfo, SUGGESTED_QUESTIONS_TEMPLATE, SuggestedQuestions, InvokeFrom,
 )
 from internal.model import Conversation, Message, MessageAgentThought
 from internal.service.base_service import BaseService
+from internal.service.embeddings_service import EmbeddingsService
+from internal.task.conversation_task import update_conversation_summary, update_conversation_name
 from pkg.sqlalchemy import SQLAlchemy
 
+# 长期记忆摘要使用的模型
+CONVERSATION_SUMMARY_MODEL = "gpt-4o-mini"
+
+# 未摘要消息的token预算，超过时才触发一次批量摘要
+CONVERSATION_SUMMARY_TOKEN_BUDGET = 1000
+
 
 @inject
 @dataclass
 class ConversationService(BaseService):
     """会话服务类"""
     db: SQLAlchemy
+    redis_client: Redis
 
     @classmethod
     def summary(cls, human_message:str, ai_message:str, old_summary:str):
         """根据传递的人类消息、AI消息和原始的摘要信息，生成新的摘要"""
-        prompt = ChatPromptTemplate.from_template(SUMMARIZER_TEMPLATE)
-
-        # 调低大模型的温度
-        llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.5)
-
-        summary_chain = prompt | llm | StrOutputParser()
-
-        new_summary = summary_chain.invoke({
+        return cls.get_summary_chain().invoke({
             "summary": old_summary,
             "new_lines": f"Human: {human_message}\nAI: {ai_message}"
         })
-        return new_summary
 
+    @classmethod
+    @lru_cache(maxsize=1)
+    def get_summary_llm(cls) -> ChatOpenAI:
+        """获取摘要使用的大语言模型，进程内只构建一次"""
+        # 调低大模型的温度
+        return ChatOpenAI(model=CONVERSATION_SUMMARY_MODEL, temperature=0.5)
 
     @classmethod
-    def generate_conversation_name(cls, query:str)->str:
-        """根据传递的用户输入生成对话名字"""
+    @lru_cache(maxsize=1)
+    def get_summary_chain(cls) -> Runnable:
+        """获取摘要链，进程内只构建一次"""
+        prompt = ChatPromptTemplate.from_template(SUMMARIZER_TEMPLATE)
+        return prompt | cls.get_summary_llm() | StrOutputParser()
+
+
+    @classmethod
+    @lru_cache(maxsize=1)
+    def get_conversation_name_chain(cls) -> Runnable:
+        """获取生成会话名称的链，进程内只构建一次"""
         prompt = ChatPromptTemplate.from_messages([
             ("system", CONVERSATION_NAME_TEMPLATE),
-            ("human", query)
+            ("human", "{query}")
         ])
 
         # 调低大模型的温度
         llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
         structured_llm = llm.with_structured_output(schema=ConversationInfo)
 
-        chain = prompt | structured_llm
+        return prompt | structured_llm
+
+    @classmethod
+    def generate_conversation_name(cls, query:str)->str:
+        """根据传递的用户输入生成对话名字"""
+        chain = cls.get_conversation_name_chain()
 
         # 提取整理query
         if len(query) > 2000:
@@ -120,19 +149,18 @@ class ConversationService(BaseService):
             message_id: UUID,
             agent_thoughts: list[AgentThought],
     ):
-        """存储智能体推理步骤消息"""
+        """存储智能体推理步骤消息，推理步骤与消息在同一个事务中批量写入，摘要与会话名称交由异步任务生成"""
         with flask_app.app_context():
-            # 1.定义变量存储推理位置及总耗时
+            # 1.定义变量存储推理位置、总耗时、推理步骤记录以及消息的更新内容
             position = 0
             latency = 0
+            agent_thought_rows = []
+            message_values = {}
+            has_answer = False
 
-            # 2.在子线程中重新查询conversation以及message，确保对象会被子线程的会话管理到
-            conversation = self.get(Conversation, conversation_id)
-            message = self.get(Message, message_id)
-
-            # 3.循环遍历所有的智能体推理过程执行存储操作
+            # 2.循环遍历所有的智能体推理过程组装需要存储的数据
             for agent_thought in agent_thoughts:
-                # 4.存储长期记忆召回、推理、消息、动作、知识库检索等步骤
+                # 3.存储长期记忆召回、推理、消息、动作、知识库检索等步骤
                 if agent_thought.event in [
                     QueueEvent.LONG_TERM_MEMORY_RECALL,
                     QueueEvent.AGENT_THOUGHT,
@@ -140,64 +168,148 @@ class ConversationService(BaseService):
                     QueueEvent.AGENT_ACTION,
                     QueueEvent.DATASET_RETRIEVAL,
                 ]:
-                    # 5.更新位置及总耗时
+                    # 4.更新位置及总耗时
                     position += 1
                     latency += agent_thought.latency
 
-                    # 6.创建智能体消息推理步骤
-                    self.create(
-                        MessageAgentThought,
-                        app_id=app_id,
-                        conversation_id=conversation.id,
-                        message_id=message.id,
-                        invoke_from=InvokeFrom.DEBUGGER,
-                        created_by=account_id,
-                        position=position,
-                        event=agent_thought.event,
-                        thought=agent_thought.thought,
-                        observation=agent_thought.observation,
-                        tool=agent_thought.tool,
-                        tool_input=agent_thought.tool_input,
-                        message=agent_thought.message,
-                        answer=agent_thought.answer,
-                        latency=agent_thought.latency,
-                    )
-
-                # 7.检测事件是否为Agent_message
+                    # 5.组装智能体消息推理步骤
+                    agent_thought_rows.append({
+                        "app_id": app_id,
+                        "conversation_id": conversation_id,
+                        "message_id": message_id,
+                        "invoke_from": InvokeFrom.DEBUGGER,
+                        "created_by": account_id,
+                        "position": position,
+                        "event": agent_thought.event,
+                        "thought": agent_thought.thought,
+                        "observation": agent_thought.observation,
+                        "tool": agent_thought.tool,
+                        "tool_input": agent_thought.tool_input,
+                        "message": agent_thought.message,
+                        "answer": agent_thought.answer,
+                        "latency": agent_thought.latency,
+                    })
+
+                # 6.检测事件是否为Agent_message，是则更新消息信息
                 if agent_thought.event == QueueEvent.AGENT_MESSAGE:
-                    # 8.更新消息信息
-                    self.update(
-                        message,
+                    message_values.update(
                         message=agent_thought.message,
                         answer=agent_thought.answer,
+                        answer_token_count=EmbeddingsService.calculate_token_count(agent_thought.answer),
                         latency=latency,
                     )
+                    has_answer = True
 
-                    # 9.检测是否开启长期记忆
-                    if app_config["long_term_memory"]["enable"]:
-                        new_summary = self.summary(
-                            message.query,
-                            agent_thought.answer,
-                            conversation.summary
-                        )
-                        self.update(
-                            conversation,
-                            summary=new_summary,
-                        )
-
-                    # 10.处理生成新会话名称
-                    if conversation.is_new:
-                        new_conversation_name = self.generate_conversation_name(message.query)
-                        self.update(
-                            conversation,
-                            name=new_conversation_name,
-                        )
-
-                # 11.判断是否为停止或者错误，如果是则需要更新消息状态
+                # 7.判断是否为停止或者错误，如果是则需要更新消息状态
                 if agent_thought.event in [QueueEvent.TIMEOUT, QueueEvent.STOP, QueueEvent.ERROR]:
-                    self.update(
-                        message,
+                    message_values.update(
                         status=agent_thought.event,
-                        observation=agent_thought.observation,
+                        error=agent_thought.observation,
                     )
                     break
+
+            # 8.在同一个事务中批量写入推理步骤并更新消息
+            updated_message = None
+            with self.db.auto_commit():
+                if agent_thought_rows:
+                    self.db.session.execute(insert(MessageAgentThought), agent_thought_rows)
+                if message_values:
+                    updated_message = self.db.session.execute(
+                        update(Message).where(Message.id == message_id).values(**message_values).returning(
+                            Message.query, Message.query_token_count, Message.answer, Message.answer_token_count,
+                        )
+                    ).first()
+
+            # 9.消息产生了可作为历史的答案时追加到会话历史缓存
+            if (
+                    updated_message is not None
+                    and updated_message.answer
+                    and message_values.get("status") != QueueEvent.ERROR
+            ):
+                TokenBufferMemory.append_history_entry(conversation_id, {
+                    "query": updated_message.query,
+                    "answer": updated_message.answer,
+                    "query_token_count": updated_message.query_token_count,
+                    "answer_token_count": updated_message.answer_token_count,
+                })
+
+            # 10.生成了答案时投递异步任务，生成长期记忆摘要以及会话名称，避免在LLM调用期间占用数据库连接，
+            # 会话名称只在新会话中生成，提前检测避免每次回答都投递一个直接返回的任务
+            if has_answer:
+                if app_config["long_term_memory"]["enable"]:
+                    update_conversation_summary.delay(conversation_id, app_config["dialog_round"])
+                conversation = self.get(Conversation, conversation_id)
+                if conversation and conversation.is_new:
+                    update_conversation_name.delay(conversation_id, message_id)
+
+    def update_conversation_summary(self, conversation_id: UUID, dialog_round: int) -> None:
+        """滚动更新会话的长期记忆摘要，只有未摘要的消息超过token预算或者即将滑出短期记忆时才批量摘要，同一会话并发触发时只执行一次"""
+        # 1.非阻塞获取会话摘要锁，已有任务在摘要时直接跳过，本轮消息会在下一次摘要中一并处理
+        cache_key = LOCK_CONVERSATION_UPDATE_SUMMARY.format(conversation_id=conversation_id)
+        lock = self.redis_client.lock(cache_key, timeout=LOCK_EXPIRE)
+        if not lock.acquire(blocking=False):
+            return
+
+        try:
+            # 2.查询会话以及尚未被摘要的消息
+            conversation = self.get(Conversation, conversation_id)
+            if not conversation:
+                return
+            token_buffer_memory = TokenBufferMemory(
+                db=self.db,
+                conversation=conversation,
+                model_instance=self.get_summary_llm(),
+            )
+            prompt_messages, last_created_at = token_buffer_memory.get_unsummarized_prompt_messages(
+                conversation.summarized_at,
+            )
+
+            # 3.未摘要的token数未超过预算，且轮数未超过短期记忆的轮数时暂不摘要
+            turn_count = len(prompt_messages) // 2
+            if (
+                    token_buffer_memory.count_tokens(prompt_messages) < CONVERSATION_SUMMARY_TOKEN_BUDGET
+                    and turn_count < max(dialog_round, 1)
+            ):
+                return
+            old_summary = conversation.summary
+
+            # 4.调用LLM前释放数据库连接，多轮消息合并为一次摘要调用
+            self.db.session.close()
+            new_summary = self.get_summary_chain().invoke({
+                "summary": old_summary,
+                "new_lines": get_buffer_string(prompt_messages),
+            })
+
+            # 5.更新会话摘要以及摘要覆盖的位置
+            with self.db.auto_commit():
+                self.db.session.execute(
+                    update(Conversation).where(Conversation.id == conversation_id).values(
+                        summary=new_summary,
+                        summarized_at=last_created_at,
+                    )
+                )
+        finally:
+            # 摘要耗时超过锁的过期时间时锁已经失效，释放会抛出LockError，此时无需处理
+            try:
+                lock.release()
+            except LockError:
+                logging.warning(f"会话摘要锁已过期, conversation_id: {conversation_id}")
+
+    def update_conversation_name(self, conversation_id: UUID, message_id: UUID) -> None:
+        """根据消息的提问生成会话名称"""
+        # 1.查询会话与消息，并检测是否需要生成会话名称
+        conversation = self.get(Conversation, conversation_id)
+        message = self.get(Message, message_id)
+        if not conversation or not message or not conversation.is_new:
+            return
+        query = message.query
+
+        # 2.调用LLM前释放数据库连接
+        self.db.session.close()
+        new_conversation_name = self.generate_conversation_name(query)
+
+        # 3.更新会话名称
+        with self.db.auto_commit():
+            self.db.session.execute(
+                update(Conversation).where(Conversation.id == conversation_id).values(name=new_conversation_name)
+            )
@@ -14,9 +14,10 @@ from .base_service import BaseService
 from internal.model import Dataset, Segment, DatasetQuery, Account
 from internal.exception import ValidationException, NotFoundException, FailedException
 from internal.entity.dataset_entity import DEFAULT_DATASET_DESCRIPTION_FORMATTER
-from internal.lib.helper import datetime_to_timestamp
+from internal.lib.helper import datetime_to_timestamp, build_search_filter
 from internal.model.app import AppDatasetJoin
 from internal.task.dataset_task import delete_dataset
+from .app_config_service import AppConfigService
 from .retrieval_service import RetrievalService
 
 
@@ -27,6 +28,7 @@ class DatasetService(BaseService):
     """知识库服务"""
     db: SQLAlchemy
     retrieval_service: RetrievalService
+    app_config_service: AppConfigService
 
     def create_dataset(self, req: CreateDatasetRequest, account: Account = None):
         """创建数据集"""
@@ -94,6 +96,9 @@ class DatasetService(BaseService):
             description=req.description.data,
         )
 
+        # 5.知识库信息已变更，使引用该知识库的应用配置缓存失效
+        self.app_config_service.invalidate_account_app_configs(account_id)
+
         return dataset
 
     def get_datasets_with_page(self, req: GetDatasetsWithPageRequest, account: Account = None) -> tuple[list[Dataset], Paginator]:
@@ -106,14 +111,15 @@ class DatasetService(BaseService):
         # 2.构建筛选器
         filters = [Dataset.account_id == account_id]
         if req.search_word.data:
-            filters.append(Dataset.name.ilike(f"%{req.search_word.data}%"))
+            filters.append(build_search_filter(Dataset.name, req.search_word.data))
 
         # 3.执行分页并获取数据
         datasets = paginator.paginate(
             self.db.session.query(Dataset).filter(*filters).order_by(desc("created_at"))
         )
 
-        return datasets, paginator
+        # 4.批量加载当前页知识库的统计数据
+        return Dataset.load_stats(datasets), paginator
 
 
     def hit(self, dataset_id: UUID, req:HitRequest, account: Account = None)->list[dict]:
@@ -210,7 +216,10 @@ class DatasetService(BaseService):
                     AppDatasetJoin.dataset_id == dataset_id,
                 ).delete()
 
-            # 3.调用异步任务执行后续的操作
+            # 3.使引用该知识库的应用配置缓存失效
+            self.app_config_service.invalidate_account_app_configs(account_id)
+
+            # 4.调用异步任务执行后续的操作
             delete_dataset.delay(dataset_id)
         except Exception as e:
             logging.exception(f"删除知识库失败, dataset_id: {dataset_id}, 错误信息: {str(e)}")
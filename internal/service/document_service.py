@@ -8,13 +8,13 @@ from injector import inject
 from dataclasses import dataclass
 
 from redis import Redis
-from sqlalchemy import desc, asc, func
+from sqlalchemy import desc, asc
 
 from internal.entity.cache_entity import LOCK_DOCUMENT_UPDATE_ENABLED, LOCK_EXPIRE
-from internal.entity.dataset_entity import DocumentProcessType, SegmentStatus, DocumentStatus
+from internal.entity.dataset_entity import DocumentProcessType, DocumentStatus
 from internal.entity.upload_file_entity import ALLOW_FILE_EXTENSIONS
-from internal.lib.helper import datetime_to_timestamp
-from internal.model import Document, Dataset, UploadFile, ProcessRule, Segment, Account
+from internal.lib.helper import datetime_to_timestamp, build_search_filter
+from internal.model import Document, Dataset, UploadFile, ProcessRule, Account
 from internal.schema.document_schema import GetDocumentsWithPageRequest
 from internal.service.base_service import BaseService
 from internal.task import document_task
@@ -111,23 +111,13 @@ class DocumentService(BaseService):
         if not documents or len(documents) == 0:
             raise NotFoundException("没有文档")
 
+        # 批量加载文档的上传文件、总片段数量和已经构建完成的片段数量
+        Document.load_stats(documents)
+
         # 提取状态数据
         documents_status = []
         for document in documents:
             upload_file = document.upload_file
-            # 查询每个文档的总片段数量和已经构建完成的片段数量
-            segment_count = self.db.session.query(
-                func.count(Segment.id)
-            ).filter(
-                Segment.document_id == document.id
-            ).scalar()
-
-            completed_segment_count = self.db.session.query(
-                func.count(Segment.id)
-            ).filter(
-                Segment.document_id == document.id,
-                Segment.status == SegmentStatus.COMPLETED
-            ).scalar()
 
             documents_status.append({
                 "id": str(document.id),
@@ -137,8 +127,8 @@ class DocumentService(BaseService):
                 "mime_type": upload_file.mime_type,
                 "status": document.status,
                 "position": document.position,
-                "segment_count": segment_count,
-                "completed_segment_count": completed_segment_count,
+                "segment_count": document.segment_count,
+                "completed_segment_count": document.completed_segment_count,
                 "error": document.error,
                 "processing_started_at": datetime_to_timestamp(document.processing_started_at),
                 "parsing_completed_at": datetime_to_timestamp(document.parsing_completed_at),
@@ -187,12 +177,16 @@ class DocumentService(BaseService):
         ]
 
         if req.search_word.data:
-            filters.append(Document.name.ilike(f"%{req.search_word.data}%"))
+            filters.append(build_search_filter(Document.name, req.search_word.data))
 
         documents = paginator.paginate(
-            self.db.session.query(Document).filter(*filters).order_by(desc("created_at"))
+            self.db.session.query(Document).filter(*filters),
+            sort_column=Document.created_at,
+            id_column=Document.id,
         )
-        return documents, paginator
+
+        # 批量加载当前页文档的统计数据
+        return Document.load_stats(documents), paginator
 
     def update_document(self, dataset_id: UUID, document_id: UUID, account: Account = None, **kwargs) -> Document:
         """更新文档名称"""
@@ -1,49 +1,241 @@
 import os
+import time
+import unicodedata
+from collections import OrderedDict
 from dataclasses import dataclass
+from functools import lru_cache
+from threading import Lock
 
+import numpy as np
 import tiktoken
 from injector import inject
-from langchain.embeddings import CacheBackedEmbeddings
-from langchain_community.storage import RedisStore
 from langchain_core.embeddings import Embeddings
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_openai import OpenAIEmbeddings
 from redis import Redis
 
+from internal.entity.cache_entity import (
+    EMBEDDING_CACHE_KEY,
+    EMBEDDING_CACHE_EXPIRE,
+    EMBEDDING_CACHE_HIT_COUNTER,
+    EMBEDDING_CACHE_MISS_COUNTER,
+    EMBEDDING_QUERY_CACHE_KEY,
+    EMBEDDING_QUERY_CACHE_EXPIRE,
+)
+from internal.lib.helper import generate_text_hash
+
+# 文本嵌入模型名称，同时作为向量缓存键的一部分
+EMBEDDING_MODEL_NAME = "text-embedding-3-small"
+
+# 计算token使用的编码名称
+TOKEN_ENCODING_NAME = "cl100k_base"
+
+# 走LRU缓存的短文本最大字符数，以及缓存的最大条数
+TOKEN_COUNT_CACHE_MAX_LENGTH = 1024
+TOKEN_COUNT_CACHE_SIZE = 8192
+
+# 进程内查询向量LRU缓存的最大条数以及过期时间(秒)
+QUERY_EMBEDDING_LOCAL_CACHE_SIZE = 2048
+QUERY_EMBEDDING_LOCAL_CACHE_EXPIRE = 10 * 60
+
+
+@lru_cache(maxsize=None)
+def _get_encoding() -> tiktoken.Encoding:
+    """获取进程内共享的tiktoken编码器，只在首次调用时加载"""
+    return tiktoken.get_encoding(TOKEN_ENCODING_NAME)
+
+
+@lru_cache(maxsize=TOKEN_COUNT_CACHE_SIZE)
+def _cached_token_count(query: str) -> int:
+    """计算短文本的token数并缓存，文本分割器会反复度量相同的片段"""
+    return len(_get_encoding().encode(query))
+
+
+class HashCachedEmbeddings(Embeddings):
+    """以模型名称+文本hash为键的向量缓存，相同内容的片段跨文档、跨知识库只向量化一次"""
+
+    def __init__(self, embeddings: Embeddings, redis: Redis, model_name: str):
+        self.embeddings = embeddings
+        self.redis = redis
+        self.model_name = model_name
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """向量化文本列表，hash与片段记录的hash计算方式一致"""
+        return self.embed_documents_with_hashes(texts, [generate_text_hash(text) for text in texts])
+
+    def embed_query(self, text: str) -> list[float]:
+        """向量化单条文本"""
+        return self.embed_documents([text])[0]
+
+    def embed_documents_with_hashes(self, texts: list[str], hashes: list[str]) -> list[list[float]]:
+        """根据已知的文本hash向量化文本列表，先查缓存，未命中的内容去重后再调用模型接口"""
+        if not texts:
+            return []
+
+        # 1.批量读取缓存，向量以float32紧凑字节存储
+        keys = [EMBEDDING_CACHE_KEY.format(model_name=self.model_name, text_hash=text_hash) for text_hash in hashes]
+        vectors = [
+            None if value is None else np.frombuffer(value, dtype=np.float32).tolist()
+            for value in self.redis.mget(keys)
+        ]
+        hit_count = sum(1 for vector in vectors if vector is not None)
+
+        # 2.未命中的内容按hash去重后统一调用模型接口
+        missing = {}
+        for text, text_hash, vector in zip(texts, hashes, vectors):
+            if vector is None:
+                missing.setdefault(text_hash, text)
+
+        with self.redis.pipeline(transaction=False) as pipe:
+            if missing:
+                computed = dict(zip(missing.keys(), self.embeddings.embed_documents(list(missing.values()))))
+                for text_hash, vector in computed.items():
+                    pipe.set(
+                        EMBEDDING_CACHE_KEY.format(model_name=self.model_name, text_hash=text_hash),
+                        np.asarray(vector, dtype=np.float32).tobytes(),
+                        ex=EMBEDDING_CACHE_EXPIRE,
+                    )
+                vectors = [
+                    vector if vector is not None else computed[text_hash]
+                    for text_hash, vector in zip(hashes, vectors)
+                ]
+
+            # 3.记录命中/未命中次数
+            pipe.incrby(EMBEDDING_CACHE_HIT_COUNTER.format(model_name=self.model_name), hit_count)
+            pipe.incrby(EMBEDDING_CACHE_MISS_COUNTER.format(model_name=self.model_name), len(texts) - hit_count)
+            pipe.execute()
+
+        return vectors
+
+    def get_stats(self) -> dict[str, int]:
+        """获取向量缓存的命中/未命中次数"""
+        hit, miss = self.redis.mget([
+            EMBEDDING_CACHE_HIT_COUNTER.format(model_name=self.model_name),
+            EMBEDDING_CACHE_MISS_COUNTER.format(model_name=self.model_name),
+        ])
+        return {"hit": int(hit or 0), "miss": int(miss or 0)}
+
+
+class QueryCachedEmbeddings(Embeddings):
+    """查询向量缓存，进程内带过期时间的LRU缓存在前，Redis缓存在后，键为模型名称+规范化后的查询文本"""
+
+    def __init__(self, embeddings: Embeddings, redis: Redis, model_name: str):
+        self.embeddings = embeddings
+        self.redis = redis
+        self.model_name = model_name
+        self._local_cache: OrderedDict[str, tuple[float, list[float]]] = OrderedDict()
+        self._lock = Lock()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """文档向量化不走查询缓存"""
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        """向量化单条查询"""
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, queries: list[str]) -> list[list[float]]:
+        """批量向量化查询，依次查询进程内缓存、Redis缓存，剩余的查询去重后一次调用模型接口"""
+        if not queries:
+            return []
+
+        # 1.规范化查询并计算缓存键
+        normalized = [self.normalize_query(query) for query in queries]
+        keys = [
+            EMBEDDING_QUERY_CACHE_KEY.format(model_name=self.model_name, query_hash=generate_text_hash(query))
+            for query in normalized
+        ]
+
+        # 2.查询进程内缓存
+        vectors: dict[str, list[float]] = {}
+        for key in set(keys):
+            vector = self._get_local(key)
+            if vector is not None:
+                vectors[key] = vector
+
+        # 3.进程内未命中的查询批量读取Redis缓存
+        redis_keys = [key for key in dict.fromkeys(keys) if key not in vectors]
+        if redis_keys:
+            for key, value in zip(redis_keys, self.redis.mget(redis_keys)):
+                if value is not None:
+                    vectors[key] = np.frombuffer(value, dtype=np.float32).tolist()
+                    self._set_local(key, vectors[key])
+
+        # 4.剩余的查询一次调用模型接口，并回写两级缓存
+        missing = {key: query for key, query in zip(keys, normalized) if key not in vectors}
+        if missing:
+            computed = self.embeddings.embed_documents(list(missing.values()))
+            with self.redis.pipeline(transaction=False) as pipe:
+                for key, vector in zip(missing.keys(), computed):
+                    vectors[key] = vector
+                    self._set_local(key, vector)
+                    pipe.set(key, np.asarray(vector, dtype=np.float32).tobytes(), ex=EMBEDDING_QUERY_CACHE_EXPIRE)
+                pipe.execute()
+
+        return [vectors[key] for key in keys]
+
+    @classmethod
+    def normalize_query(cls, query: str) -> str:
+        """规范化查询文本，统一全半角并合并多余空白"""
+        return " ".join(unicodedata.normalize("NFKC", query).split())
+
+    def _get_local(self, key: str) -> list[float] | None:
+        with self._lock:
+            item = self._local_cache.get(key)
+            if item is None:
+                return None
+            expired_at, vector = item
+            if expired_at < time.monotonic():
+                del self._local_cache[key]
+                return None
+            self._local_cache.move_to_end(key)
+            return vector
+
+    def _set_local(self, key: str, vector: list[float]) -> None:
+        with self._lock:
+            self._local_cache[key] = (time.monotonic() + QUERY_EMBEDDING_LOCAL_CACHE_EXPIRE, vector)
+            self._local_cache.move_to_end(key)
+            while len(self._local_cache) > QUERY_EMBEDDING_LOCAL_CACHE_SIZE:
+                self._local_cache.popitem(last=False)
+
 
 @inject
 @dataclass
 class EmbeddingsService:
     """文本嵌入模型服务"""
-    _store: RedisStore
     _embeddings: Embeddings
-    _cache_backed_embeddings: CacheBackedEmbeddings
+    _cache_backed_embeddings: HashCachedEmbeddings
+    _query_embeddings: QueryCachedEmbeddings
 
     def __init__(self, redis: Redis):
-        """构造函数，初始化文本嵌入模型客户端、存储器、缓存客户端"""
-        self._store = RedisStore(client=redis)
+        """构造函数，初始化文本嵌入模型客户端、向量缓存"""
         # 使用 OpenAI 的 text-embedding-3-small 模型，它输出 1536 维向量
-        self._embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
-        self._cache_backed_embeddings = CacheBackedEmbeddings.from_bytes_store(
-            self._embeddings,
-            self._store,
-            namespace="embeddings",
-        )
+        self._embeddings = OpenAIEmbeddings(model=EMBEDDING_MODEL_NAME)
+        self._cache_backed_embeddings = HashCachedEmbeddings(self._embeddings, redis, EMBEDDING_MODEL_NAME)
+        self._query_embeddings = QueryCachedEmbeddings(self._embeddings, redis, EMBEDDING_MODEL_NAME)
 
     @classmethod
     def calculate_token_count(cls, query: str) -> int:
         """计算传入文本的token数"""
-        encoding = tiktoken.get_encoding("cl100k_base")
-        return len(encoding.encode(query))
+        if len(query) <= TOKEN_COUNT_CACHE_MAX_LENGTH:
+            return _cached_token_count(query)
+        return len(_get_encoding().encode(query))
 
-    @property
-    def store(self) -> RedisStore:
-        return self._store
+    @classmethod
+    def calculate_token_counts(cls, queries: list[str], num_threads: int = 8) -> list[int]:
+        """批量计算传入文本列表的token数，num_threads大于1时使用线程池并行编码"""
+        if num_threads > 1 and len(queries) > 1:
+            return [len(tokens) for tokens in _get_encoding().encode_batch(queries, num_threads=num_threads)]
+        return [cls.calculate_token_count(query) for query in queries]
 
     @property
     def embeddings(self) -> Embeddings:
         return self._embeddings
 
     @property
-    def cache_backed_embeddings(self) -> CacheBackedEmbeddings:
-        return self._cache_backed_embeddings
\ No newline at end of file
+    def cache_backed_embeddings(self) -> HashCachedEmbeddings:
+        return self._cache_backed_embeddings
+
+    @property
+    def query_embeddings(self) -> QueryCachedEmbeddings:
+        return self._query_embeddings
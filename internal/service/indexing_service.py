@@ -1,17 +1,22 @@
 import logging
+import multiprocessing
 import re
+import time
 import uuid
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
+from queue import Queue
+from threading import Lock
+from typing import Any, Callable
 from uuid import UUID
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 
 from flask import Flask, current_app
 from injector import inject
 from langchain_core.documents import Document as LCDocument
-from sqlalchemy import func
+from openai import RateLimitError
+from sqlalchemy import func, update
 from redis import Redis
-from weaviate.classes.query import Filter
 
 from internal.core.file_extractor import FileExtractor
 from internal.entity.cache_entity import LOCK_DOCUMENT_UPDATE_ENABLED, LOCK_KEYWORD_TABLE_UPDATE_KEYWORD_TABLE, \
@@ -19,7 +24,7 @@ from internal.entity.cache_entity import LOCK_DOCUMENT_UPDATE_ENABLED, LOCK_KEYW
 from internal.entity.dataset_entity import DocumentStatus, SegmentStatus
 from internal.exception import NotFoundException
 from internal.lib.helper import generate_text_hash
-from internal.model import Document, Segment, KeywordTable, DatasetQuery
+from internal.model import Document, Segment, KeywordTable, KeywordIndex, KeywordIndexStat, DatasetQuery
 from internal.service import EmbeddingsService
 from internal.service.base_service import BaseService
 from internal.service.jieba_service import JiebaService
@@ -28,6 +33,52 @@ from internal.service.process_rule_service import ProcessRuleService
 from internal.service.vector_database_service import VectorDatabaseService
 from pkg.sqlalchemy import SQLAlchemy
 
+# 向量化批次的初始/最小/最大token预算，以及单个批次的最大片段数(OpenAI单次请求最多2048条输入)
+EMBEDDING_BATCH_TOKEN_BUDGET = 16000
+EMBEDDING_BATCH_MIN_TOKEN_BUDGET = 2000
+EMBEDDING_BATCH_MAX_TOKEN_BUDGET = 240000
+EMBEDDING_BATCH_MAX_SIZE = 2048
+
+# 向量写入的初始/最大并发数、单批次目标耗时(秒)以及被限流批次的最大重试次数
+EMBEDDING_INITIAL_CONCURRENCY = 2
+EMBEDDING_MAX_CONCURRENCY = 8
+EMBEDDING_TARGET_LATENCY = 10.0
+EMBEDDING_MAX_RETRIES = 5
+
+
+@dataclass
+class AdaptiveBatchController:
+    """自适应批量控制器，批次耗时正常时扩大token预算和并发数，耗时过长或被限流时收缩并退避"""
+    token_budget: int = EMBEDDING_BATCH_TOKEN_BUDGET
+    concurrency: int = EMBEDDING_INITIAL_CONCURRENCY
+    backoff: float = 0.0
+    lock: Lock = field(default_factory=Lock)
+
+    def next_batch_end(self, token_counts: list[int], start: int) -> int:
+        """从start开始按当前token预算切分一个批次，返回批次结束位置，每个批次至少包含一个片段"""
+        end, tokens = start, 0
+        while end < len(token_counts) and end - start < EMBEDDING_BATCH_MAX_SIZE:
+            if end > start and tokens + token_counts[end] > self.token_budget:
+                break
+            tokens += token_counts[end]
+            end += 1
+        return end
+
+    def observe(self, latency: float, rate_limited: bool) -> None:
+        """根据批次执行结果调整token预算、并发数和退避时间"""
+        with self.lock:
+            if rate_limited:
+                self.token_budget = max(EMBEDDING_BATCH_MIN_TOKEN_BUDGET, self.token_budget // 2)
+                self.concurrency = max(1, self.concurrency // 2)
+                self.backoff = min(60.0, max(1.0, self.backoff * 2))
+            elif latency > EMBEDDING_TARGET_LATENCY:
+                self.token_budget = max(EMBEDDING_BATCH_MIN_TOKEN_BUDGET, self.token_budget * 3 // 4)
+                self.backoff = 0.0
+            else:
+                self.token_budget = min(EMBEDDING_BATCH_MAX_TOKEN_BUDGET, self.token_budget * 3 // 2)
+                self.concurrency = min(EMBEDDING_MAX_CONCURRENCY, self.concurrency + 1)
+                self.backoff = 0.0
+
 
 @inject
 @dataclass
@@ -44,43 +95,165 @@ class IndexingService(BaseService):
     redis_client: Redis
 
     def build_documents(self, document_ids:list[UUID]) -> None:
-        """根据文档id构建Document"""
+        """根据文档id构建Document，多个文档时使用解析->分割/关键词->向量存储三阶段流水线并发构建"""
+        # 单个文档无需流水线，直接按顺序构建
+        if len(document_ids) <= 1:
+            for document_id in document_ids:
+                self._build_document(document_id)
+            return
+
+        self._build_documents_pipeline(document_ids)
+
+    def _build_document(self, document_id:UUID) -> None:
+        """按顺序执行单个文档的解析、分割、索引以及存储"""
+        lc_documents = self._run_parsing_stage(document_id, None)
+        if lc_documents is None:
+            return
+        lc_segments = self._run_splitting_stage(document_id, lc_documents)
+        if lc_segments is None:
+            return
+        self._run_complete_stage(document_id, lc_segments)
+
+    def _build_documents_pipeline(self, document_ids:list[UUID]) -> None:
+        """流水线构建文档，各阶段之间使用有界队列连接，每个文档的状态流转与顺序构建保持一致"""
+        # 1.读取各阶段并发数与队列大小配置
+        flask_app = current_app._get_current_object()
+        parse_workers = max(1, int(flask_app.config.get("INDEXING_PARSE_WORKERS", 2)))
+        split_workers = max(1, int(flask_app.config.get("INDEXING_SPLIT_WORKERS", 2)))
+        embed_workers = max(1, int(flask_app.config.get("INDEXING_EMBED_WORKERS", 2)))
+        queue_size = max(1, int(flask_app.config.get("INDEXING_QUEUE_SIZE", 4)))
+
+        # 2.创建阶段间的队列，解析队列一次性放入所有文档id，后续队列有界以控制内存占用
+        parse_queue = Queue()
+        split_queue = Queue(maxsize=queue_size)
+        complete_queue = Queue(maxsize=queue_size)
+        for document_id in document_ids:
+            parse_queue.put((document_id, None))
+        for _ in range(parse_workers):
+            parse_queue.put(None)
+
+        # 3.解析为CPU密集型任务，使用进程池；守护进程不允许创建子进程(与启动方式无关)，
+        # celery默认的prefork池中每个子进程都是守护进程，因此在prefork池中总是退化为线程内解析，
+        # 需要进程池解析时应使用threads/solo池启动worker，并通过增加worker进程数横向扩展
+        process_pool = None
+        if not multiprocessing.current_process().daemon:
+            process_pool = ProcessPoolExecutor(max_workers=parse_workers)
+        else:
+            logging.info("当前进程为守护进程(celery prefork池)，文档解析使用线程执行")
 
-        # 根据传递的文档id获取所有文档
-        documents = self.db.session.query(Document).filter(
-            Document.id.in_(document_ids)).all()
+        try:
+            with ThreadPoolExecutor(max_workers=parse_workers + split_workers + embed_workers) as executor:
+                # 4.启动各阶段的工作线程
+                parse_futures = [
+                    executor.submit(self._pipeline_worker, flask_app, parse_queue, split_queue,
+                                    lambda document_id, _: self._run_parsing_stage(document_id, process_pool))
+                    for _ in range(parse_workers)
+                ]
+                split_futures = [
+                    executor.submit(self._pipeline_worker, flask_app, split_queue, complete_queue,
+                                    self._run_splitting_stage)
+                    for _ in range(split_workers)
+                ]
+                complete_futures = [
+                    executor.submit(self._pipeline_worker, flask_app, complete_queue, None,
+                                    self._run_complete_stage)
+                    for _ in range(embed_workers)
+                ]
+
+                # 5.上游阶段全部结束后，无论工作线程是否异常退出都向下游队列发送结束标记，避免下游永久阻塞
+                for futures, next_queue, next_workers in [
+                    (parse_futures, split_queue, split_workers),
+                    (split_futures, complete_queue, embed_workers),
+                    (complete_futures, None, 0),
+                ]:
+                    for future in futures:
+                        try:
+                            future.result()
+                        except Exception as e:
+                            logging.exception(f"文档构建流水线工作线程异常退出，错误信息： {str(e)}")
+                    for _ in range(next_workers):
+                        next_queue.put(None)
+        finally:
+            if process_pool is not None:
+                process_pool.shutdown()
 
-        # 遍历文档
-        for document in documents:
+    @classmethod
+    def _pipeline_worker(
+            cls,
+            flask_app:Flask,
+            in_queue:Queue,
+            out_queue:Queue | None,
+            handler:Callable[[UUID, Any], Any],
+    ) -> None:
+        """流水线阶段工作线程，不断从上游队列获取任务，处理成功后放入下游队列，遇到结束标记退出，
+        单个任务抛出的任何异常只记录日志并丢弃该任务，保证工作线程持续消费上游队列，不会阻塞上下游阶段"""
+        while True:
+            item = in_queue.get()
+            if item is None:
+                break
+
+            # 每个任务使用独立的应用上下文，处理结束后释放数据库会话
+            document_id, payload = item
             try:
-                # 更新当前状态为解析中，并记录开始处理时间
-                self.update(
-                    document,
-                    status=DocumentStatus.PARSING,
-                    processing_started_at=datetime.now(),
-                )
-                # 执行文档加载步骤，并更新文档状态和时间
-                lc_documents = self._parsing(document)
-                print("文档预处理结束")
-                # 执行文档分割步骤，并更新文档状态和时间，segment信息也要修改
-                lc_segments = self._splitting(document, lc_documents)
-                print("文档分割结束")
-                # 执行文档索引构建，涵盖关键词提取、向量，并更新数据状态
-                self._indexing(document, lc_segments)
-                print("文档索引构建结束")
-                # 存储操作，涵盖文档状态更新和向量数据库存储
-                self._complete(document, lc_segments)
-                print("文档存储结束")
+                with flask_app.app_context():
+                    result = handler(document_id, payload)
             except Exception as e:
-                logging.exception(f"构建文档发生错误，错误信息： {str(e)}")
-                # 更新文档状态
-                self.update(
-                    document,
-                    status=DocumentStatus.ERROR,
-                    error=str(e),
-                    stopped_at=datetime.now(),
-                )
+                logging.exception(f"文档构建流水线处理失败, document_id: {document_id}, 错误信息： {str(e)}")
+                continue
 
+            if result is not None and out_queue is not None:
+                out_queue.put((document_id, result))
+
+    def _run_parsing_stage(self, document_id:UUID, process_pool:Executor | None) -> list[LCDocument] | None:
+        """解析阶段，失败时将文档标记为错误并返回None"""
+        document = self.get(Document, document_id)
+        if document is None:
+            return None
+        try:
+            # 更新当前状态为解析中，并记录开始处理时间
+            self.update(
+                document,
+                status=DocumentStatus.PARSING,
+                processing_started_at=datetime.now(),
+            )
+            return self._parsing(document, process_pool)
+        except Exception as e:
+            self._build_document_error(document, e)
+            return None
+
+    def _run_splitting_stage(self, document_id:UUID, lc_documents:list[LCDocument]) -> list[LCDocument] | None:
+        """分割与关键词索引阶段，失败时将文档标记为错误并返回None"""
+        document = self.get(Document, document_id)
+        if document is None:
+            return None
+        try:
+            lc_segments = self._splitting(document, lc_documents)
+            self._indexing(document, lc_segments)
+            return lc_segments
+        except Exception as e:
+            self._build_document_error(document, e)
+            return None
+
+    def _run_complete_stage(self, document_id:UUID, lc_segments:list[LCDocument]) -> None:
+        """向量存储阶段，失败时将文档标记为错误"""
+        document = self.get(Document, document_id)
+        if document is None:
+            return None
+        try:
+            self._complete(document, lc_segments)
+        except Exception as e:
+            self._build_document_error(document, e)
+
+    def _build_document_error(self, document:Document, e:Exception) -> None:
+        """构建文档出错时记录日志并更新文档状态"""
+        logging.exception(f"构建文档发生错误，错误信息： {str(e)}")
+        self.db.session.rollback()
+        self.update(
+            document,
+            status=DocumentStatus.ERROR,
+            error=str(e),
+            stopped_at=datetime.now(),
+        )
 
     def update_document_enabled(self, document_id:UUID) -> None:
         """根据传递的文档id更新文档状态+向量库"""
@@ -104,28 +277,25 @@ class IndexingService(BaseService):
         node_ids = [
             node_id for _, node_id, _ in segments
         ]
-        # 执行循环遍历所有node_ids并更新向量数据库
+        # 批量更新向量数据库中所有节点的文档启用状态，只将更新失败的节点对应的片段标记为错误
         try:
-            connect = self.vector_database_service.collection
-            for node_id in node_ids:
-                try:
-                    connect.data.update(
-                        uuid=node_id,
-                        properties={
-                            "document_enabled": document.enabled
-                        }
-                    )
-                except Exception as e:
-                    with self.db.auto_commit():
+            failed = self.vector_database_service.backend.update_many(
+                [str(node_id) for node_id in node_ids],
+                {"document_enabled": document.enabled},
+                dataset_id=document.dataset_id,
+            )
+            if failed:
+                with self.db.auto_commit():
+                    for node_id, error in failed.items():
                         self.db.session.query(Segment).filter(
                             Segment.node_id == node_id
                         ).update({
                             "status": SegmentStatus.ERROR,
-                            "error": str(e),
+                            "error": error,
                             "stopped_at": datetime.now(),
                             "enabled": False,
                             "disabled_at": datetime.now()
-                        })
+                        }, synchronize_session=False)
 
             # 更新关键词表对应的数据（enabled为false表示从关键词表中删除数据，enabled为true表示从关键词表中新增数据）
             if document.enabled is True:
@@ -150,10 +320,10 @@ class IndexingService(BaseService):
         finally:
             self.redis_client.delete(cache_key)
 
-    def _parsing(self, document:Document) -> list[LCDocument]:
+    def _parsing(self, document:Document, process_pool:Executor | None=None) -> list[LCDocument]:
         """解析文档"""
         upload_file=document.upload_file
-        lc_documents = self.file_extractor.load(upload_file, False, True)
+        lc_documents = self.file_extractor.load(upload_file, False, True, executor=process_pool)
 
         # 循环处理langchain文档
         for lc_document in lc_documents:
@@ -185,9 +355,14 @@ class IndexingService(BaseService):
             Segment.document_id == document.id
         ).scalar()
 
+        # 批量计算所有片段的token数
+        token_counts = self.embedding_service.calculate_token_counts(
+            [lc_segment.page_content for lc_segment in lc_segments]
+        )
+
         # 循环处理片段数据并添加元数据，存储
         segments= []
-        for lc_segment in lc_segments:
+        for lc_segment, token_count in zip(lc_segments, token_counts):
             position += 1
             content = lc_segment.page_content
             segment = self.create(
@@ -199,7 +374,7 @@ class IndexingService(BaseService):
                 position=position,
                 content=content,
                 character_count=len(content),
-                token_count=self.embedding_service.calculate_token_count(content),
+                token_count=token_count,
                 hash=generate_text_hash(content),
                 status=SegmentStatus.WAITING,
             )
@@ -226,40 +401,29 @@ class IndexingService(BaseService):
         return lc_segments
 
     def _indexing(self, document:Document, lc_segments:list[LCDocument]) -> None:
-        """索引构建"""
-        for lc_segment in lc_segments:
-            # 提取关键词，关键词的数量不超过10个
-            keywords = self.jieba_service.extract_keywords(lc_segment.page_content, 10)
-            # 更新文档的关键词
-            self.db.session.query(Segment).filter(
-                Segment.id == lc_segment.metadata["segment_id"]
-            ).update({"keywords": keywords,
-                      "status": SegmentStatus.INDEXING,
-                      "indexing_completed_at": datetime.now(),
-                      })
-
-            # 获取当前知识库的关键词词表
-            keyword_table_record = self.keyword_table_service.get_keyword_table_from_dataset(document.dataset_id)
-
-            keyword_table = {
-                field: set(value)
-                for field, value in keyword_table_record.keyword_table.items()
-            }
-            # 将新关键词添加到词表中
-            for keyword in keywords:
-                if keyword not in keyword_table:
-                    keyword_table[keyword] = set()
-                keyword_table[keyword].add(lc_segment.metadata["segment_id"])
-
-            # 更新关键词表，确保所有值都是list类型而不是set类型
-            keyword_table_for_update = {}
-            for field, value in keyword_table.items():
-                keyword_table_for_update[field] = list(value)
-
-            self.update(
-                keyword_table_record,
-                keyword_table=keyword_table_for_update
-            )
+        """索引构建，先提取所有片段的关键词，再批量更新片段并一次性合并到关键词表"""
+        # 提取所有片段的关键词，关键词的数量不超过10个
+        segment_keywords = {
+            lc_segment.metadata["segment_id"]: self.jieba_service.extract_keywords(lc_segment.page_content, 10)
+            for lc_segment in lc_segments
+        }
+
+        # 使用一条批量更新语句更新所有片段的关键词及状态
+        if segment_keywords:
+            indexing_completed_at = datetime.now()
+            with self.db.auto_commit():
+                self.db.session.execute(update(Segment), [
+                    {
+                        "id": segment_id,
+                        "keywords": keywords,
+                        "status": SegmentStatus.INDEXING,
+                        "indexing_completed_at": indexing_completed_at,
+                    }
+                    for segment_id, keywords in segment_keywords.items()
+                ])
+
+        # 在关键词表锁内一次性合并本文档所有片段的关键词(含BM25所需的词频与片段长度)
+        self.keyword_table_service.add_keyword_table_from_ids(document.dataset_id, list(segment_keywords.keys()))
 
         # 更新文档数据
         self.update(
@@ -269,54 +433,57 @@ class IndexingService(BaseService):
 
 
     def _complete(self, document:Document, lc_segments:list[LCDocument]) -> None:
-        """完成构建"""
-        # 循环遍历片段列表数据，将文档和片段状态修改为可用
+        """完成构建，按token预算批量向量化并写入向量数据库，批次大小和并发数根据耗时与限流情况自适应调整"""
+        # 1.循环遍历片段列表数据，将文档和片段状态修改为可用
         for lc_segment in lc_segments:
             lc_segment.metadata["document_enabled"] = True
             lc_segment.metadata["segment_enabled"] = True
 
-        # 调用向量数据库，每次存储10条数据
-        def thread_function(flask_app:Flask, chunks:list[LCDocument], ids:list[UUID])-> None:
-            """线程函数，执行向量数据库和pg数据库存储"""
-            with flask_app.app_context():
-                try:
-                    # 调用向量数据库存储
-                    self.vector_database_service.vector_store.add_documents(
-                        chunks,
-                        ids=ids,
-                    )
-                    # 更新片段数据
-                    with self.db.auto_commit():
-                        self.db.session.query(Segment).filter(
-                            Segment.node_id.in_(ids)
-                        ).update({
-                            "status": SegmentStatus.COMPLETED,
-                            'completed_at': datetime.now(),
-                            "enabled": True
-                        })
-                except Exception as e:
-                    logging.exception(f"构建索引失败，错误信息：{str(e)}")
-                    with self.db.auto_commit():
-                        self.db.session.query(Segment).filter(
-                            Segment.node_id.in_(ids)
-                        ).update({
-                            "status": SegmentStatus.ERROR,
-                            'completed_at': None,
-                            "stopped_at": datetime.now(),
-                            "enabled": False
-                        })
-
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            futures = []
-            for i in range(0, len(lc_segments), 10):
-                chunks = lc_segments[i:i + 10]
-                ids = [chunk.metadata["node_id"] for chunk in chunks]
-                futures.append(executor.submit(thread_function, current_app._get_current_object(), chunks, ids))
-
-            for future in futures:
-                future.result()
-
-        # 更新文档数据
+        # 2.读取分割阶段已经写入片段记录的token数，用于按token预算切分批次，无需重新计算
+        segment_token_counts = {
+            str(segment_id): token_count for segment_id, token_count in self.db.session.query(
+                Segment.id, Segment.token_count,
+            ).filter(Segment.document_id == document.id).all()
+        }
+        token_counts = [segment_token_counts.get(lc_segment.metadata["segment_id"], 0) for lc_segment in lc_segments]
+        controller = AdaptiveBatchController()
+        flask_app = current_app._get_current_object()
+
+        # 3.每一轮按当前并发数切分出多个批次并发执行，优先重试被限流的批次
+        start = 0
+        retry_batches: list[tuple[int, int, int]] = []
+        with ThreadPoolExecutor(max_workers=EMBEDDING_MAX_CONCURRENCY) as executor:
+            while start < len(lc_segments) or retry_batches:
+                batches = retry_batches[:controller.concurrency]
+                retry_batches = retry_batches[len(batches):]
+                while len(batches) < controller.concurrency and start < len(lc_segments):
+                    end = controller.next_batch_end(token_counts, start)
+                    batches.append((start, end, 0))
+                    start = end
+
+                # 4.上一轮遇到限流时先退避等待
+                if controller.backoff > 0:
+                    time.sleep(controller.backoff)
+
+                futures = [
+                    (batch, executor.submit(self._complete_batch, flask_app, lc_segments[batch[0]:batch[1]]))
+                    for batch in batches
+                ]
+                for (batch_start, batch_end, attempt), future in futures:
+                    latency, rate_limited = future.result()
+                    controller.observe(latency, rate_limited)
+                    if not rate_limited:
+                        continue
+
+                    # 5.限流的批次重新排队，超过最大重试次数则将片段标记为错误
+                    if attempt + 1 < EMBEDDING_MAX_RETRIES:
+                        retry_batches.append((batch_start, batch_end, attempt + 1))
+                    else:
+                        self._update_segments_status([], [
+                            lc_segment.metadata["node_id"] for lc_segment in lc_segments[batch_start:batch_end]
+                        ])
+
+        # 6.更新文档数据
         self.update(
             document,
             status=DocumentStatus.COMPLETED,
@@ -324,6 +491,52 @@ class IndexingService(BaseService):
             enabled=True,
         )
 
+    def _complete_batch(self, flask_app:Flask, chunks:list[LCDocument]) -> tuple[float, bool]:
+        """向量化并写入一个批次，返回批次耗时以及是否被限流，被限流的批次不更新片段状态"""
+        with flask_app.app_context():
+            ids = [chunk.metadata["node_id"] for chunk in chunks]
+            started_at = time.perf_counter()
+            try:
+                # 通过缓存嵌入器向量化，相同内容的片段直接命中缓存而不调用接口
+                vectors = self.embedding_service.cache_backed_embeddings.embed_documents(
+                    [chunk.page_content for chunk in chunks]
+                )
+                failed_ids = set(self.vector_database_service.backend.add_documents(chunks, vectors, ids))
+            except RateLimitError as e:
+                logging.warning(f"向量化触发限流，稍后重试，错误信息：{str(e)}")
+                return time.perf_counter() - started_at, True
+            except Exception as e:
+                logging.exception(f"构建索引失败，错误信息：{str(e)}")
+                failed_ids = set(ids)
+            latency = time.perf_counter() - started_at
+
+            # 批量提交片段状态
+            self._update_segments_status(
+                [id for id in ids if id not in failed_ids],
+                [id for id in ids if id in failed_ids],
+            )
+            return latency, False
+
+    def _update_segments_status(self, completed_node_ids:list[str], error_node_ids:list[str]) -> None:
+        """根据节点id批量更新片段的完成/错误状态"""
+        with self.db.auto_commit():
+            if completed_node_ids:
+                self.db.session.query(Segment).filter(
+                    Segment.node_id.in_(completed_node_ids)
+                ).update({
+                    "status": SegmentStatus.COMPLETED,
+                    "completed_at": datetime.now(),
+                    "enabled": True,
+                }, synchronize_session=False)
+            if error_node_ids:
+                self.db.session.query(Segment).filter(
+                    Segment.node_id.in_(error_node_ids)
+                ).update({
+                    "status": SegmentStatus.ERROR,
+                    "completed_at": None,
+                    "stopped_at": datetime.now(),
+                    "enabled": False,
+                }, synchronize_session=False)
 
     def delete_document(self, dataset_id:UUID, document_id:UUID)->None:
         """根据dataset_id和document_id删除文档"""
@@ -334,10 +547,7 @@ class IndexingService(BaseService):
             ).all()
         ]
         # 调用向量数据库删除关联记录
-        connection = self.vector_database_service.collection
-        connection.data.delete_many(
-            where=Filter.by_property("document_id").equal(document_id)
-        )
+        self.vector_database_service.backend.delete_by_document_id(document_id, dataset_id=dataset_id)
         # 删除pg中的数据
         with self.db.auto_commit():
             self.db.session.query(Segment).filter(
@@ -365,6 +575,12 @@ class IndexingService(BaseService):
                 self.db.session.query(KeywordTable).filter(
                     KeywordTable.dataset_id == dataset_id,
                 ).delete()
+                self.db.session.query(KeywordIndex).filter(
+                    KeywordIndex.dataset_id == dataset_id,
+                ).delete()
+                self.db.session.query(KeywordIndexStat).filter(
+                    KeywordIndexStat.dataset_id == dataset_id,
+                ).delete()
 
                 # 4.删除知识库查询记录
                 self.db.session.query(DatasetQuery).filter(
@@ -372,9 +588,7 @@ class IndexingService(BaseService):
                 ).delete()
 
             # 5.调用向量数据库删除知识库的关联记录
-            self.vector_database_service.collection.data.delete_many(
-                where=Filter.by_property("dataset_id").equal(str(dataset_id))
-            )
+            self.vector_database_service.backend.delete_by_dataset_id(dataset_id)
         except Exception as e:
             logging.exception(f"异步删除知识库关联内容出错, dataset_id: {dataset_id}, 错误信息: {str(e)}")
 
@@ -1,3 +1,4 @@
+from collections import Counter
 from dataclasses import dataclass
 
 import jieba.analyse
@@ -23,3 +24,8 @@ class JiebaService:
             sentence=text,
             topK=max_keyword_pre_chunk,
         )
+
+    @classmethod
+    def count_terms(cls, text: str) -> Counter:
+        """使用与关键词提取相同的分词器切分文本，返回每个词在文本中出现的次数"""
+        return Counter(jieba.lcut(text))
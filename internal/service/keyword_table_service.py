@@ -3,100 +3,136 @@ from uuid import UUID
 from injector import inject
 from dataclasses import dataclass
 
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
 from internal.entity.cache_entity import LOCK_EXPIRE, LOCK_KEYWORD_TABLE_UPDATE_KEYWORD_TABLE
-from internal.model import KeywordTable, Segment
+from internal.model import KeywordIndex, KeywordIndexStat, Segment
 from internal.service.base_service import BaseService
+from internal.service.jieba_service import JiebaService
 from pkg.sqlalchemy import SQLAlchemy
 
 from redis import Redis
 
+# 倒排索引单条insert语句写入的最大行数
+KEYWORD_INDEX_INSERT_BATCH_SIZE = 1000
+
 
 @inject
 @dataclass
 class KeywordTableService(BaseService):
-    """关键词表服务"""
+    """关键词表服务，基于keyword_index倒排索引表，增删只涉及受影响的片段行，并同步维护BM25所需的知识库统计"""
     db: SQLAlchemy
     redis_client: Redis
+    jieba_service: JiebaService
 
-
-    def get_keyword_table_from_dataset(self, dataset_id:UUID) -> KeywordTable:
-        """根据传入的dataset_id查询其下的关键词词表"""
-        keyword_table = self.db.session.query(KeywordTable).filter(
-            KeywordTable.dataset_id == dataset_id
-        ).one_or_none()
-        if not keyword_table:
-            keyword_table = self.create(
-                KeywordTable,
-                dataset_id=dataset_id,
-                keyword_table = {}
-            )
-
-        return keyword_table
-
-
-    def delete_keyword_table_from_ids(self, dataset_id: UUID, segment_ids: list[str])->None:
+    def delete_keyword_table_from_ids(self, dataset_id: UUID, segment_ids: list[str]) -> None:
         """根据传入的dataset_id和segment_id删除对应的关键词表"""
+        if not segment_ids:
+            return
+
         # 删除知识库中关联的关键词表数据，需要上锁，避免并发更新
         cache_key = LOCK_KEYWORD_TABLE_UPDATE_KEYWORD_TABLE.format(dataset_id=dataset_id)
         with self.redis_client.lock(cache_key, timeout=LOCK_EXPIRE):
-            # 获取当前知识库的关键词表
-            keyword_table_record = self.get_keyword_table_from_dataset(dataset_id)
-            keyword_table = keyword_table_record.keyword_table.copy()
-
-            # 片段id列表转化为集合
-            segment_ids_to_delete = set(segment_ids)
-            keywords_to_delete = set()
-            # 循环遍历关键词表数据
-            for keyword, ids in keyword_table.items():
-                # 删除该片段id
-                ids_set = set(ids)
-                if segment_ids_to_delete.intersection(ids_set):
-                    keyword_table[keyword] = list(ids_set.difference(segment_ids_to_delete))
-                    if not keyword_table[keyword]:
-                        keywords_to_delete.add(keyword)
-
-            # 检测空关键词数据并删除
-            for keyword in keywords_to_delete:
-                del keyword_table[keyword]
-
-            # 确保所有值都是list类型而不是set类型，避免JSON序列化错误
-            keyword_table_for_update = {}
-            for field, value in keyword_table.items():
-                keyword_table_for_update[field] = list(value) if isinstance(value, set) else value
-
-            self.update(keyword_table_record, keyword_table=keyword_table_for_update)
-
+            segment_ids = [str(segment_id) for segment_id in segment_ids]
+            with self.db.auto_commit():
+                # 1.统计即将移出索引的片段数与token数
+                indexed_segments = self.db.session.query(
+                    KeywordIndex.segment_id, func.max(KeywordIndex.token_count),
+                ).filter(
+                    KeywordIndex.dataset_id == dataset_id,
+                    KeywordIndex.segment_id.in_(segment_ids),
+                ).group_by(KeywordIndex.segment_id).all()
+
+                # 2.删除倒排索引记录
+                self.db.session.query(KeywordIndex).filter(
+                    KeywordIndex.dataset_id == dataset_id,
+                    KeywordIndex.segment_id.in_(segment_ids),
+                ).delete(synchronize_session=False)
+
+                # 3.同步扣减知识库统计
+                self._incr_stat(
+                    dataset_id,
+                    -len(indexed_segments),
+                    -sum(token_count for _, token_count in indexed_segments),
+                )
 
     def add_keyword_table_from_ids(self, dataset_id: UUID, segment_ids: list[str]) -> None:
-        """根据传入的dataset_id和片段id"""
-        cache_key = LOCK_KEYWORD_TABLE_UPDATE_KEYWORD_TABLE.format(dataset_id=dataset_id)
+        """根据传入的dataset_id和片段id，将片段的关键词添加到关键词表"""
+        if not segment_ids:
+            return
 
+        cache_key = LOCK_KEYWORD_TABLE_UPDATE_KEYWORD_TABLE.format(dataset_id=dataset_id)
         with self.redis_client.lock(cache_key, timeout=LOCK_EXPIRE):
-            # 获取当前知识库的关键词词表
-            keyword_table_record = self.get_keyword_table_from_dataset(dataset_id)
-
-            keyword_table = {
-                field: set(value)
-                for field, value in keyword_table_record.keyword_table.items()
-            }
-            # 获取片段关键词
-            segments = self.db.session.query(Segment.id, Segment.keywords).filter(
+            # 获取片段关键词、内容以及token数
+            segments = self.db.session.query(
+                Segment.id, Segment.keywords, Segment.content, Segment.token_count,
+            ).filter(
                 Segment.dataset_id == dataset_id,
                 Segment.id.in_(segment_ids)
             ).all()
 
-            for id, keywords in segments:
-                for keyword in keywords:
-                    if keyword not in keyword_table:
-                        keyword_table[keyword] = set()
-                    keyword_table[keyword].add(str(id))
-
-            # 更新关键词表，确保所有值都是list类型而不是set类型
-            keyword_table_for_update = {}
-            for field, value in keyword_table.items():
-                keyword_table_for_update[field] = list(value)
-
-            self.update(
-                keyword_table_record,
-                keyword_table=keyword_table_for_update
-            )
\ No newline at end of file
+            self._insert_keywords(dataset_id, segments)
+
+    def _insert_keywords(self, dataset_id: UUID, segments: list[tuple]) -> None:
+        """批量写入倒排索引记录(含词频与片段长度)，已存在的(知识库, 关键词, 片段)组合直接忽略，
+        词频按关键词提取所用的分词结果统计，避免子串匹配(如"数据"命中"数据库")虚增词频"""
+        rows = []
+        for segment_id, keywords, content, token_count in segments:
+            if not keywords:
+                continue
+            term_counts = self.jieba_service.count_terms(content)
+            rows.extend({
+                "dataset_id": str(dataset_id),
+                "keyword": keyword,
+                "segment_id": str(segment_id),
+                "frequency": max(1, term_counts[keyword]),
+                "token_count": token_count,
+            } for keyword in set(keywords))
+        if not rows:
+            return
+
+        with self.db.auto_commit():
+            # 1.已经在索引中的片段不重复计入统计
+            indexed_segment_ids = {
+                str(segment_id) for segment_id, in self.db.session.query(KeywordIndex.segment_id).filter(
+                    KeywordIndex.dataset_id == dataset_id,
+                    KeywordIndex.segment_id.in_({row["segment_id"] for row in rows}),
+                ).distinct().all()
+            }
+            new_segments = {
+                str(segment_id): token_count for segment_id, keywords, _, token_count in segments
+                if keywords and str(segment_id) not in indexed_segment_ids
+            }
+
+            # 2.分批写入，避免单条语句的绑定参数超过数据库限制
+            for i in range(0, len(rows), KEYWORD_INDEX_INSERT_BATCH_SIZE):
+                stmt = insert(KeywordIndex).values(
+                    rows[i:i + KEYWORD_INDEX_INSERT_BATCH_SIZE]
+                ).on_conflict_do_nothing(
+                    constraint="uk_keyword_index_dataset_id_keyword_segment_id",
+                )
+                self.db.session.execute(stmt)
+
+            # 3.同步累加知识库统计
+            self._incr_stat(dataset_id, len(new_segments), sum(new_segments.values()))
+
+    def _incr_stat(self, dataset_id: UUID, segment_count: int, token_count: int) -> None:
+        """增量更新知识库的已索引片段数与token总数，需在调用方的事务内执行"""
+        if segment_count == 0 and token_count == 0:
+            return
+
+        stmt = insert(KeywordIndexStat).values(
+            dataset_id=str(dataset_id),
+            segment_count=max(segment_count, 0),
+            token_count=max(token_count, 0),
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint="uk_keyword_index_stat_dataset_id",
+            set_={
+                "segment_count": func.greatest(KeywordIndexStat.segment_count + segment_count, 0),
+                "token_count": func.greatest(KeywordIndexStat.token_count + token_count, 0),
+                "updated_at": func.now(),
+            },
+        )
+        self.db.session.execute(stmt)
@@ -87,7 +87,7 @@ class OAuthService(BaseService):
             account = self.account_service.get_account(account_oauth.account_id)
 
         # 9.更新账号信息，涵盖最后一次登录时间，以及ip地址
-        self.update(
+        self.account_service.update_account(
             account,
             last_login_at=datetime.now(),
             last_login_ip=request.remote_addr,
@@ -1,4 +1,3 @@
-import json
 from dataclasses import dataclass
 from threading import Thread
 from typing import Generator
@@ -6,23 +5,20 @@ from typing import Generator
 from flask import current_app
 from injector import inject
 from langchain_core.messages import HumanMessage
-from langchain_openai import ChatOpenAI
 
-from internal.core.agent.agents import FunctionCallAgent
-from internal.core.agent.entities.agent_entity import AgentConfig
-from internal.core.agent.entities.queue_entity import QueueEvent
+from internal.core.agent.entities.queue_entity import AgentThoughtCollector
 from internal.core.memory import TokenBufferMemory
 from internal.entity.app_entity import AppStatus
 from internal.entity.conversation_entity import InvokeFrom, MessageStatus
-from internal.entity.dataset_entity import RetrievalSource
 from internal.exception import NotFoundException, ForbiddenException
 from internal.model import Account, EndUser, Conversation, Message
 from internal.schema.openapi_schema import OpenAPIChatReq
-from pkg.response import Response
+from pkg.response import Response, SSEWriter
 from pkg.sqlalchemy import SQLAlchemy
 from .app_config_service import AppConfigService
 from .app_service import AppService
 from .base_service import BaseService
+from .embeddings_service import EmbeddingsService
 from .conversation_service import ConversationService
 from .retrieval_service import RetrievalService
 
@@ -109,55 +105,26 @@ class OpenAPIService(BaseService):
             "invoke_from": InvokeFrom.SERVICE_API,
             "created_by": end_user_id,
             "query": req.query.data,
+            "query_token_count": EmbeddingsService.calculate_token_count(req.query.data),
             "status": MessageStatus.NORMAL,
         })
         
         message_id = str(message.id)
         conversation_id = str(conversation.id)
 
-        # todo:9.根据传递的Model_config创建LLM实例，等待多LLM接入时需要调整
-        llm = ChatOpenAI(
-            model=app_config["model_config"]["model"],
-            **app_config["model_config"]["parameters"],
-        )
+        # 9.从缓存中获取运行时配置对应的智能体，缓存未命中时才实例化LLM、加载工具并编译图结构
+        agent = self.app_service.get_agent(app_config, account_id, InvokeFrom.DEBUGGER)
 
         # 10.实例化TokenBufferMemory用于提取短期记忆
         token_buffer_memory = TokenBufferMemory(
             db=self.db,
             conversation=conversation,
-            model_instance=llm,
+            model_instance=agent.llm,
         )
         history = token_buffer_memory.get_history_prompt_messages(
             message_limit=app_config["dialog_round"],
         )
 
-        # 11.将草稿配置中的tools转换成LangChain工具
-        tools = self.app_config_service.get_langchain_tools_by_tools_config(app_config["tools"])
-
-        # 12.检测是否关联了知识库
-        if app_config["datasets"]:
-            # 13.构建LangChain知识库检索工具
-            dataset_retrieval = self.retrieval_service.create_langchain_tool_from_search(
-                flask_app=current_app._get_current_object(),
-                dataset_ids=[dataset["id"] for dataset in app_config["datasets"]],
-                account_id=account_id,
-                retrieval_source=RetrievalSource.APP,
-                **app_config["retrieval_config"],
-            )
-            tools.append(dataset_retrieval)
-
-        # todo:14.构建Agent智能体，目前暂时使用FunctionCallAgent
-        agent = FunctionCallAgent(
-            llm=llm,
-            agent_config=AgentConfig(
-                user_id=account_id,
-                invoke_from=InvokeFrom.DEBUGGER,
-                enable_long_term_memory=app_config["long_term_memory"]["enable"],
-                tools=tools,
-                review_config=app_config["review_config"],
-            ),
-        )
-
         # 15.定义智能体状态基础数据
         agent_state = {
             "messages": [HumanMessage(req.query.data)],
@@ -167,31 +134,21 @@ class OpenAPIService(BaseService):
 
         # 16.根据stream类型差异执行不同的代码
         if req.stream.data is True:
-            agent_thoughts_dict = {}
+            collector = AgentThoughtCollector()
 
             def handle_stream() -> Generator:
                 """流式事件处理器，在Python只要在函数内部使用了yield关键字，那么这个函数的返回值类型肯定是生成器"""
-                for agent_thought in agent.stream(agent_state):
-                    # 提取thought以及answer
+                coalesce = req.coalesce.data
+                sse_writer = SSEWriter(coalesce=coalesce)
+                for agent_thought in agent.stream(agent_state, idle_interval=sse_writer.idle_timeout):
+                    # 合并缓冲区到期时刷新，缓冲区为空时不请求空闲唤醒
+                    if agent_thought is None:
+                        yield from sse_writer.tick()
+                        continue
+
+                    # 将数据收集到收集器，便于存储到数据库服务中
+                    collector.add(agent_thought)
                     event_id = str(agent_thought.id)
-
-                    # 将数据填充到agent_thought，便于存储到数据库服务中
-                    if agent_thought.event != QueueEvent.PING:
-                        # 除了agent_message数据为叠加，其他均为覆盖
-                        if agent_thought.event == QueueEvent.AGENT_MESSAGE:
-                            if event_id not in agent_thoughts_dict:
-                                # 初始化智能体消息事件
-                                agent_thoughts_dict[event_id] = agent_thought
-                            else:
-                                # 叠加智能体消息
-                                agent_thoughts_dict[event_id] = agent_thoughts_dict[event_id].model_copy(update={
-                                    "thought": agent_thoughts_dict[event_id].thought + agent_thought.thought,
-                                    "answer": agent_thoughts_dict[event_id].answer + agent_thought.answer,
-                                    "latency": agent_thought.latency,
-                                })
-                        else:
-                            # 处理其他类型事件的消息
-                            agent_thoughts_dict[event_id] = agent_thought
                     data = {
                         **agent_thought.model_dump(include={
                             "event", "thought", "observation", "tool", "tool_input", "answer", "latency",
@@ -202,7 +159,8 @@ class OpenAPIService(BaseService):
                         "message_id": message_id,
                         "task_id": str(agent_thought.task_id),
                     }
-                    yield f"event: {agent_thought.event}\ndata:{json.dumps(data)}\n\n"
+                    yield from sse_writer.write(agent_thought.event.value, data)
+                yield from sse_writer.flush()
 
                 # 22.将消息以及推理过程添加到数据库
                 thread = Thread(
@@ -214,7 +172,7 @@ class OpenAPIService(BaseService):
                         "app_config": app_config,
                         "conversation_id": conversation_id,
                         "message_id": message_id,
-                        "agent_thoughts": [agent_thought for agent_thought in agent_thoughts_dict.values()],
+                        "agent_thoughts": collector.agent_thoughts,
                     }
                 )
                 thread.start()
@@ -1,11 +1,10 @@
 from uuid import UUID
 
-from flask import Flask
+from flask import Flask, current_app
 from injector import inject
 from dataclasses import dataclass
 
 from langchain_core.documents import Document as LCDocument
-from langchain.retrievers import EnsembleRetriever
 from langchain_core.tools import BaseTool, tool
 from pydantic import BaseModel, Field
 from sqlalchemy import update
@@ -51,10 +50,11 @@ class RetrievalService(BaseService):
         dataset_ids = [dataset.id for dataset in datasets]
 
         # 构建不同种类的检索器
-        from internal.core.retrievers import SemanticRetriever, FullTextRetriever
+        from internal.core.retrievers import SemanticRetriever, FullTextRetriever, HybridRetriever
         semantic_retriever = SemanticRetriever(
             dataset_ids=dataset_ids,
-            vector_store=self.vector_database_service.vector_store,
+            vector_backend=self.vector_database_service.backend,
+            embeddings=self.vector_database_service.embeddings_service.query_embeddings,
             search_kwargs={
                 "k": k,
                 "score_threshold": score,
@@ -69,9 +69,15 @@ class RetrievalService(BaseService):
             }
         )
 
-        hybrid_retriever = EnsembleRetriever(
-            retrievers=[semantic_retriever, full_text_retriever],
+        hybrid_retriever = HybridRetriever(
+            semantic_retriever=semantic_retriever,
+            full_text_retriever=full_text_retriever,
             weights=[0.5, 0.5],
+            rrf_k=current_app.config.get("RETRIEVAL_RRF_K", 60),
+            candidate_depth=current_app.config.get("RETRIEVAL_CANDIDATE_DEPTH", 20),
+            search_kwargs={
+                "k": k,
+            }
         )
 
         # 根据不同的检索策略执行检索
@@ -112,8 +118,8 @@ class RetrievalService(BaseService):
             self,
             flask_app: Flask,
             dataset_ids: list[UUID],
-            query: str,
             account_id: UUID,
+            query: str = "",
             retrieval_strategy: str = RetrievalStrategy.SEMANTIC,
             k: int = 4,
             score: float = 0,
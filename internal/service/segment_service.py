@@ -5,7 +5,7 @@ from uuid import uuid4
 
 from injector import inject
 from redis import Redis
-from sqlalchemy import UUID, asc, func
+from sqlalchemy import UUID, func
 from langchain_core.documents import Document as LCDocument
 
 from internal.entity.cache_entity import LOCK_EXPIRE, LOCK_SEGMENT_UPDATE_ENABLED
@@ -20,7 +20,7 @@ from pkg.paginator import Paginator
 from pkg.sqlalchemy import SQLAlchemy
 from .embeddings_service import EmbeddingsService
 from .jieba_service import JiebaService
-from ..lib.helper import generate_text_hash
+from ..lib.helper import build_search_filter, generate_text_hash
 
 
 @inject
@@ -48,10 +48,13 @@ class SegmentService(BaseService):
 
         filters = [Segment.document_id == document_id]
         if req.search_word.data:
-            filters.append(Segment.content.ilike(f"%{req.search_word.data}%"))
+            filters.append(build_search_filter(Segment.content, req.search_word.data))
 
         segments = paginator.paginate(
-            self.db.session.query(Segment).filter(*filters).order_by(asc("position"))
+            self.db.session.query(Segment).filter(*filters),
+            sort_column=Segment.position,
+            id_column=Segment.id,
+            descending=False,
         )
 
         return segments, paginator
@@ -119,11 +122,10 @@ class SegmentService(BaseService):
                     self.keyword_table_service.delete_keyword_table_from_ids(dataset_id, [str(segment_id)])
 
                 # 同步处理weaviate中的数据
-                self.vector_database_service.collection.data.update(
-                    uuid=segment.node_id,
-                    properties={
-                        "enabled": enabled
-                    }
+                self.vector_database_service.backend.update(
+                    str(segment.node_id),
+                    {"segment_enabled": enabled},
+                    dataset_id=dataset_id,
                 )
             except Exception as e:
                 import traceback
@@ -188,8 +190,11 @@ class SegmentService(BaseService):
                 completed_at=datetime.now(),
                 status=SegmentStatus.COMPLETED,
             )
-            # 向量数据库中存储
-            self.vector_database_service.vector_store.add_documents([LCDocument(
+            # 向量数据库中存储，向量优先从hash向量缓存中获取
+            vectors = self.embeddings_service.cache_backed_embeddings.embed_documents_with_hashes(
+                [request.content.data], [segment.hash],
+            )
+            failed_ids = self.vector_database_service.backend.add_documents([LCDocument(
                 page_content=request.content.data,
                 metadata={
                     "account_id": str(document.account_id),
@@ -201,8 +206,11 @@ class SegmentService(BaseService):
                     "segment_enabled": True,
                 }
             )],
-                ids=[str(segment.node_id)]
+                vectors,
+                [str(segment.node_id)],
             )
+            if failed_ids:
+                raise FailedException("向量数据库写入失败")
 
             # 重新计算片段的字符总数和token总数
             document_character_count, document_token_count = self.db.session.query(
@@ -287,12 +295,13 @@ class SegmentService(BaseService):
                 )
 
                 # 9.更新向量数据库对应记录
-                self.vector_database_service.collection.data.update(
-                    uuid=str(segment.node_id),
-                    properties={
-                        "text": request.content.data,
-                    },
-                    vector=self.embeddings_service.embeddings.embed_query(request.content.data)
+                self.vector_database_service.backend.update(
+                    str(segment.node_id),
+                    {"text": request.content.data},
+                    vector=self.embeddings_service.cache_backed_embeddings.embed_documents_with_hashes(
+                        [request.content.data], [new_hash],
+                    )[0],
+                    dataset_id=dataset_id,
                 )
         except Exception as e:
             logging.exception(f"更新文档片段记录失败, segment_id: {segment}, 错误信息: {str(e)}")
@@ -330,7 +339,7 @@ class SegmentService(BaseService):
 
         # 5.同步删除向量数据库存储的记录
         try:
-            self.vector_database_service.collection.data.delete_by_id(str(segment.node_id))
+            self.vector_database_service.backend.delete_by_ids([str(segment.node_id)], dataset_id=dataset_id)
         except Exception as e:
             logging.exception(f"删除文档片段记录失败, segment_id: {segment_id}, 错误信息: {str(e)}")
 
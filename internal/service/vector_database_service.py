@@ -8,32 +8,45 @@ from langchain_weaviate import WeaviateVectorStore
 from weaviate import WeaviateClient
 from weaviate.collections import Collection
 
+from internal.core.vector_backend import BaseVectorBackend, NumpyVectorBackend, WeaviateVectorBackend
 from .embeddings_service import EmbeddingsService
 
 # 集合名称
 COLLECTION_NAME = "Dataset"
 
+# 本地NumPy向量索引默认存储目录
+DEFAULT_LOCAL_VECTOR_STORE_PATH = os.path.join("storage", "vector_store")
+
 @inject
 class VectorDatabaseService:
-    """向量数据库服务"""
-    client: WeaviateClient
-    vector_store: WeaviateVectorStore
+    """向量数据库服务，通过VECTOR_STORE_BACKEND环境变量选择weaviate或本地numpy后端"""
+    client: WeaviateClient | None
+    vector_store: WeaviateVectorStore | None
+    backend: BaseVectorBackend
     embeddings_service: EmbeddingsService
 
     def __init__(self, embeddings_services: EmbeddingsService):
-        """构造函数，完成向量数据库服务的客户端+LangChain向量数据库实例的创建"""
+        """构造函数，完成向量存储后端的创建"""
         # 1.赋值embeddings_service
         self.embeddings_service = embeddings_services
+        self.client = None
+        self.vector_store = None
+
+        # 2.本地后端不依赖weaviate，直接在进程内加载向量索引
+        if os.getenv("VECTOR_STORE_BACKEND", "weaviate").lower() == "numpy":
+            self.backend = NumpyVectorBackend(os.getenv("VECTOR_STORE_LOCAL_PATH", DEFAULT_LOCAL_VECTOR_STORE_PATH))
+            return
 
-        # 2.创建/连接weaviate向量数据库
+        # 3.创建/连接weaviate向量数据库
         self.client = weaviate.connect_to_local(
             host=os.getenv("WEAVIATE_HOST"),
             port=int(os.getenv("WEAVIATE_PORT")),
             grpc_port=int(os.getenv("WEAVIATE_GRPC_PORT")),
             skip_init_checks=True,
         )
+        self.backend = WeaviateVectorBackend(self.client, COLLECTION_NAME)
 
-        # 3.创建LangChain向量数据库
+        # 4.创建LangChain向量数据库
         self.vector_store = WeaviateVectorStore(
             client=self.client,
             index_name=COLLECTION_NAME,
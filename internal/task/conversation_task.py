@@ -0,0 +1,23 @@
+from uuid import UUID
+
+from celery import shared_task
+
+
+@shared_task(autoretry_for=(Exception,), retry_backoff=True, max_retries=3)
+def update_conversation_summary(conversation_id: UUID, dialog_round: int) -> None:
+    """根据传递的会话id+短期记忆轮数滚动更新长期记忆摘要，失败时自动重试"""
+    from app.http.module import injector
+    from internal.service import ConversationService
+
+    conversation_service = injector.get(ConversationService)
+    conversation_service.update_conversation_summary(conversation_id, dialog_round)
+
+
+@shared_task(autoretry_for=(Exception,), retry_backoff=True, max_retries=3)
+def update_conversation_name(conversation_id: UUID, message_id: UUID) -> None:
+    """根据传递的会话id+消息id生成会话名称，失败时自动重试"""
+    from app.http.module import injector
+    from internal.service import ConversationService
+
+    conversation_service = injector.get(ConversationService)
+    conversation_service.update_conversation_name(conversation_id, message_id)
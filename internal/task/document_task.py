@@ -1,13 +1,42 @@
+import time
+
 from celery import shared_task
+from flask import current_app
 from uuid import UUID
 
+# 在线worker数量的缓存时长(秒)，避免每个多文档任务都广播一次ping
+WORKER_COUNT_CACHE_TTL = 60
+
+_worker_count_cache: tuple[float, int] = (0.0, 1)
+
+
+def _available_worker_count() -> int:
+    """探测当前在线的celery worker数量并在进程内缓存，探测失败时视为只有当前worker"""
+    global _worker_count_cache
+    expires_at, worker_count = _worker_count_cache
+    if time.monotonic() < expires_at:
+        return worker_count
+
+    try:
+        worker_count = len(current_app.extensions["celery"].control.ping(timeout=0.5) or [])
+    except Exception:
+        worker_count = 1
+    _worker_count_cache = (time.monotonic() + WORKER_COUNT_CACHE_TTL, worker_count)
+    return worker_count
+
 
 @shared_task
 def build_document(document_ids:list[UUID]) ->None:
-    """根据文档传递的文档ID列表构建文档"""
+    """根据文档传递的文档ID列表构建文档，默认在当前worker中使用流水线构建，
+    开启INDEXING_FAN_OUT且有多个worker可用时拆分为单文档子任务并行构建"""
     from app.http.module import injector
     from internal.service import IndexingService
 
+    if len(document_ids) > 1 and current_app.config.get("INDEXING_FAN_OUT") and _available_worker_count() > 1:
+        for document_id in document_ids:
+            build_document.delay([document_id])
+        return
+
     indexing_service = injector.get(IndexingService)
     indexing_service.build_documents(document_ids)
 
@@ -1,17 +1,43 @@
+import base64
+import json
 import math
 from dataclasses import dataclass
+from datetime import datetime
 from typing import Any, List
 
 from flask_wtf import FlaskForm
-from wtforms import IntegerField
-from wtforms.validators import Optional, NumberRange
+from sqlalchemy import literal, tuple_
+from wtforms import IntegerField, StringField
+from wtforms.validators import Optional, NumberRange, ValidationError
 
 from pkg.sqlalchemy import SQLAlchemy
 
 
+def encode_cursor(sort_value: Any, id_value: Any) -> str:
+    """将(排序字段值, id)编码成不透明的分页游标"""
+    if isinstance(sort_value, datetime):
+        sort_value = {"datetime": sort_value.isoformat()}
+    payload = json.dumps([sort_value, str(id_value)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("utf-8").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[Any, str]:
+    """解析分页游标，返回(排序字段值, id)，游标格式错误时抛出ValueError"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        # 旧版本游标末尾携带的总记录数直接忽略
+        sort_value, id_value = json.loads(payload)[:2]
+        if isinstance(sort_value, dict):
+            sort_value = datetime.fromisoformat(sort_value["datetime"])
+        return sort_value, str(id_value)
+    except Exception as e:
+        raise ValueError("分页游标格式错误") from e
+
+
 class PaginatorRequest(FlaskForm):
     """分页请求基础类
-    包含当前页数、每页条数、如果接口请求需要携带分页信息，可以直接继承该类
+    包含当前页数、每页条数、如果接口请求需要携带分页信息，可以直接继承该类，
+    携带上一页返回的cursor时使用游标分页，否则使用页码分页
     """
     current_page = IntegerField("current_page", default=1, validators=[
         Optional(), NumberRange(min=1, max=9999,  message="页数范围1-9999")
@@ -19,6 +45,15 @@ class PaginatorRequest(FlaskForm):
     page_size = IntegerField("page_size", default=20, validators=[
         Optional(), NumberRange(min=1, max=50,  message="分页大小1-50")
     ])
+    cursor = StringField("cursor", default="", validators=[Optional()])
+
+    def validate_cursor(self, field: StringField) -> None:
+        """校验分页游标格式"""
+        if field.data:
+            try:
+                decode_cursor(field.data)
+            except ValueError as e:
+                raise ValidationError(str(e))
 
 
 @dataclass
@@ -28,29 +63,73 @@ class Paginator:
     total_record: int = 0
     current_page: int = 1
     page_size: int = 20
+    next_cursor: str = ""
 
     def __init__(self, db:SQLAlchemy, req:PaginatorRequest=None):
+        self.cursor = ""
         if req is not None:
             self.current_page = req.current_page.data
             self.page_size = req.page_size.data
+            self.cursor = req.cursor.data or ""
 
         self.db = db
 
 
-    def paginate(self, query)->list[Any]:
-        """查询分页"""
-        p = self.db.paginate(query, page=self.current_page, per_page=self.page_size, error_out=False)
-
-        self.total_record = p.total
-        self.total_page = math.ceil(p.total/self.page_size)
-
-        return p.items
+    def paginate(self, query, sort_column=None, id_column=None, descending: bool = True)->list[Any]:
+        """查询分页，传递排序字段与id字段时按(排序字段, id)排序并返回下一页游标，
+        请求携带游标时使用键集条件定位下一页，不再执行OFFSET扫描与COUNT统计，此时不返回总记录数与总页数"""
+        # 1.未传递排序字段时使用页码分页
+        if sort_column is None or id_column is None:
+            p = self.db.paginate(query, page=self.current_page, per_page=self.page_size, error_out=False)
+
+            self.total_record = p.total
+            self.total_page = math.ceil(p.total/self.page_size)
+
+            return p.items
+
+        # 2.按(排序字段, id)排序，id用于保证排序字段相同时的顺序稳定
+        if descending:
+            query = query.order_by(None).order_by(sort_column.desc(), id_column.desc())
+        else:
+            query = query.order_by(None).order_by(sort_column.asc(), id_column.asc())
+
+        if self.cursor:
+            # 3.携带游标时使用行值比较定位到上一页最后一条记录之后，多取一条用于判断是否存在下一页，总数不再统计
+            sort_value, id_value = decode_cursor(self.cursor)
+            keyset = tuple_(sort_column, id_column)
+            boundary = tuple_(literal(sort_value, sort_column.type), literal(id_value, id_column.type))
+            items = query.filter(keyset < boundary if descending else keyset > boundary).limit(self.page_size + 1).all()
+            self.total_record = 0
+            self.total_page = 0
+            has_next = len(items) > self.page_size
+            items = items[:self.page_size]
+        elif self.current_page == 1:
+            # 4.首页多取一条判断是否存在下一页，不足一页时记录数即为总数，超过一页时才统计总数以兼容页码分页的调用方
+            items = query.limit(self.page_size + 1).all()
+            has_next = len(items) > self.page_size
+            items = items[:self.page_size]
+            self.total_record = query.order_by(None).count() if has_next else len(items)
+            self.total_page = math.ceil(self.total_record/self.page_size)
+        else:
+            # 5.未携带游标的后续页仍然使用页码分页
+            p = self.db.paginate(query, page=self.current_page, per_page=self.page_size, error_out=False)
+            items = p.items
+            self.total_record = p.total
+            self.total_page = math.ceil(p.total/self.page_size)
+            has_next = self.current_page * self.page_size < p.total
+
+        # 6.存在下一页时生成下一页游标
+        if has_next and items:
+            last_item = items[-1]
+            self.next_cursor = encode_cursor(
+                getattr(last_item, sort_column.key),
+                getattr(last_item, id_column.key),
+            )
+
+        return items
 
 
 @dataclass
 class PageModel:
     list: List[Any]
     paginator: Paginator
-
-
-
@@ -5,6 +5,7 @@ from .response import (
     message, success_message, fail_message, not_found_message, unauthorized_message, forbidden_message,
     compact_generate_response
 )
+from .sse import SSEWriter
 
 
 __all__ = [
@@ -13,5 +14,6 @@ __all__ = [
     "json", "success_json", "fail_json", "validate_error_json",
     "message", "success_message", "fail_message", "not_found_message",
     "unauthorized_message", "forbidden_message",
-    "compact_generate_response"
+    "compact_generate_response",
+    "SSEWriter",
 ]
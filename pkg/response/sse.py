@@ -0,0 +1,91 @@
+import json
+import time
+from typing import Any, Generator, Iterable
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 未安装orjson时回退到标准库
+    orjson = None
+
+
+def dumps(data: Any) -> str:
+    """序列化流式事件数据，优先使用orjson"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(data)
+
+
+class SSEWriter:
+    """流式事件写入器，按时间窗口或字节数合并同一事件id的连续增量帧"""
+
+    def __init__(
+            self,
+            coalesce: bool = True,
+            window: float = 0.03,
+            max_bytes: int = 4096,
+            coalesce_events: Iterable[str] = ("agent_message",),
+            delta_fields: Iterable[str] = ("thought", "answer"),
+    ):
+        self.coalesce = coalesce
+        self.window = window
+        self.max_bytes = max_bytes
+        self.coalesce_events = set(coalesce_events)
+        self.delta_fields = tuple(delta_fields)
+        self._pending: dict | None = None
+        self._pending_event = ""
+        self._pending_at = 0.0
+        self._pending_size = 0
+
+    def write(self, event: str, data: dict) -> Generator[str, None, None]:
+        """写入一帧事件数据，返回此时需要发送的SSE文本"""
+        # 1.未开启合并或者事件不支持合并时，先发送缓冲区再直接发送当前帧
+        if not self.coalesce or event not in self.coalesce_events:
+            yield from self.flush()
+            yield self.encode(event, data)
+            return
+
+        # 2.事件或事件id发生变化时先发送缓冲区
+        if self._pending is not None and (self._pending_event != event or self._pending.get("id") != data.get("id")):
+            yield from self.flush()
+
+        # 3.合并增量字段，其余字段以最新一帧为准
+        size = sum(len(data.get(field) or "") for field in self.delta_fields)
+        if self._pending is None:
+            self._pending = dict(data)
+            self._pending_event = event
+            self._pending_at = time.monotonic()
+            self._pending_size = size
+        else:
+            for key, value in data.items():
+                if key in self.delta_fields:
+                    self._pending[key] = (self._pending.get(key) or "") + (value or "")
+                else:
+                    self._pending[key] = value
+            self._pending_size += size
+
+        # 4.缓冲区超过字节上限或时间窗口时发送
+        if self._pending_size >= self.max_bytes or time.monotonic() - self._pending_at >= self.window:
+            yield from self.flush()
+
+    def idle_timeout(self) -> float | None:
+        """返回缓冲区距离时间窗口到期的剩余秒数，缓冲区为空时返回None，调用方据此决定是否需要空闲唤醒"""
+        if self._pending is None:
+            return None
+        return max(self._pending_at + self.window - time.monotonic(), 0)
+
+    def tick(self) -> Generator[str, None, None]:
+        """空闲时调用，缓冲区超过时间窗口则发送，避免上游停顿时增量帧被长时间积压"""
+        if self._pending is not None and time.monotonic() - self._pending_at >= self.window:
+            yield from self.flush()
+
+    def flush(self) -> Generator[str, None, None]:
+        """发送缓冲区中的事件"""
+        if self._pending is not None:
+            pending, event = self._pending, self._pending_event
+            self._pending, self._pending_event, self._pending_size = None, "", 0
+            yield self.encode(event, pending)
+
+    @classmethod
+    def encode(cls, event: str, data: dict) -> str:
+        """将事件编码为SSE文本"""
+        return f"event: {event}\ndata:{dumps(data)}\n\n"
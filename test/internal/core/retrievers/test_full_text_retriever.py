@@ -0,0 +1,48 @@
+import math
+
+import pytest
+
+from internal.core.retrievers import FullTextRetriever
+
+
+class TestFullTextRetriever:
+
+    def test_higher_frequency_scores_higher(self):
+        """测试片段长度相同时词频越高BM25得分越高"""
+        scores = FullTextRetriever.bm25_scores(
+            [("a", "向量", 3, 100), ("b", "向量", 1, 100)],
+            segment_total=10,
+            avg_length=100,
+        )
+        assert scores["a"] > scores["b"]
+
+    def test_rare_keyword_scores_higher(self):
+        """测试词频与片段长度相同时文档频率越低的关键词得分越高"""
+        scores = FullTextRetriever.bm25_scores(
+            [("a", "罕见词", 1, 100), ("b", "常见词", 1, 100), ("c", "常见词", 1, 100)],
+            segment_total=10,
+            avg_length=100,
+        )
+        assert scores["a"] > scores["b"] == scores["c"]
+
+    def test_longer_segment_scores_lower(self):
+        """测试词频相同时片段越长得分越低"""
+        scores = FullTextRetriever.bm25_scores(
+            [("a", "向量", 2, 50), ("b", "向量", 2, 400)],
+            segment_total=10,
+            avg_length=100,
+        )
+        assert scores["a"] > scores["b"]
+
+    def test_score_matches_bm25_formula(self):
+        """测试单个关键词的得分与BM25公式一致，多个关键词的得分累加"""
+        scores = FullTextRetriever.bm25_scores(
+            [("a", "向量", 2, 100), ("a", "检索", 1, 100)],
+            segment_total=4,
+            avg_length=100,
+            k1=1.2,
+            b=0.75,
+        )
+        idf = math.log(1 + (4 - 1 + 0.5) / (1 + 0.5))
+        expected = idf * 2 * 2.2 / (2 + 1.2) + idf * 1 * 2.2 / (1 + 1.2)
+        assert scores["a"] == pytest.approx(expected)
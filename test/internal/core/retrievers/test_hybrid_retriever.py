@@ -0,0 +1,29 @@
+import pytest
+
+from internal.core.retrievers import HybridRetriever
+
+
+class TestHybridRetriever:
+
+    def test_rrf_scores_sum_across_rankings(self):
+        """测试同时出现在两个排序列表中的片段得分为两个列表的加权倒数排名之和"""
+        scores = HybridRetriever.rrf_scores([["a", "b"], ["b", "c"]], [0.5, 0.5], rrf_k=60)
+        assert scores["b"] == pytest.approx(0.5 / 62 + 0.5 / 61)
+        assert scores["a"] == pytest.approx(0.5 / 61)
+        assert scores["c"] == pytest.approx(0.5 / 62)
+
+    def test_rrf_segment_in_both_rankings_ranks_first(self):
+        """测试权重相同时两路都召回的片段排在只被单路召回的片段之前"""
+        scores = HybridRetriever.rrf_scores([["a", "b"], ["b", "c"]], [0.5, 0.5], rrf_k=60)
+        assert max(scores, key=scores.get) == "b"
+
+    def test_rrf_weights_favour_weighted_ranking(self):
+        """测试提高某一路的权重后该路排名第一的片段得分更高"""
+        scores = HybridRetriever.rrf_scores([["a"], ["c"]], [0.8, 0.2], rrf_k=60)
+        assert scores["a"] > scores["c"]
+
+    def test_rrf_k_smooths_rank_differences(self):
+        """测试rrf_k越大相邻排名之间的得分差距越小"""
+        small_k = HybridRetriever.rrf_scores([["a", "b"]], [1.0], rrf_k=1)
+        large_k = HybridRetriever.rrf_scores([["a", "b"]], [1.0], rrf_k=60)
+        assert small_k["a"] - small_k["b"] > large_k["a"] - large_k["b"]
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from internal.core.vector_backend import NumpyVectorBackend
+
+
+def _document(content: str, dataset_id: str, document_id: str = "document") -> Document:
+    """构建启用状态的测试文档"""
+    return Document(page_content=content, metadata={
+        "dataset_id": dataset_id,
+        "document_id": document_id,
+        "document_enabled": True,
+        "segment_enabled": True,
+    })
+
+
+@pytest.fixture
+def backend(tmp_path):
+    """创建写入了两个知识库分区的本地向量后端"""
+    backend = NumpyVectorBackend(str(tmp_path))
+    backend.add_documents(
+        [_document("a", "dataset-1"), _document("b", "dataset-1"), _document("c", "dataset-2")],
+        [[1, 0, 0], [1, 1, 0], [0, 1, 0]],
+        ["id-a", "id-b", "id-c"],
+    )
+    return backend
+
+
+class TestNumpyVectorBackend:
+
+    def test_similarity_search_orders_by_cosine_score(self, backend):
+        """测试检索结果按余弦相似度降序排列"""
+        results = backend.similarity_search([1, 0, 0], ["dataset-1", "dataset-2"], k=3)
+        assert [document.page_content for document, _ in results] == ["a", "b", "c"]
+        assert results[0][1] == pytest.approx(1.0)
+
+    def test_update_many_hides_disabled_records(self, backend):
+        """测试批量更新启用状态后检索不再返回被禁用的记录"""
+        backend.update_many(["id-a", "id-c"], {"document_enabled": False})
+        results = backend.similarity_search([1, 0, 0], ["dataset-1", "dataset-2"], k=3)
+        assert [document.page_content for document, _ in results] == ["b"]
+
+    def test_update_many_returns_ids_of_failed_partition(self, backend, monkeypatch):
+        """测试分区持久化失败时只返回该分区的记录id，其他分区正常更新"""
+        partition = backend._get_partition("dataset-2")
+
+        def save():
+            raise OSError("磁盘已满")
+
+        monkeypatch.setattr(partition, "save", save)
+        failed = backend.update_many(["id-a", "id-c"], {"document_enabled": False})
+
+        assert failed == {"id-c": "磁盘已满"}
+        results = backend.similarity_search([1, 0, 0], ["dataset-1", "dataset-2"], k=3)
+        assert [document.page_content for document, _ in results] == ["b", "c"]
+
+    def test_update_locates_records_written_by_another_instance(self, backend, tmp_path):
+        """测试新实例没有id索引时仍然可以定位其他实例写入的记录"""
+        other = NumpyVectorBackend(str(tmp_path))
+        other.update("id-b", {"segment_enabled": False})
+        results = backend.similarity_search([1, 1, 0], ["dataset-1"], k=3)
+        assert [document.page_content for document, _ in results] == ["a"]
+
+    def test_failed_write_restores_vectors_and_properties(self, backend):
+        """测试写入失败时还原已覆盖的向量行以及记录属性"""
+        partition = backend._get_partition("dataset-1")
+        row = partition.id_to_row["id-a"]
+        origin_vector = np.array(partition.vectors[row])
+
+        with pytest.raises(RuntimeError):
+            with backend._write("dataset-1") as partition:
+                partition.update("id-a", {"segment_enabled": False}, np.array([0, 0, 1], dtype=np.float32))
+                raise RuntimeError("写入失败")
+
+        partition = backend._get_partition("dataset-1")
+        assert np.allclose(partition.vectors[row], origin_vector)
+        assert partition.properties[row]["segment_enabled"] is True
+
+    def test_delete_by_document_id_only_touches_given_dataset(self, backend):
+        """测试传递dataset_id时只删除指定分区中的文档记录"""
+        backend.delete_by_document_id("document", dataset_id="dataset-1")
+        assert backend._get_partition("dataset-1").id_to_row == {}
+        assert list(backend._get_partition("dataset-2").id_to_row) == ["id-c"]
+
+    def test_partitions_are_evicted_beyond_cache_size(self, tmp_path, monkeypatch):
+        """测试已加载的分区超过上限时淘汰最久未使用的分区"""
+        monkeypatch.setattr("internal.core.vector_backend.numpy_vector_backend.PARTITION_CACHE_MAX_SIZE", 1)
+        backend = NumpyVectorBackend(str(tmp_path))
+        backend.add_documents([_document("a", "dataset-1"), _document("c", "dataset-2")], [[1, 0], [0, 1]], ["a", "c"])
+        assert list(backend.partitions) == ["dataset-2"]
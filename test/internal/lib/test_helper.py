@@ -0,0 +1,25 @@
+import pytest
+from sqlalchemy import Column, MetaData, Table, Text
+from sqlalchemy.dialects import postgresql
+
+from internal.lib.helper import build_search_filter
+
+_segment = Table("segment", MetaData(), Column("content", Text))
+
+
+def _compile(keyword: str) -> str:
+    """编译搜索条件为postgresql语句"""
+    return str(build_search_filter(_segment.c.content, keyword).compile(dialect=postgresql.dialect()))
+
+
+class TestHelper:
+
+    @pytest.mark.parametrize("keyword", ["python", "abc", "llm应用"])
+    def test_search_filter_uses_ilike_for_trigram_keyword(self, keyword):
+        """测试可以生成三元组的搜索词使用ILIKE匹配"""
+        assert "ILIKE" in _compile(keyword)
+
+    @pytest.mark.parametrize("keyword", ["ab", "知识库", "a b"])
+    def test_search_filter_uses_strpos_for_short_or_cjk_keyword(self, keyword):
+        """测试过短或者中文搜索词使用strpos匹配，避免扫描整个三元组索引"""
+        assert "strpos" in _compile(keyword)
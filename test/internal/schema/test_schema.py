@@ -0,0 +1,22 @@
+from werkzeug.datastructures import MultiDict
+from wtforms import Form
+
+from internal.schema.schema import DefaultBooleanField
+
+
+class _CoalesceReq(Form):
+    """携带默认值为True的bool字段的请求结构体"""
+    coalesce = DefaultBooleanField("coalesce", default=True)
+
+
+class TestDefaultBooleanField:
+
+    def test_missing_field_keeps_default(self):
+        """测试请求未携带字段时保留默认值"""
+        req = _CoalesceReq(formdata=MultiDict({"query": "你好"}))
+        assert req.coalesce.data is True
+
+    def test_false_value_is_parsed(self):
+        """测试请求显式传递false时解析为False"""
+        req = _CoalesceReq(formdata=MultiDict({"coalesce": False}))
+        assert req.coalesce.data is False
@@ -0,0 +1,75 @@
+from queue import Queue
+from threading import Thread
+
+import pytest
+from flask import Flask
+
+from internal.service.indexing_service import IndexingService
+
+
+@pytest.fixture
+def flask_app():
+    """获取只包含流水线配置的flask应用"""
+    flask_app = Flask(__name__)
+    flask_app.config.update(
+        INDEXING_PARSE_WORKERS=2,
+        INDEXING_SPLIT_WORKERS=2,
+        INDEXING_EMBED_WORKERS=2,
+        INDEXING_QUEUE_SIZE=1,
+    )
+    return flask_app
+
+
+def _failing_handler(document_id, payload):
+    """模拟在阶段自身异常处理之外抛出异常的处理函数"""
+    if document_id == 1:
+        raise RuntimeError("数据库连接断开")
+    return f"{payload}-done"
+
+
+class TestIndexingService:
+
+    def test_pipeline_worker_skips_failed_item(self, flask_app):
+        """测试单个任务抛出异常时工作线程继续处理后续任务"""
+        in_queue, out_queue = Queue(), Queue()
+        for item in [(1, "a"), (2, "b"), None]:
+            in_queue.put(item)
+
+        IndexingService._pipeline_worker(flask_app, in_queue, out_queue, _failing_handler)
+
+        assert out_queue.get_nowait() == (2, "b-done")
+        assert out_queue.empty()
+
+    def test_pipeline_worker_stops_at_sentinel(self, flask_app):
+        """测试工作线程遇到结束标记后退出，不再消费之后的任务"""
+        in_queue, out_queue = Queue(), Queue()
+        for item in [None, (2, "b")]:
+            in_queue.put(item)
+
+        IndexingService._pipeline_worker(flask_app, in_queue, out_queue, _failing_handler)
+
+        assert out_queue.empty()
+        assert in_queue.get_nowait() == (2, "b")
+
+    def test_pipeline_finishes_when_stage_raises(self, flask_app):
+        """测试某个阶段的处理函数持续抛出异常时流水线仍然会结束，不会因为缺少结束标记而死锁"""
+        service = object.__new__(IndexingService)
+        completed = []
+        service._run_parsing_stage = lambda document_id, process_pool: [document_id]
+
+        def run_splitting_stage(document_id, lc_documents):
+            raise RuntimeError("分割失败")
+
+        service._run_splitting_stage = run_splitting_stage
+        service._run_complete_stage = lambda document_id, lc_segments: completed.append(document_id)
+
+        def build():
+            with flask_app.app_context():
+                service._build_documents_pipeline(list(range(6)))
+
+        thread = Thread(target=build, daemon=True)
+        thread.start()
+        thread.join(timeout=30)
+
+        assert not thread.is_alive()
+        assert completed == []
@@ -0,0 +1,9 @@
+from internal.service.jieba_service import JiebaService
+
+
+class TestJiebaService:
+
+    def test_count_terms_does_not_count_substrings(self):
+        """测试词频按分词结果统计，不会把更长词语中的子串计入"""
+        term_counts = JiebaService.count_terms("数据库存储数据，数据需要备份")
+        assert term_counts["数据"] == 2
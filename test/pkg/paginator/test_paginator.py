@@ -0,0 +1,29 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+
+import pytest
+
+from pkg.paginator.paginator import decode_cursor, encode_cursor
+
+
+class TestCursor:
+
+    @pytest.mark.parametrize("sort_value", [datetime(2024, 5, 1, 12, 30, 15), 3, "name"])
+    def test_cursor_round_trip(self, sort_value):
+        """测试游标编码后可以还原排序字段值与id，datetime保持原类型"""
+        id_value = uuid.uuid4()
+        assert decode_cursor(encode_cursor(sort_value, id_value)) == (sort_value, str(id_value))
+
+    def test_cursor_does_not_carry_total(self):
+        """测试游标只包含排序字段值与id，不携带可被篡改的总记录数"""
+        cursor = encode_cursor(1, "id")
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        assert payload == [1, "id"]
+
+    @pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor(1, "id")[:-2], ""])
+    def test_invalid_cursor_raises_value_error(self, cursor):
+        """测试格式错误的游标抛出ValueError"""
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
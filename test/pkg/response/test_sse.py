@@ -0,0 +1,65 @@
+import json
+
+from pkg.response import SSEWriter
+
+
+def _frame(answer: str, event_id: str = "event-1") -> dict:
+    """构建agent_message增量帧数据"""
+    return {"id": event_id, "event": "agent_message", "thought": answer, "answer": answer, "task_id": "task"}
+
+
+def _decode(text: str) -> tuple[str, dict]:
+    """解析SSE文本，返回事件名与数据"""
+    event_line, data_line = text.strip().split("\n")
+    return event_line.removeprefix("event: "), json.loads(data_line.removeprefix("data:"))
+
+
+class TestSSEWriter:
+
+    def test_coalesce_enabled_by_default(self):
+        """测试默认开启合并，时间窗口内同一事件id的增量帧合并成一帧发送"""
+        writer = SSEWriter(window=60)
+        output = [*writer.write("agent_message", _frame("你")), *writer.write("agent_message", _frame("好"))]
+        assert output == []
+
+        output = list(writer.flush())
+        assert len(output) == 1
+        assert _decode(output[0]) == ("agent_message", _frame("你好"))
+
+    def test_coalesce_disabled_sends_every_frame(self):
+        """测试关闭合并时每一帧都立即发送"""
+        writer = SSEWriter(coalesce=False)
+        output = [*writer.write("agent_message", _frame("你")), *writer.write("agent_message", _frame("好"))]
+        assert [_decode(text)[1]["answer"] for text in output] == ["你", "好"]
+
+    def test_event_id_change_flushes_pending_frame(self):
+        """测试事件id变化时先发送上一个事件的缓冲区"""
+        writer = SSEWriter(window=60)
+        list(writer.write("agent_message", _frame("你", "event-1")))
+        output = list(writer.write("agent_message", _frame("好", "event-2")))
+        assert [_decode(text)[1]["id"] for text in output] == ["event-1"]
+
+    def test_non_coalesced_event_is_sent_after_pending_frame(self):
+        """测试不支持合并的事件会在缓冲区发送之后立即发送"""
+        writer = SSEWriter(window=60)
+        list(writer.write("agent_message", _frame("你")))
+        output = list(writer.write("agent_end", {"id": "event-2"}))
+        assert [_decode(text)[0] for text in output] == ["agent_message", "agent_end"]
+
+    def test_max_bytes_flushes_pending_frame(self):
+        """测试增量内容超过字节上限时立即发送"""
+        writer = SSEWriter(window=60, max_bytes=8)
+        output = [*writer.write("agent_message", _frame("ab")), *writer.write("agent_message", _frame("cd"))]
+        assert len(output) == 1
+        assert _decode(output[0])[1]["answer"] == "abcd"
+
+    def test_idle_timeout_only_when_frame_pending(self):
+        """测试缓冲区为空时不请求空闲唤醒，有缓冲时返回时间窗口剩余时长"""
+        writer = SSEWriter(window=60)
+        assert writer.idle_timeout() is None
+
+        list(writer.write("agent_message", _frame("你")))
+        assert 0 < writer.idle_timeout() <= 60
+
+        list(writer.flush())
+        assert writer.idle_timeout() is None